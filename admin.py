@@ -3,14 +3,34 @@ import pandas as pd
 import gspread
 from google.oauth2.service_account import Credentials
 import plotly.express as px
+import folium
+from streamlit_folium import st_folium
 import base64
 from datetime import datetime, timedelta
 import time
 import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import archive
+import export
+from boundaries import backfill_municipalities
+from core import AnalyticsService, Config
+from hotspots import HotspotEngine
+from snapshot import MUTABLE_COLUMNS, column_letter, live_rows, refresh_if_stale, save_snapshot, snapshot_version, load_reports as load_cached_reports
+from search import ReportIndex
+from sla import RepairSLA
+from geocoder import geocode
+from events import ReportCreated, StatusChanged, publish, subscribe
+from templates import BANNER, PULSE_BOX, WELCOME, begin_page, data_uri, use_background, use_style
+from tracing import begin_rerun, end_rerun, instrument, span, streamlit_session_id, traced, tracer
+
+px = instrument(px, "chart")
 
 # ------------------ CONFIG ------------------
-SERVICE_ACCOUNT_INFO = st.secrets["google_service_account"]
-SHEET_KEY = st.secrets["general"]["sheet_id"]
+CONFIG = Config.from_mapping(st.secrets)
+SERVICE_ACCOUNT_INFO = CONFIG.service_account_info
+SHEET_KEY = CONFIG.sheet_key
+RETENTION_DAYS = CONFIG.retention_days
 
 COLORS = {
     "teal_blue": "#008080",
@@ -21,6 +41,8 @@ COLORS = {
 }
 
 st.set_page_config(page_title="Drop Watch SA", layout="wide", initial_sidebar_state="expanded")
+begin_rerun()
+begin_page()
 
 # ------------------ SESSION ------------------
 if "logged_in" not in st.session_state: st.session_state.logged_in = False
@@ -32,81 +54,282 @@ def logout():
     st.session_state.page = "Login"
     st.session_state.admin_name = ""
     st.session_state.admin_municipality = ""
+    sub = st.session_state.pop("event_subscription", None)
+    if sub is not None:
+        sub.close()
     st.success("You have been logged out.")
 
 # ------------------ BACKGROUND IMAGE ------------------
+@traced("ui.set_background_local")
 def set_background_local(image_path, show_on_page=None, sidebar=False):
     if show_on_page and st.session_state.page not in show_on_page:
         return
-    with open(image_path, "rb") as f:
-        data = f.read()
-    encoded = base64.b64encode(data).decode()
-    if sidebar:
-        st.markdown(f"""
-            <style>
-            [data-testid="stSidebar"] > div:first-child {{
-                background-image: url("data:image/jpg;base64,{encoded}");
-                background-size: cover;
-                background-position: center;
-                background-repeat: no-repeat;
-                background-attachment: fixed;
-            }}
-            </style>
-        """, unsafe_allow_html=True)
-    else:
-        st.markdown(f"""
-            <style>
-            .stApp {{
-                background-image: url("data:image/jpg;base64,{encoded}");
-                background-size: cover;
-                background-position: center;
-                background-repeat: no-repeat;
-                background-attachment: fixed;
-            }}
-            </style>
-        """, unsafe_allow_html=True)
+    use_background(image_path, '[data-testid="stSidebar"] > div:first-child' if sidebar else ".stApp")
 
 # ------------------ GOOGLE SHEETS ------------------
 scopes = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
-creds = Credentials.from_service_account_info(SERVICE_ACCOUNT_INFO, scopes=scopes)
-client = gspread.authorize(creds)
 
-# Load main reports
+@st.cache_resource
+def get_worksheets():
+    # One client and one spreadsheet handle per process; all worksheets from a single metadata request.
+    with span("sheets.get_gsheet_client"):
+        creds = Credentials.from_service_account_info(SERVICE_ACCOUNT_INFO, scopes=scopes)
+        client = instrument(gspread.authorize(creds), "gspread", external=True)
+    spreadsheet = client.open_by_key(SHEET_KEY)
+    return {ws.title: instrument(ws, "gspread", external=True) for ws in spreadsheet.worksheets()}
+
+@traced("sheets.load_reports")
+def load_reports(sheet, force=False):
+    # Host-wide memory-mapped snapshot; only one process per host reconciles it with the sheet.
+    df, source = load_cached_reports(sheet, SHEET_KEY, force=force)
+    st.session_state.reports_source = source
+    st.session_state.snapshot_version = snapshot_version()
+    return df
+
+def load_admins(admin_sheet):
+    admins = pd.DataFrame(admin_sheet.get_all_records())
+    admins.columns = admins.columns.str.strip()
+    admins['AdminCode'] = admins['AdminCode'].astype(str).str.strip()
+    return admins
+
+def touch_reports():
+    """Mark the session's report frame as changed (invalidates counts derived from it)."""
+    st.session_state.reports_version = st.session_state.get("reports_version", 0) + 1
+
+def report_id_column(df):
+    return "ReportID" if "ReportID" in df.columns else "Reference"
+
+def report_ids(df):
+    id_col = report_id_column(df)
+    return set(df[id_col].astype(str)) if id_col in df.columns else set()
+
+def set_reports(df):
+    st.session_state.reports_df = df
+    # Held status changes for reports the new frame has are already reflected in it.
+    held = st.session_state.get("held_status_changes", {})
+    for report_id in held.keys() & report_ids(df):
+        held.pop(report_id)
+    touch_reports()
+    # The snapshot rows this frame mirrors; a newer snapshot that still starts with them is applied as a delta.
+    st.session_state.snapshot_ids = df[report_id_column(df)].astype(str).tolist() if len(df.columns) else []
+    st.session_state.sla = RepairSLA.from_frame(df)
+    st.session_state.search_index = None  # built on the first search
+    st.session_state.hotspots = None  # built on the first overview
+
+def fetch_concurrently(jobs):
+    """Run {name: callable} on a thread pool; returns ({name: result}, {name: seconds})."""
+    def timed(job):
+        t0 = time.perf_counter()
+        result = job()
+        return result, time.perf_counter() - t0
+
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        futures = {name: pool.submit(timed, job) for name, job in jobs.items()}
+    results, timings = {}, {}
+    for name, future in futures.items():
+        results[name], timings[name] = future.result()
+        # Recorded here rather than in the worker so the span lands in this rerun.
+        tracer.record(f"sheets.fetch.{name}", timings[name])
+    return results, timings
+
+def load_sheets(force=False):
+    """Fetch whatever this session is missing (everything if force) from Sheet1 and Sheet2 at once.
+
+    Worker threads have no Streamlit context, so they only talk to Sheets;
+    session state is updated here afterwards.
+    """
+    jobs = {}
+    if force or "reports_df" not in st.session_state:
+        jobs["Sheet1"] = partial(load_cached_reports, sheet, SHEET_KEY, force=force)
+    if force or "admins_df" not in st.session_state:
+        jobs["Sheet2"] = partial(load_admins, admin_sheet)
+    if not jobs:
+        return
+
+    results, timings = fetch_concurrently(jobs)
+    if "Sheet1" in results:
+        reports, st.session_state.reports_source = results["Sheet1"]
+        st.session_state.snapshot_version = snapshot_version()
+        set_reports(reports)
+    if "Sheet2" in results:
+        st.session_state.admins_df = results["Sheet2"]
+    st.session_state.fetch_timings = timings
+
+# Reports and admins are loaded once per session; reports are kept current by events afterwards
 try:
-    sheet = client.open_by_key(SHEET_KEY).worksheet("Sheet1")
-    records = sheet.get_all_records()
-    df = pd.DataFrame(records)
-    df.columns = df.columns.str.strip()
-    if "DateTime" in df.columns: df['DateTime'] = pd.to_datetime(df['DateTime'], errors='coerce')
+    worksheets = get_worksheets()
+    sheet, admin_sheet = worksheets["Sheet1"], worksheets["Sheet2"]
+    load_sheets()
 except Exception as e:
     st.error(f"Failed to load Google Sheet: {e}")
     st.stop()
+admins_df = st.session_state.admins_df
+
+# ------------------ LIVE UPDATES ------------------
+def apply_report_event(df, event):
+    """Patch the cached report frame with a single ReportCreated/StatusChanged event."""
+    if isinstance(event, ReportCreated):
+        row = dict(event.report)
+        if "ReportID" in df.columns and "ReportID" not in row:
+            row["ReportID"] = row.get("Reference", "")
+        columns = list(df.columns) if len(df.columns) else list(row)
+        new_row = pd.DataFrame([{c: row.get(c, "") for c in columns}])
+        if "DateTime" in new_row.columns:
+            new_row['DateTime'] = pd.to_datetime(new_row['DateTime'], errors='coerce')
+        return pd.concat([df, new_row], ignore_index=True)
+
+    if isinstance(event, StatusChanged) and "Status" in df.columns:
+        id_col = report_id_column(df)
+        if id_col in df.columns:
+            match = df[id_col].astype(str) == str(event.report_id)
+            df.loc[match, "Status"] = event.new_status
+            if event.resolved_at or "ResolvedAt" in df.columns:
+                df.loc[match, "ResolvedAt"] = event.resolved_at
+    return df
+
+HELD_STATUS_LIMIT = 1000  # status changes kept while waiting for their report
+
+def apply_events(events):
+    """Patch the session's frame, SLA tracker, search index and hotspots with events.
+
+    A StatusChanged for a report the frame does not have yet is held until its
+    ReportCreated arrives (from the bus or a snapshot delta), then applied.
+    """
+    index = st.session_state.get("search_index")
+    hotspots = st.session_state.get("hotspots")
+    held = st.session_state.setdefault("held_status_changes", {})
+    known = report_ids(st.session_state.reports_df)
+    queue = list(events)
+    applied = 0
+    while queue:
+        event = queue.pop(0)
+        if isinstance(event, ReportCreated):
+            # The same report can arrive as an event and in a snapshot delta.
+            report_id = str(event.report.get("ReportID") or event.report.get("Reference", ""))
+            if report_id in known:
+                continue
+            known.add(report_id)
+            queue[:0] = held.pop(report_id, [])
+        elif isinstance(event, StatusChanged) and str(event.report_id) not in known:
+            held.setdefault(str(event.report_id), []).append(event)
+            while sum(len(v) for v in held.values()) > HELD_STATUS_LIMIT:
+                held.pop(next(iter(held)))
+            continue
+        applied += 1
+        st.session_state.reports_df = apply_report_event(st.session_state.reports_df, event)
+        st.session_state.sla.apply(event)
+        if index is not None:
+            index.apply(event, label=st.session_state.reports_df.index[-1])
+        if hotspots is not None:
+            hotspots.apply(event)
+    if applied:
+        touch_reports()
+    return applied
+
+def apply_pending_events():
+    sub = st.session_state.get("event_subscription")
+    if sub is None:
+        return 0
+    return apply_events(sub.drain())
+
+def snapshot_delta(df, fresh, snapshot_ids):
+    """Events (and other cell changes) that bring the session frame up to a newer snapshot.
+
+    Returns (events, patches), or None when the frame has to be rebuilt: the
+    header changed, or the previous snapshot's reports are no longer the new
+    one's leading rows (rows were deleted or reordered upstream).
+    """
+    id_col = report_id_column(fresh)
+    if list(fresh.columns) != list(df.columns) or id_col not in fresh.columns:
+        return None
+    ids = fresh[id_col].astype(str)
+    if ids.iloc[:len(snapshot_ids)].tolist() != snapshot_ids:
+        return None
+
+    current = df.assign(_id=df[id_col].astype(str)).drop_duplicates("_id", keep="last").set_index("_id")
+    events, patches = [], []
+    for _, row in fresh[~ids.isin(current.index) & (ids.str.strip() != "")].iterrows():
+        report = row.to_dict()
+        if "DateTime" in report:
+            report["DateTime"] = report["DateTime"].strftime("%Y-%m-%d %H:%M:%S") if pd.notna(report["DateTime"]) else ""
+        events.append(ReportCreated(report))
+
+    mutable = [c for c in MUTABLE_COLUMNS if c in fresh.columns]
+    live = fresh[ids.isin(current.index)].assign(_id=ids).drop_duplicates("_id", keep="last").set_index("_id")
+    if not mutable or live.empty:
+        return events, patches
+    cached = current.loc[live.index, mutable].astype(str)
+    diff = (live[mutable].astype(str) != cached).any(axis=1)
+    for report_id, row in live[diff].iterrows():
+        old = cached.loc[report_id]
+        if "Status" in mutable and row["Status"] != old["Status"]:
+            submitted = row.get("DateTime")
+            events.append(StatusChanged(
+                report_id, old["Status"], row["Status"], str(row.get("Municipality", "")),
+                resolved_at=str(row.get("ResolvedAt", "")),
+                submitted_at=submitted.strftime("%Y-%m-%d %H:%M:%S") if pd.notna(submitted) else ""
+            ))
+        patches.extend((report_id, c, row[c]) for c in mutable if c != "Status" and str(row[c]) != old[c])
+    return events, patches
+
+def pick_up_shared_snapshot():
+    """Catch up with the host snapshot when another process (or this one) has refreshed it.
+
+    The difference is applied as events, so the SLA tracker, search index and
+    hotspots are patched rather than rebuilt; only a header or ID-column
+    mismatch reloads everything.
+    """
+    refresh_if_stale(sheet, SHEET_KEY)
+    if snapshot_version() == st.session_state.get("snapshot_version"):
+        return False
+    fresh = load_reports(sheet)
+    df = st.session_state.reports_df
+    delta = snapshot_delta(df, fresh, st.session_state.get("snapshot_ids", []))
+    if delta is None:
+        set_reports(fresh)
+        return True
+    events, patches = delta
+    apply_events(events)
+    df = st.session_state.reports_df
+    id_col = report_id_column(df)
+    for report_id, column, value in patches:
+        df.loc[df[id_col].astype(str) == report_id, column] = value
+    if patches:
+        touch_reports()
+    st.session_state.snapshot_ids = fresh[id_col].astype(str).tolist()
+    return bool(events or patches)
+
+@st.fragment(run_every="10s")
+def live_updates():
+    # Only the fragment reruns on the timer; the page is redrawn when something arrived.
+    changed = apply_pending_events()
+    if pick_up_shared_snapshot() or changed:
+        st.rerun()
 
-# Load admin info
-try:
-    admin_sheet = client.open_by_key(SHEET_KEY).worksheet("Sheet2")
-    admins_df = pd.DataFrame(admin_sheet.get_all_records())
-    admins_df.columns = admins_df.columns.str.strip()
-    admins_df['AdminCode'] = admins_df['AdminCode'].astype(str).str.strip()
-except Exception as e:
-    st.error(f"Failed to load Admin Sheet: {e}")
-    st.stop()
+apply_pending_events()
+df = st.session_state.reports_df
 
 # ------------------ LOGIN LOGIC ------------------
 def login_user(code):
     code = str(code).strip()
-    admins_df['AdminCode'] = admins_df['AdminCode'].astype(str).str.strip()
     admin_info = admins_df[admins_df['AdminCode'] == code]
-    if not admin_info.empty:
-        st.session_state.logged_in = True
-        st.session_state.admin_name = admin_info.iloc[0]['AdminName']
-        st.session_state.admin_municipality = admin_info.iloc[0]['Municipality']
-        st.session_state.page = "Home"
-        st.session_state.last_login = datetime.now()
-        return True
-    else:
+    if admin_info.empty:
         return False
 
+    municipality = admin_info.iloc[0]['Municipality']
+    reports = st.session_state.reports_df
+    st.session_state.logged_in = True
+    st.session_state.admin_name = admin_info.iloc[0]['AdminName']
+    st.session_state.admin_municipality = municipality
+    st.session_state.page = "Home"
+    st.session_state.last_login = datetime.now()
+    st.session_state.reports_at_login = (
+        int((reports['Municipality'] == municipality).sum()) if "Municipality" in reports.columns else len(reports)
+    )
+    if "event_subscription" not in st.session_state:
+        st.session_state.event_subscription = subscribe()
+    return True
+
 # ------------------ AUTHENTICATION ------------------
 def login_page():
     st.markdown(
@@ -119,79 +342,20 @@ def login_page():
     login_status = st.empty()
 
     if st.button("Login"):
-        admin_info = admins_df[admins_df['AdminCode'] == code.strip()]
-        if not admin_info.empty:
-            st.session_state.logged_in = True
-            st.session_state.admin_name = admin_info.iloc[0]['AdminName']
-            st.session_state.admin_municipality = admin_info.iloc[0]['Municipality']
-            st.session_state.page = "Home"
-            st.session_state.last_login = datetime.now()
+        if login_user(code):
             st.session_state._trigger_rerun = True
             login_status.success("Login successful! Redirecting...")
         else:
             login_status.error("Invalid code")
 
 # ------------------ HOME PAGE ------------------
-def get_base64_image(image_path):
-    with open(image_path, "rb") as img_file:
-        return base64.b64encode(img_file.read()).decode()
-
-def display_banner(image_path, title_text):
+@traced("ui.display_banner")
+def display_banner(image_path, title_text, size=""):
     if not os.path.exists(image_path):
         st.warning("Banner image not found.")
         return
-    banner_base64 = get_base64_image(image_path)
-    st.markdown(
-        f"""
-        <style>
-        .banner {{
-            position: relative;
-            background-image: url("data:image/jpg;base64,{banner_base64}");
-            background-size: cover;
-            background-position: center;
-            height: 200px;
-            border-radius: 20px;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            color: white;
-            font-size: 28px;
-            font-weight: bold;
-            text-shadow: 2px 2px 4px rgba(0,0,0,0.6);
-            margin-bottom: 20px;
-        }}
-        .overlay {{
-            position: absolute;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background-color: rgba(0, 0, 0, 0.35);
-            border-radius: 20px;
-        }}
-        .banner-text {{
-            position: relative;
-            z-index: 2;
-            text-align: center;
-        }}
-        .pulse-box {{
-            background-color: #ffcccc;
-            color: #a80000;
-            padding: 10px 15px;
-            border-radius: 10px;
-            text-align: center;
-            font-weight: bold;
-            font-size: 18px;
-        }}
-        </style>
-
-        <div class="banner">
-            <div class="overlay"></div>
-            <div class="banner-text">{title_text}</div>
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
+    use_style("banner")
+    BANNER.markdown(image=data_uri(image_path), text=title_text, size=size)
 
 def home_page(df):
     if df.empty:
@@ -209,62 +373,11 @@ def home_page(df):
 
     # --- Banner with background image ---
     banner_image_path = "images/images/WhatsApp Image 2025-10-22 at 00.08.08_8c98bfbb.jpg"
-    banner_base64 = get_base64_image(banner_image_path)
-
-    st.markdown(
-        f"""
-        <style>
-        .banner {{
-            position: relative;
-            background-image: url("data:image/jpg;base64,{banner_base64}");
-            background-size: cover;
-            background-position: center;
-            height: 250px;
-            border-radius: 20px;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            color: white;
-            font-size: 32px;
-            font-weight: bold;
-            text-shadow: 2px 2px 4px rgba(0,0,0,0.6);
-            margin-bottom: 20px;
-        }}
-        .overlay {{
-            position: absolute;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background-color: rgba(0, 0, 0, 0.35);
-            border-radius: 20px;
-        }}
-        .banner-text {{
-            position: relative;
-            z-index: 2;
-            text-align: center;
-        }}
-        .pulse-box {{
-            background-color: #ffcccc;
-            color: #a80000;
-            padding: 10px 15px;
-            border-radius: 10px;
-            text-align: center;
-            font-weight: bold;
-            font-size: 18px;
-        }}
-        </style>
-
-        <div class="banner">
-            <div class="overlay"></div>
-            <div class="banner-text">
-                {greeting}, {st.session_state.admin_name}!<br>
-                Welcome to the {st.session_state.admin_municipality} Admin Portal
-            </div>
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
+    display_banner(banner_image_path, WELCOME.render(
+        greeting=greeting,
+        name=st.session_state.admin_name,
+        municipality=st.session_state.admin_municipality
+    ), size="banner-lg")
 
     # --- Metrics calculations ---
     df_filtered = df[df['Municipality'] == st.session_state.admin_municipality] if "Municipality" in df.columns else df
@@ -294,10 +407,9 @@ def home_page(df):
     # Pending Reports with pulse if >0
     placeholder_pending = col3.empty()
     if pending_reports > 0:
+        use_style("banner")
         for i in range(pending_reports + 1):
-            placeholder_pending.markdown(
-                f"<div class='pulse-box'>⚠️ Pending Reports: {i}</div>", unsafe_allow_html=True
-            )
+            PULSE_BOX.markdown(placeholder_pending, count=i)
             time.sleep(0.02)
     else:
         placeholder_pending.metric("Pending Reports", 0)
@@ -311,6 +423,63 @@ def home_page(df):
 
 
 # ------------------ MUNICIPAL OVERVIEW PAGE ------------------
+def format_hours(hours):
+    if hours is None:
+        return "—"
+    if hours < 48:
+        return f"{hours:.1f} h"
+    return f"{hours / 24:.1f} days"
+
+def repair_sla_section(admin_muni):
+    sla = st.session_state.get("sla")
+    if sla is None:
+        return
+
+    st.markdown("### Repair SLA")
+    percentiles = sla.resolution_percentiles(admin_muni, (0.5, 0.9))
+    backlog, oldest = sla.backlog_histogram(admin_muni)
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Median Time to Resolve", format_hours(percentiles[0.5]))
+    col2.metric("90th Percentile", format_hours(percentiles[0.9]))
+    col3.metric("Open Backlog", sum(backlog.values()))
+    col4.metric("Oldest Open Report", f"{oldest} days" if oldest is not None else "—")
+    st.caption(f"Based on {sla.resolved_count(admin_muni):,} resolved reports with a recorded resolution time.")
+
+    if sum(backlog.values()):
+        age_data = pd.DataFrame({"Age": list(backlog), "Open Reports": list(backlog.values())})
+        fig_age = px.bar(
+            age_data, x="Age", y="Open Reports",
+            color_discrete_sequence=[COLORS['moonstone_blue']],
+            title=f"Backlog Age - {admin_muni}"
+        )
+        st.plotly_chart(fig_age, use_container_width=True)
+
+HOTSPOT_LIMIT = 5  # hotspots listed per municipality
+
+def hotspot_section(df, admin_muni):
+    hotspots = st.session_state.get("hotspots")
+    if hotspots is None:
+        with span("hotspots.build"):
+            hotspots = st.session_state.hotspots = HotspotEngine.from_frame(df)
+
+    st.markdown("### Recurring Leak Hotspots")
+    with span("hotspots.summary"):
+        top = hotspots.top_hotspots(admin_muni, HOTSPOT_LIMIT)
+    if top.empty:
+        st.info("No hotspots yet: no spot has enough nearby reports.")
+        return
+
+    st.caption(
+        f"Spots with at least {hotspots.min_samples} reports within {hotspots.eps:.0f} m of each other, "
+        "ranked by how often leaks recur there (recent bursts count most)."
+    )
+    table = top.drop(columns=["Hotspot", "Municipality"]).copy()
+    table["First Report"] = table["First Report"].dt.strftime("%Y-%m-%d")
+    table["Last Report"] = table["Last Report"].dt.strftime("%Y-%m-%d")
+    st.dataframe(table.round({"Latitude": 5, "Longitude": 5}), use_container_width=True, hide_index=True)
+    st.map(top, latitude="Latitude", longitude="Longitude", size=60, color=COLORS['teal_blue'])
+
 def municipal_overview_page(df):
     if df.empty:
         st.warning("No reports found yet.")
@@ -323,19 +492,23 @@ def municipal_overview_page(df):
     )
 
     admin_muni = st.session_state.admin_municipality
-    df_filtered = df[df['Municipality'] == admin_muni] if "Municipality" in df.columns else df
+    analytics = AnalyticsService(df).for_municipality(admin_muni)
+    df_filtered = analytics.df
+    totals = analytics.totals()
 
     col1, col2, col3 = st.columns(3)
-    col1.metric("Total Reports", len(df_filtered))
-    col2.metric("Resolved", (df_filtered["Status"] == "Resolved").sum() if "Status" in df_filtered.columns else 0)
-    col3.metric("Pending", (df_filtered["Status"] == "Pending").sum() if "Status" in df_filtered.columns else 0)
+    col1.metric("Total Reports", totals["total"])
+    col2.metric("Resolved", totals["resolved"])
+    col3.metric("Pending", totals["pending"])
+
+    repair_sla_section(admin_muni)
+    hotspot_section(df, admin_muni)
 
     if not df_filtered.empty:
         # Leak Type Distribution
         st.markdown("### Leak Type Distribution")
         if "Leak Type" in df_filtered.columns:
-            bar_data = df_filtered['Leak Type'].value_counts().reset_index()
-            bar_data.columns = ['Leak Type', 'Count']
+            bar_data = analytics.by_leak_type()
             fig_bar = px.bar(
                 bar_data,
                 x='Leak Type',
@@ -349,8 +522,7 @@ def municipal_overview_page(df):
         # Status Distribution
         st.markdown("### Status Distribution")
         if "Status" in df_filtered.columns:
-            pie_data = df_filtered['Status'].value_counts().reset_index()
-            pie_data.columns = ['Status', 'Count']
+            pie_data = analytics.by_status()
             fig_pie = px.pie(
                 pie_data,
                 names='Status',
@@ -385,14 +557,15 @@ def dashboard_page():
                 f"<h1 style='text-align:center;color:black;'>Drop Watch SA - Dashboard (All Municipalities)</h1></div>", unsafe_allow_html=True)
 
     st.markdown(f"<div style='background-color: rgba(245,245,245,0.8); padding:10px; border-radius:10px;'>", unsafe_allow_html=True)
+    analytics = AnalyticsService(df)
+    totals = analytics.totals()
     col1, col2, col3 = st.columns(3)
-    col1.metric("Total Reports", len(df))
-    col2.metric("Resolved", (df["Status"] == "Resolved").sum() if "Status" in df.columns else 0)
-    col3.metric("Pending", (df["Status"] == "Pending").sum() if "Status" in df.columns else 0)
+    col1.metric("Total Reports", totals["total"])
+    col2.metric("Resolved", totals["resolved"])
+    col3.metric("Pending", totals["pending"])
 
     if "Leak Type" in df.columns:
-        bar_data = df['Leak Type'].value_counts().reset_index()
-        bar_data.columns = ['Leak Type', 'Count']
+        bar_data = analytics.by_leak_type()
         fig_bar = px.bar(bar_data, x='Leak Type', y='Count',
                          color='Leak Type',
                          color_discrete_sequence=[COLORS['teal_blue'], COLORS['moonstone_blue'], COLORS['powder_blue'], COLORS['magic_mint']],
@@ -400,8 +573,7 @@ def dashboard_page():
         st.plotly_chart(fig_bar, use_container_width=True)
 
     if "Status" in df.columns:
-        pie_data = df['Status'].value_counts().reset_index()
-        pie_data.columns = ['Status', 'Count']
+        pie_data = analytics.by_status()
         fig_pie = px.pie(pie_data, names='Status', values='Count',
                          color='Status',
                          color_discrete_sequence=[COLORS['moonstone_blue'], COLORS['magic_mint']],
@@ -409,14 +581,13 @@ def dashboard_page():
         st.plotly_chart(fig_pie, use_container_width=True)
 
     if "DateTime" in df.columns:
-        time_data = df.groupby(df['DateTime'].dt.date).size().reset_index(name='Count')
+        time_data = analytics.daily_counts()
         fig_time = px.line(time_data, x='DateTime', y='Count', title="Reports Over Time",
                            markers=True, color_discrete_sequence=[COLORS['teal_blue']])
         st.plotly_chart(fig_time, use_container_width=True)
 
     if "Municipality" in df.columns:
-        top_muni = df['Municipality'].value_counts().nlargest(3).reset_index()
-        top_muni.columns = ['Municipality', 'Reports']
+        top_muni = analytics.top_municipalities(3)
         st.markdown("### Top 3 Municipalities by Number of Reports")
         cols = st.columns(3)
         for i, row in top_muni.iterrows():
@@ -424,14 +595,23 @@ def dashboard_page():
 
     st.markdown("</div>", unsafe_allow_html=True)
 
-from streamlit_folium import st_folium
-import folium
+# ------------------ MANAGE REPORTS ------------------
+st_folium = traced("folium.st_folium")(st_folium)
 
+SEARCH_RESULT_LIMIT = 100  # expanders rendered for one search
 
-# ------------------ MANAGE REPORTS ------------------
-import streamlit as st
-import folium
-from streamlit_folium import st_folium
+def resolved_at_column(sheet):
+    """1-based sheet column for ResolvedAt, adding the header cell the first time it is needed.
+
+    Looks at the live header, not the cached frame: the frame may carry a
+    ResolvedAt column the sheet does not have yet.
+    """
+    header = [h.strip() for h in sheet.row_values(1)]
+    if "ResolvedAt" in header:
+        return header.index("ResolvedAt") + 1
+    col = len(header) + 1
+    sheet.update_cell(1, col, "ResolvedAt")
+    return col
 
 def manage_reports_page(df, sheet):
     if not st.session_state.get("logged_in") or "admin_municipality" not in st.session_state:
@@ -456,10 +636,24 @@ def manage_reports_page(df, sheet):
     st.markdown("## Manage Reports")
 
     admin_muni = st.session_state.admin_municipality
-    df_admin = df[df['Municipality'] == admin_muni]
+    query = st.text_input("Search Reports", placeholder="Location, name or report ID", key="report_search")
+    if query.strip():
+        index = st.session_state.get("search_index")
+        if index is None:
+            with span("search.build_index"):
+                index = st.session_state.search_index = ReportIndex.from_frame(df)
+        with span("search.query"):
+            labels = index.search(query, municipality=admin_muni)
+        if len(labels) > SEARCH_RESULT_LIMIT:
+            st.caption(f"Showing the first {SEARCH_RESULT_LIMIT} of {len(labels):,} matching reports.")
+        else:
+            st.caption(f"{len(labels):,} matching report{'' if len(labels) == 1 else 's'}.")
+        df_admin = df.loc[labels[:SEARCH_RESULT_LIMIT]]
+    else:
+        df_admin = df[df['Municipality'] == admin_muni]
 
     if df_admin.empty:
-        st.info("No reports for your municipality.")
+        st.info("No reports match your search." if query.strip() else "No reports for your municipality.")
         st.markdown("</div>", unsafe_allow_html=True)
         return
 
@@ -484,11 +678,14 @@ def manage_reports_page(df, sheet):
 
             # --- Show map if coordinates exist ---
             lat, lon = row.get("Latitude"), row.get("Longitude")
-            if lat and lon:
+            if not (pd.notna(lat) and pd.notna(lon) and lat and lon):
+                place = geocode(row.get(location_col, ""))
+                lat, lon = (place.lat, place.lon) if place is not None else (None, None)
+            if lat is not None and pd.notna(lat) and pd.notna(lon) and lat and lon:
                 st.markdown("*Location Map:*")
                 m = folium.Map(location=[lat, lon], zoom_start=16)
                 folium.Marker([lat, lon], tooltip="Reported Leak").add_to(m)
-                st_folium(m, height=300, width=600)
+                st_folium(m, height=300, width=600, key=f"map_{idx}")
 
             # --- Status update ---
             options = ["Pending", "Resolved"]
@@ -499,8 +696,20 @@ def manage_reports_page(df, sheet):
                 try:
                     cell = sheet.find(str(row[report_id_col]))
                     sheet.update_cell(cell.row, df.columns.get_loc("Status")+1, new_status)
+                    resolved_at = row.get("ResolvedAt", "")
+                    if new_status != status:
+                        resolved_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S") if new_status == "Resolved" else ""
+                        sheet.update_cell(cell.row, resolved_at_column(sheet), resolved_at)
+                        # Only once the sheet has the ResolvedAt header may the frame carry the column.
+                        df.at[idx, "ResolvedAt"] = resolved_at
                     st.success(f"Status updated to {new_status}")
                     df.at[idx, "Status"] = new_status
+                    submitted = row.get("DateTime")
+                    publish(StatusChanged(
+                        str(row[report_id_col]), status, new_status, admin_muni,
+                        resolved_at=resolved_at,
+                        submitted_at=submitted.strftime("%Y-%m-%d %H:%M:%S") if pd.notna(submitted) else ""
+                    ))
                 except Exception as e:
                     st.error(f"Failed to update status: {e}")
 
@@ -508,11 +717,249 @@ def manage_reports_page(df, sheet):
 
     st.markdown("</div>", unsafe_allow_html=True)
 
+# ------------------ EXPORT PAGE ------------------
+EXPORT_DOWNLOAD_LIMIT = 200 * 1024 * 1024  # larger exports stay on the server disk
+
+def export_page(df):
+    st.markdown("## Export Reports")
+    admin_muni = st.session_state.admin_municipality
+
+    dates = df['DateTime'].dropna() if "DateTime" in df.columns else pd.Series(dtype="datetime64[ns]")
+    first = dates.min().date() if not dates.empty else datetime.now().date()
+    last = dates.max().date() if not dates.empty else datetime.now().date()
+    archived = archive.archived_months(admin_muni)
+    if archived:
+        first = min(first, pd.Timestamp(archived[0]).date())
+
+    col1, col2, col3 = st.columns(3)
+    date_range = col1.date_input("Date Range", value=(first, last))
+    statuses = col2.multiselect("Status", ["Pending", "Resolved"], default=["Pending", "Resolved"])
+    fmt = col3.radio("Format", list(export.FORMATS), horizontal=True)
+
+    # While the second date is still being picked, date_input returns a 1-tuple.
+    if not isinstance(date_range, (tuple, list)):
+        date_range = (date_range,)
+    if len(date_range) < 2:
+        st.info("Choose an end date to see the matching reports.")
+        return
+    start, end = date_range[0], date_range[-1]
+
+    include_archive = bool(archived) and st.checkbox(
+        "Include archived reports", value=True,
+        help=f"Resolved reports older than {RETENTION_DAYS} days are kept in the archive instead of Sheet1."
+    )
+
+    # Reads the session's cached report frame (plus archive partitions in range); no Sheets request.
+    # The selection is streamed chunk by chunk; only its count is kept, per filter and frame version.
+    archive_root = archive.ARCHIVE_DIR if include_archive else None
+    selection = (admin_muni, start, end, tuple(statuses), archive_root)
+    counts = st.session_state.setdefault("export_counts", {})
+    key = (st.session_state.get("reports_version", 0),) + selection
+    if key not in counts:
+        with span("export.count"):
+            counts.clear()
+            counts[key] = export.count_reports(df, admin_muni, start, end, statuses, archive_root)
+    matching = counts[key]
+    st.caption(f"{matching:,} reports match for {admin_muni}.")
+
+    if st.button("Generate Export", disabled=not matching):
+        filename = export.export_filename(admin_muni, fmt, start, end)
+        try:
+            with span(f"export.{fmt.lower()}"):
+                columns = export.export_columns(df, admin_muni, start, end, archive_root)
+                chunks = export.report_chunks(df, admin_muni, start, end, statuses, archive_root)
+                path, size = export.write_export(chunks, os.path.join(export.EXPORT_DIR, filename), fmt, columns)
+        except Exception as e:
+            st.error(f"Export failed: {e}")
+            return
+        st.session_state.last_export = (path, size, filename, fmt)
+
+    if "last_export" in st.session_state:
+        path, size, filename, fmt = st.session_state.last_export
+        if not os.path.exists(path):
+            st.session_state.pop("last_export")
+            return
+        st.success(f"Export ready: {filename} ({size / 1024 / 1024:.1f} MB)")
+        if size <= EXPORT_DOWNLOAD_LIMIT:
+            with open(path, "rb") as f:
+                st.download_button(
+                    "Download", f, file_name=filename,
+                    mime="text/csv" if fmt == "CSV" else "application/octet-stream"
+                )
+        else:
+            st.info(f"This export is too large to download through the browser. It is saved on the server at `{path}`.")
+
+# ------------------ MUNICIPALITY BACKFILL ------------------
+BACKFILL_BATCH = 5000  # cells per batch_update request
+
+def municipality_backfill(df, admin_muni):
+    """backfill_municipalities() limited to reports filed under the admin's own municipality."""
+    classified, changed = backfill_municipalities(df)
+    if "Municipality" in df.columns:
+        changed &= df["Municipality"].astype(str) == admin_muni
+    return classified, changed
+
+def apply_municipality_backfill(sheet, admin_muni):
+    """Write corrected municipalities for the admin's reports to Sheet1; returns the number moved."""
+    fresh = load_reports(sheet, force=True)  # reconciled with the sheet
+    classified, changed = municipality_backfill(fresh, admin_muni)
+    if not changed.any():
+        set_reports(fresh)
+        return 0
+
+    # Address rows by ReportID as they stand now, not by frame position: the sheet may
+    # have gained or lost rows since the load.
+    id_col = report_id_column(fresh)
+    changed &= fresh[id_col].astype(str).str.strip() != ""
+    letter = column_letter(fresh.columns.get_loc("Municipality") + 1)
+    rows = live_rows(sheet, sheet.row_values(1), fresh.loc[changed, id_col])
+    updates = [
+        {"range": f"{letter}{row}", "values": [[value]]}
+        for row, value in zip(rows, classified[changed])
+    ]
+    for start in range(0, len(updates), BACKFILL_BATCH):
+        sheet.batch_update(updates[start:start + BACKFILL_BATCH])
+
+    fresh.loc[changed, "Municipality"] = classified[changed]
+    save_snapshot(fresh, sheet.row_values(1), SHEET_KEY)
+    st.session_state.snapshot_version = snapshot_version()
+    set_reports(fresh)
+    return len(updates)
+
+def municipality_backfill_section(df):
+    admin_muni = st.session_state.admin_municipality
+    st.markdown("### Municipality Backfill")
+    st.caption(
+        f"Re-files reports filed under {admin_muni} whose location falls inside another municipality's boundary."
+    )
+
+    if st.button("Scan Reports"):
+        with span("boundaries.backfill"):
+            classified, changed = municipality_backfill(df, admin_muni)
+        id_col = report_id_column(df)
+        preview = pd.DataFrame({
+            "Report": df.loc[changed, id_col] if id_col in df.columns else df.index[changed],
+            "Location": df.loc[changed, "Location"] if "Location" in df.columns else "",
+            "Filed Under": df.loc[changed, "Municipality"],
+            "Boundary Match": classified[changed],
+        })
+        st.session_state.backfill_preview = preview
+
+    preview = st.session_state.get("backfill_preview")
+    if preview is None:
+        return
+    if preview.empty:
+        st.success("Every located report is filed under the right municipality.")
+        return
+
+    st.warning(f"{len(preview):,} reports are filed under a different municipality than their location.")
+    st.dataframe(preview.head(500), use_container_width=True, hide_index=True)
+    if st.button("Apply to Sheet"):
+        try:
+            with span("boundaries.apply_backfill"):
+                moved = apply_municipality_backfill(sheet, admin_muni)
+            st.success(f"Updated {moved:,} reports.")
+            st.session_state.pop("backfill_preview", None)
+        except Exception as e:
+            st.error(f"Failed to update municipalities: {e}")
+
+# ------------------ RETENTION ------------------
+
+def retention_section(df):
+    admin_muni = st.session_state.admin_municipality
+    st.markdown("### Retention")
+    st.caption(
+        f"Resolved {admin_muni} reports older than {RETENTION_DAYS} days move from Sheet1 to "
+        f"`{archive.ARCHIVE_DIR}/`, one compressed file set per month. Other municipalities archive their own; "
+        "`python archive.py` runs the job for all of them."
+    )
+    summary = archive.archive_summary()
+    if not summary.empty:
+        per_municipality = summary.groupby("Municipality", as_index=False)[["Reports", "Bytes"]].sum()
+        per_municipality["MB"] = (per_municipality.pop("Bytes") / 1024 / 1024).round(2)
+        st.dataframe(per_municipality, use_container_width=True, hide_index=True)
+
+    eligible = int(archive.archivable(df, RETENTION_DAYS, municipality=admin_muni).sum())
+    if st.button(f"Archive {eligible:,} Resolved Reports", disabled=not eligible):
+        try:
+            with span("archive.run_retention"):
+                result, hot = archive.run_retention(sheet, SHEET_KEY, RETENTION_DAYS, municipality=admin_muni)
+            st.session_state.snapshot_version = snapshot_version()
+            set_reports(hot)
+            st.success(
+                f"Archived {result['eligible']:,} reports into {result['partitions']} partitions; "
+                f"{len(hot):,} remain in Sheet1."
+            )
+        except Exception as e:
+            st.error(f"Archiving failed: {e}")
+
+# ------------------ DIAGNOSTICS PAGE ------------------
+def stats_frame(stats):
+    frame = pd.DataFrame.from_dict(stats, orient="index")
+    if frame.empty:
+        return frame
+    return frame.sort_values("total_ms", ascending=False).round(2)
+
+def diagnostics_page():
+    st.markdown("## Diagnostics")
+    snapshot = tracer.snapshot(streamlit_session_id())
+    st.caption(
+        f"Tracing since {snapshot['started']:%Y-%m-%d %H:%M:%S} · {snapshot['sessions']} sessions tracked"
+    )
+
+    st.markdown("### External Calls")
+    if snapshot["calls"]:
+        calls = pd.DataFrame(sorted(snapshot["calls"].items()), columns=["Call", "Count"])
+        st.dataframe(calls, use_container_width=True, hide_index=True)
+    else:
+        st.info("No external calls recorded yet.")
+
+    if snapshot["counters"]:
+        st.markdown("### Events")
+        events = pd.DataFrame(sorted(snapshot["counters"].items()), columns=["Event", "Count"])
+        st.dataframe(events, use_container_width=True, hide_index=True)
+
+    st.markdown("### Spans (all sessions)")
+    st.dataframe(stats_frame(snapshot["spans"]), use_container_width=True)
+
+    session = snapshot["session"]
+    if session:
+        st.markdown(f"### This Session ({session['reruns']} reruns)")
+        st.dataframe(stats_frame(session["spans"]), use_container_width=True)
+
+        st.markdown("### Recent Reruns")
+        for rerun in reversed(session["recent"]):
+            with st.expander(f"{rerun['started']:%H:%M:%S} — {rerun['duration'] * 1000:.0f} ms"):
+                spans = pd.DataFrame(rerun["spans"], columns=["Span", "Seconds"])
+                spans["ms"] = (spans["Seconds"] * 1000).round(2)
+                st.dataframe(spans[["Span", "ms"]], use_container_width=True, hide_index=True)
+
+    timings = st.session_state.get("fetch_timings")
+    if timings:
+        st.markdown("### Last Sheet Fetch")
+        fetches = pd.DataFrame(
+            [(name, seconds * 1000) for name, seconds in timings.items()], columns=["Worksheet", "ms"]
+        )
+        st.dataframe(fetches.round(1), use_container_width=True, hide_index=True)
+        st.caption(f"Fetched concurrently; wall time ≈ slowest worksheet ({max(timings.values()) * 1000:.0f} ms).")
+
+    municipality_backfill_section(st.session_state.reports_df)
+    retention_section(st.session_state.reports_df)
+
+    st.markdown("### Prometheus Export")
+    if st.button("Write Metrics File"):
+        try:
+            path = tracer.write_prometheus()
+            st.success(f"Metrics written to {path}")
+        except OSError as e:
+            st.error(f"Failed to write metrics: {e}")
+    st.download_button("Download Metrics", tracer.to_prometheus(), file_name="dropwatch.prom")
+
 # ------------------ SIDEBAR ------------------
 def custom_sidebar():
     set_background_local(
         "images/images/WhatsApp Image 2025-10-21 at 22.42.03_3d1ddaaa.jpg",
-        show_on_page=["Home","Municipal Overview","Dashboard","Manage Reports"],
+        show_on_page=["Home","Municipal Overview","Dashboard","Manage Reports","Export Data","Diagnostics"],
         sidebar=True
     )
 
@@ -526,6 +973,12 @@ def custom_sidebar():
     if st.sidebar.button("Municipal Overview"): st.session_state.page = "Municipal Overview"
     if st.sidebar.button("Dashboard"): st.session_state.page = "Dashboard"
     if st.sidebar.button("Manage Reports"): st.session_state.page = "Manage Reports"
+    if st.sidebar.button("Export Data"): st.session_state.page = "Export Data"
+    if st.sidebar.button("Diagnostics"): st.session_state.page = "Diagnostics"
+
+    if st.sidebar.button("Refresh Data"):
+        load_sheets(force=True)
+        st.session_state._trigger_rerun = True
 
     if st.session_state.logged_in:
         if st.sidebar.button("Logout"):
@@ -538,10 +991,15 @@ if not st.session_state.logged_in:
     login_page()
 else:
     custom_sidebar()
+    live_updates()
     if st.session_state.page == "Home": home_page(df)
     elif st.session_state.page == "Municipal Overview": municipal_overview_page(df)
     elif st.session_state.page == "Dashboard": dashboard_page()
     elif st.session_state.page == "Manage Reports": manage_reports_page(df, sheet)
+    elif st.session_state.page == "Export Data": export_page(df)
+    elif st.session_state.page == "Diagnostics": diagnostics_page()
+
+end_rerun()
 
 # Handle deferred rerun safely
 if "_trigger_rerun" in st.session_state and st.session_state._trigger_rerun:
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Asynchronous JSON API over the core services: report status lookup and submit.
+
+It runs apart from the Streamlit UI and scales on its own, with more uvicorn
+workers or more hosts behind a load balancer:
+
+    DROPWATCH_SECRETS=.streamlit/secrets.toml uvicorn api:create_app --factory --workers 4
+
+Each worker builds its services from the environment (core.Config.from_env).
+gspread and SMTP calls block, so they run in the thread pool, and emails are
+sent as background tasks after the response has gone out. Rate limits are kept
+per worker, as they are per Streamlit process.
+
+Submissions are always limited per email address. They are limited per client
+address too only when Config.trust_client_ip is set (DROPWATCH_TRUST_CLIENT_IP=1):
+behind a load balancer every request arrives from the balancer's address, so
+uvicorn must first be told to take the client from X-Forwarded-For:
+
+    uvicorn api:create_app --factory --proxy-headers --forwarded-allow-ips=<load balancer addresses>
+
+    GET  /reports/{id}   -> 200 {"source": "sheet" | "archive", "report": {...}} or 404
+    POST /reports        -> 201 {"reference": ..., "report": {...}}, 422 {"errors": [...]} or 429
+    GET  /healthz        -> 200 {"ok": true}
+
+A submission carries only the citizen form's fields (schema.CITIZEN_FIELDS):
+Name, Contact, Location and/or Latitude/Longitude, Leak Type and optionally
+Municipality. The reference, Pending status and timestamp are set here.
+"""
+
+import json
+import logging
+
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+import archive
+from core import Config, NotificationService, ReportsService
+from rate_limit import SubmissionThrottle
+from schema import validate_submission
+
+log = logging.getLogger("dropwatch.api")
+
+# Contact details and names never leave the API.
+PUBLIC_FIELDS = ("Municipality", "Leak Type", "Location", "DateTime", "Status", "ResolvedAt")
+MAX_BODY_BYTES = 64 * 1024
+
+
+def public_view(report):
+    view = {"Reference": str(report.get("ReportID") or report.get("Reference") or "")}
+    for field in PUBLIC_FIELDS:
+        value = report.get(field)
+        if value is not None and str(value) != "":
+            view[field] = str(value)
+    return view
+
+
+def _quietly(job, *args):
+    try:
+        job(*args)
+    except Exception:
+        log.exception("background %s failed", getattr(job, "__name__", job))
+
+
+def create_app(config=None, reports=None, notifications=None, throttle=None):
+    config = config or Config.from_env()
+    reports = reports or ReportsService(config, archive_lookup=archive.find_report)
+    notifications = notifications or NotificationService(config)
+    throttle = throttle or SubmissionThrottle(config.rate_limits)
+
+    async def status(request):
+        report_id = request.path_params["report_id"]
+        report, source = await run_in_threadpool(reports.find, report_id)
+        if report is None:
+            return JSONResponse({"error": "report not found"}, status_code=404)
+        # Same as the Check Status page: a resolved report's owner is emailed once.
+        task = BackgroundTask(_quietly, notifications.notify_if_resolved, report, reports) if source == "sheet" else None
+        return JSONResponse({"source": source, "report": public_view(report)}, background=task)
+
+    async def submit(request):
+        body = await request.body()
+        if len(body) > MAX_BODY_BYTES:
+            return JSONResponse({"errors": ["request body too large"]}, status_code=413)
+        try:
+            record = json.loads(body)
+        except ValueError:
+            return JSONResponse({"errors": ["body must be a JSON object"]}, status_code=400)
+        if not isinstance(record, dict):
+            return JSONResponse({"errors": ["body must be a JSON object"]}, status_code=400)
+
+        report, errors = await run_in_threadpool(validate_submission, record)
+        if errors:
+            return JSONResponse({"errors": errors}, status_code=422)
+        client = f"ip:{request.client.host}" if config.trust_client_ip and request.client else None
+        allowed, wait, reason = throttle.check(client, report["Contact"])
+        if not allowed:
+            return JSONResponse(
+                {"errors": [f"too many submissions ({reason}); retry later"]}, status_code=429,
+                headers={"Retry-After": str(max(int(wait), 1))}
+            )
+
+        await run_in_threadpool(reports.create, report)
+        task = BackgroundTask(
+            _quietly, notifications.send_reference, report["Contact"], report["Reference"], report["Name"]
+        )
+        return JSONResponse(
+            {"reference": report["Reference"], "report": public_view(report)}, status_code=201, background=task
+        )
+
+    async def healthz(request):
+        return JSONResponse({"ok": True})
+
+    return Starlette(routes=[
+        Route("/reports/{report_id}", status, methods=["GET"]),
+        Route("/reports", submit, methods=["POST"]),
+        Route("/healthz", healthz, methods=["GET"]),
+    ])
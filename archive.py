@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""Tiered retention for resolved reports.
+
+Resolved reports older than a cut-off move out of Sheet1 into zstd Parquet
+partitions on disk, one directory per municipality per month:
+
+    archive/municipality=city-of-cape-town/month=2024-03/part-20250101T020000-4242-1f0c9a2e.parquet
+
+Sheet1, the hot store, then holds only open and recently resolved reports, so
+full pulls, finds and snapshot reconciles stay small. Reads that reach further
+back (exports, status lookups) merge in just the partitions whose directory
+names match the municipality and months they ask for.
+
+A run writes the partitions first and deletes the sheet rows second. If the
+delete fails, the rows exist in both tiers until the next run, and merged reads
+prefer the sheet copy. Rows are deleted by ReportID: right before the delete
+the ID column is read again and each archived ID mapped to its current row; if
+any ID is missing or duplicated the run stops without deleting anything.
+
+The refresh lock only serializes snapshot refreshes and retention runs. Other
+writers do not take it: Manage Reports (find -> update_cell on Status and
+ResolvedAt) and ReportsService.mark_notified. Their find and update are two
+requests, so a retention run deleting rows in between can shift the row they
+write to. Run the job off-hours, when no admin is editing reports.
+
+archive/_index.parquet maps every archived ReportID to its partition file, so
+a status lookup reads one partition instead of all of them. Partitions written
+before the index existed are still scanned until `python archive.py --reindex`.
+
+Run it from cron with a service account file:
+
+    python archive.py --credentials service_account.json --sheet-key <key> --older-than-days 365
+    python archive.py --reindex
+"""
+
+import argparse
+import glob
+import os
+import re
+import uuid
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import snapshot
+from core.config import RESOLVED_RETENTION_DAYS
+from snapshot import arrow_table, id_column, live_rows, refresh, refresh_lock, save_snapshot
+
+ARCHIVE_DIR = os.environ.get("DROPWATCH_ARCHIVE_DIR", "archive")
+DELETE_BATCH = 500  # deleteDimension requests per batch_update call
+UNKNOWN_MONTH = "unknown"
+INDEX_FILE = "_index.parquet"
+
+
+def slug(name):
+    return re.sub(r"[^a-z0-9]+", "-", str(name).lower()).strip("-") or "other"
+
+
+def _month(value):
+    return pd.Timestamp(value).strftime("%Y-%m")
+
+
+# ---------------------- SELECTION ----------------------
+def archivable(df, older_than_days=RESOLVED_RETENTION_DAYS, now=None, municipality=None):
+    """Mask of resolved reports resolved (or, without ResolvedAt, submitted) before the cut-off.
+
+    With a municipality, only that municipality's reports.
+    """
+    if "Status" not in df.columns or municipality and "Municipality" not in df.columns:
+        return pd.Series(False, index=df.index)
+    cutoff = (now or datetime.now()) - timedelta(days=older_than_days)
+    when = pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns]")
+    if "ResolvedAt" in df.columns:
+        when = pd.to_datetime(df["ResolvedAt"], errors="coerce")
+    if "DateTime" in df.columns:
+        when = when.fillna(pd.to_datetime(df["DateTime"], errors="coerce"))
+    mask = (df["Status"] == "Resolved") & (when < cutoff)
+    if municipality:
+        mask &= df["Municipality"] == municipality
+    return mask
+
+
+# ---------------------- PARTITIONS ----------------------
+def partition_dir(municipality, month, root=ARCHIVE_DIR):
+    return os.path.join(root, f"municipality={slug(municipality)}", f"month={month}")
+
+
+def write_partitions(df, root=ARCHIVE_DIR):
+    """Add the rows to their municipality/month partitions. Returns {path: rows}."""
+    import pyarrow.parquet as pq
+
+    months = pd.to_datetime(df["DateTime"], errors="coerce").dt.strftime("%Y-%m").fillna(UNKNOWN_MONTH)
+    municipalities = df["Municipality"].fillna("Other") if "Municipality" in df.columns else "Other"
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+    key = id_column(list(df.columns))
+    written, entries = {}, []
+    for (municipality, month), part in df.groupby([municipalities, months], sort=False):
+        directory = partition_dir(municipality, month, root)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"part-{stamp}-{os.getpid()}-{uuid.uuid4().hex[:8]}.parquet")
+        tmp = f"{path}.tmp"
+        pq.write_table(arrow_table(part), tmp, compression="zstd")
+        os.replace(tmp, path)
+        written[path] = len(part)
+        if key is not None:
+            entries.append(pd.DataFrame({"id": part[key].astype(str), "path": os.path.relpath(path, root)}))
+    if entries:
+        add_to_index(pd.concat(entries, ignore_index=True), root)
+    return written
+
+
+def partition_paths(municipality=None, start=None, end=None, root=ARCHIVE_DIR):
+    """Partition files for a municipality (all if None) whose month overlaps [start, end]."""
+    municipality_dir = f"municipality={slug(municipality)}" if municipality else "municipality=*"
+    first = _month(start) if start else None
+    last = _month(end) if end else None
+    for path in sorted(glob.glob(os.path.join(root, municipality_dir, "month=*", "*.parquet"))):
+        month = os.path.basename(os.path.dirname(path))[len("month="):]
+        if month == UNKNOWN_MONTH:
+            if first or last:
+                continue
+        elif (first and month < first) or (last and month > last):
+            continue
+        yield path
+
+
+def archived_months(municipality=None, root=ARCHIVE_DIR):
+    """Sorted months that have archived reports (excluding undated ones)."""
+    return sorted({
+        os.path.basename(os.path.dirname(path))[len("month="):]
+        for path in partition_paths(municipality, root=root)
+    } - {UNKNOWN_MONTH})
+
+
+# ---------------------- ID INDEX ----------------------
+_index_cache = {}  # root -> (mtime_ns, {report id: partition path}, {indexed paths})
+
+
+def index_path(root=ARCHIVE_DIR):
+    return os.path.join(root, INDEX_FILE)
+
+
+def add_to_index(entries, root=ARCHIVE_DIR):
+    """Append (id, path relative to root) rows to the index. Callers hold the refresh lock."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    path = index_path(root)
+    if os.path.exists(path):
+        entries = pd.concat([pq.read_table(path).to_pandas(), entries], ignore_index=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    table = pa.table({"id": entries["id"].astype(str), "path": entries["path"].astype(str)})
+    pq.write_table(table, tmp, compression="zstd")
+    os.replace(tmp, path)
+
+
+def rebuild_index(root=ARCHIVE_DIR):
+    """Index every partition on disk from scratch. Returns the number of archived IDs."""
+    import pyarrow.parquet as pq
+
+    entries = []
+    for path in partition_paths(root=root):
+        key = id_column(pq.read_schema(path).names)
+        if key is not None:
+            ids = pq.read_table(path, columns=[key]).column(key).to_pylist()
+            entries.append(pd.DataFrame({"id": [str(i) for i in ids], "path": os.path.relpath(path, root)}))
+    if os.path.exists(index_path(root)):
+        os.remove(index_path(root))
+    if entries:
+        add_to_index(pd.concat(entries, ignore_index=True), root)
+    return sum(len(e) for e in entries)
+
+
+def archive_index(root=ARCHIVE_DIR):
+    """({report id: partition path}, {indexed paths}), re-read only when the index file changes."""
+    import pyarrow.parquet as pq
+
+    try:
+        mtime = os.stat(index_path(root)).st_mtime_ns
+    except OSError:
+        return {}, set()
+    cached = _index_cache.get(root)
+    if cached is None or cached[0] != mtime:
+        table = pq.read_table(index_path(root))
+        paths = [os.path.join(root, p) for p in table.column("path").to_pylist()]
+        ids = dict(zip(table.column("id").to_pylist(), paths))  # a later run's copy wins
+        cached = _index_cache[root] = (mtime, ids, set(paths))
+    return cached[1], cached[2]
+
+
+# ---------------------- READS ----------------------
+def read_archive(municipality=None, start=None, end=None, root=ARCHIVE_DIR):
+    """Archived reports from the matching partitions (whole months; filter dates exactly afterwards)."""
+    import pyarrow.parquet as pq
+
+    frames = [pq.read_table(path).to_pandas() for path in partition_paths(municipality, start, end, root)]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
+def with_archive(df, municipality=None, start=None, end=None, root=ARCHIVE_DIR):
+    """Hot frame plus archived reports in range; the hot copy wins for reports in both tiers."""
+    archived = read_archive(municipality, start, end, root)
+    if archived.empty:
+        return df
+    merged = pd.concat([archived, df], ignore_index=True)
+    key = id_column(list(merged.columns))
+    if key is not None:
+        merged = merged.drop_duplicates(subset=key, keep="last", ignore_index=True)
+    return merged
+
+
+def _read_report(path, report_id):
+    import pyarrow.parquet as pq
+
+    key = id_column(pq.read_schema(path).names)
+    if key is None:
+        return None
+    table = pq.read_table(path, filters=[(key, "=", report_id)])
+    return table.slice(0, 1).to_pylist()[0] if table.num_rows else None
+
+
+def find_report(report_id, root=ARCHIVE_DIR):
+    """Archived report as a dict, or None.
+
+    The ID index names the one partition to read; only partitions the index does
+    not cover yet are scanned, each with a pushed-down ID filter.
+    """
+    report_id = str(report_id).strip()
+    ids, indexed = archive_index(root)
+    path = ids.get(report_id)
+    if path is not None and os.path.exists(path):
+        report = _read_report(path, report_id)
+        if report is not None:
+            return report
+    for path in reversed(list(partition_paths(root=root))):
+        if path in indexed:
+            continue
+        report = _read_report(path, report_id)
+        if report is not None:
+            return report
+    return None
+
+
+def archive_summary(root=ARCHIVE_DIR):
+    """Reports and bytes on disk per municipality partition."""
+    import pyarrow.parquet as pq
+
+    rows = []
+    for path in partition_paths(root=root):
+        municipality_dir, month_dir = path.split(os.sep)[-3:-1]
+        rows.append((
+            municipality_dir[len("municipality="):], month_dir[len("month="):],
+            pq.read_metadata(path).num_rows, os.path.getsize(path)
+        ))
+    frame = pd.DataFrame(rows, columns=["Municipality", "Month", "Reports", "Bytes"])
+    return frame.groupby(["Municipality", "Month"], as_index=False).sum()
+
+
+# ---------------------- RETENTION JOB ----------------------
+def delete_rows(sheet, rows):
+    """Delete 1-based sheet rows with deleteDimension requests, bottom-up so indexes stay valid."""
+    runs = []
+    for row in sorted({int(r) for r in rows}, reverse=True):
+        if runs and runs[-1][0] == row + 1:
+            runs[-1][0] = row
+        else:
+            runs.append([row, row])
+    requests = [
+        {"deleteDimension": {"range": {
+            "sheetId": sheet.id, "dimension": "ROWS", "startIndex": first - 1, "endIndex": last
+        }}}
+        for first, last in runs
+    ]
+    for start in range(0, len(requests), DELETE_BATCH):
+        sheet.spreadsheet.batch_update({"requests": requests[start:start + DELETE_BATCH]})
+    return len(runs)
+
+
+def run_retention(sheet, sheet_key, older_than_days=RESOLVED_RETENTION_DAYS, root=ARCHIVE_DIR,
+                  dry_run=False, snapshot_path=None, municipality=None):
+    """Archive old resolved reports and remove them from the sheet.
+
+    Holds the snapshot refresh lock throughout, so no other process reconciles
+    (or archives) while rows are being deleted; see the module docstring for the
+    writers it does not cover. Rows without a ReportID are never archived.
+    With a municipality, only that municipality's reports are archived.
+    Raises ValueError, before deleting anything, if an archived ID no longer
+    maps to exactly one sheet row. Returns (summary, hot frame).
+    """
+    snapshot_path = snapshot_path or snapshot.SNAPSHOT_PATH
+    with refresh_lock(snapshot_path, blocking=True):
+        df, _ = refresh(sheet, sheet_key, snapshot_path)
+        key = id_column(list(df.columns))
+        mask = archivable(df, older_than_days, municipality=municipality)
+        mask &= df[key].astype(str).str.strip() != "" if key is not None else False
+        summary = {"eligible": int(mask.sum()), "partitions": 0, "deleted_ranges": 0}
+        if dry_run or not mask.any():
+            return summary, df
+
+        written = write_partitions(df.loc[mask], root)
+        summary["partitions"] = len(written)
+        # Re-read the IDs now rather than trusting frame positions from the refresh.
+        header = sheet.row_values(1)
+        rows = live_rows(sheet, header, df.loc[mask, key])
+        summary["deleted_ranges"] = delete_rows(sheet, rows)
+
+        hot = df.loc[~mask].reset_index(drop=True)
+        save_snapshot(hot, header, sheet_key, snapshot_path)
+    return summary, hot
+
+
+def main(argv=None):
+    import gspread
+
+    parser = argparse.ArgumentParser(description="Move old resolved reports from Sheet1 into the archive.")
+    parser.add_argument("--credentials", help="service account JSON file")
+    parser.add_argument("--sheet-key")
+    parser.add_argument("--worksheet", default="Sheet1")
+    parser.add_argument("--older-than-days", type=int, default=RESOLVED_RETENTION_DAYS)
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--municipality", help="archive only this municipality's reports (default: all)")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--reindex", action="store_true", help="rebuild the archive ID index and exit")
+    args = parser.parse_args(argv)
+
+    if args.reindex:
+        print(f"indexed {rebuild_index(args.archive_dir):,} archived reports")
+        return
+    if not args.credentials or not args.sheet_key:
+        parser.error("--credentials and --sheet-key are required")
+
+    client = gspread.service_account(filename=args.credentials)
+    sheet = client.open_by_key(args.sheet_key).worksheet(args.worksheet)
+    summary, hot = run_retention(
+        sheet, args.sheet_key, args.older_than_days, args.archive_dir, args.dry_run, municipality=args.municipality
+    )
+    verb = "would archive" if args.dry_run else "archived"
+    print(f"{verb} {summary['eligible']:,} reports into {summary['partitions']} partitions; "
+          f"{len(hot):,} reports remain in {args.worksheet}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""Local stand-ins for Google Sheets and SMTP used by the benchmark harness.
+
+Only the gspread / smtplib surface the apps actually touch is implemented.
+Every call is counted so the harness can report API calls per action.
+"""
+
+import random
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+REPORT_HEADER = [
+    "ReportID", "Name", "Contact", "Municipality", "Leak Type",
+    "Location", "DateTime", "ImageURL", "Status", "Notified"
+]
+ADMIN_HEADER = ["AdminCode", "AdminName", "Municipality"]
+
+MUNICIPALITIES = [
+    "City of Johannesburg", "City of Cape Town", "eThekwini",
+    "Buffalo City", "Mangaung", "Nelson Mandela Bay", "Other"
+]
+LEAK_TYPES = ["Burst Pipe", "Leakage", "Sewage Overflow", "Other"]
+
+
+# ---------------------- CALL COUNTER ----------------------
+class CallCounter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = Counter()
+
+    def hit(self, name):
+        with self._lock:
+            self.calls[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.calls)
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+
+
+# ---------------------- FAKE SHEETS ----------------------
+class FakeWorksheet:
+    def __init__(self, title, header, rows, counter):
+        self.title = title
+        self.header = list(header)
+        self.rows = [list(r) for r in rows]
+        self.counter = counter
+
+    def _records(self):
+        return [dict(zip(self.header, row)) for row in self.rows]
+
+    def get_all_records(self):
+        self.counter.hit("get_all_records")
+        return self._records()
+
+    def get_all_values(self):
+        self.counter.hit("get_all_values")
+        return [list(self.header)] + [list(r) for r in self.rows]
+
+    def row_values(self, row):
+        self.counter.hit("row_values")
+        values = [self.header] + self.rows
+        return list(values[row - 1]) if 0 < row <= len(values) else []
+
+    def col_values(self, col):
+        self.counter.hit("col_values")
+        values = [self.header] + self.rows
+        return [r[col - 1] if col - 1 < len(r) else "" for r in values]
+
+    def get(self, range_name):
+        self.counter.hit("get")
+        return self._range(range_name)
+
+    def batch_get(self, ranges):
+        self.counter.hit("batch_get")
+        return [self._range(r) for r in ranges]
+
+    def _range(self, range_name):
+        """Values for simple A1 ranges: '1:1', 'C2:C', 'A10:J', 'A2:J50'."""
+        values = [self.header] + self.rows
+        start, _, end = range_name.partition(":")
+        c0, r0 = _split_a1(start)
+        c1, r1 = _split_a1(end or start)
+        rows = values[(r0 or 1) - 1:r1 or len(values)]
+        c0 = c0 or 1
+        c1 = c1 or max((len(r) for r in rows), default=0)
+        out = [[str(v) for v in r[c0 - 1:c1]] for r in rows]
+        while out and not any(v != "" for v in out[-1]):
+            out.pop()
+        return out
+
+    def find(self, query, in_row=None, in_column=None):
+        self.counter.hit("find")
+        for r, row in enumerate([self.header] + self.rows, start=1):
+            if in_row is not None and r != in_row:
+                continue
+            for c, value in enumerate(row, start=1):
+                if in_column is not None and c != in_column:
+                    continue
+                if str(value) == str(query):
+                    return SimpleNamespace(row=r, col=c, value=value)
+        return None
+
+    def update_cell(self, row, col, value):
+        self.counter.hit("update_cell")
+        self._set(row, col, value)
+
+    def _set(self, row, col, value):
+        if row == 1:
+            self.header[col - 1] = value
+            return
+        target = self.rows[row - 2]
+        while len(target) < col:
+            target.append("")
+        target[col - 1] = value
+
+    def append_row(self, values, **kwargs):
+        self.counter.hit("append_row")
+        self.rows.append(list(values))
+
+    def append_rows(self, values, **kwargs):
+        self.counter.hit("append_rows")
+        self.rows.extend(list(v) for v in values)
+
+    def batch_update(self, data, **kwargs):
+        self.counter.hit("batch_update")
+        for item in data:
+            col, row = _split_a1(item["range"])
+            self._set(row, col, item["values"][0][0])
+
+
+def _split_a1(ref):
+    letters = "".join(c for c in ref if c.isalpha())
+    digits = "".join(c for c in ref if c.isdigit())
+    col = 0
+    for c in letters.upper():
+        col = col * 26 + ord(c) - 64
+    return col or None, int(digits) if digits else None
+
+
+class FakeSpreadsheet:
+    def __init__(self, worksheets, counter):
+        self._worksheets = {ws.title: ws for ws in worksheets}
+        self.counter = counter
+        for i, ws in enumerate(worksheets):
+            ws.id, ws.spreadsheet = i, self
+
+    def batch_update(self, body):
+        self.counter.hit("spreadsheet_batch_update")
+        sheets = list(self._worksheets.values())
+        for request in body["requests"]:
+            span = request["deleteDimension"]["range"]
+            # startIndex is 0-based over the whole sheet; row 0 is the header.
+            del sheets[span["sheetId"]].rows[span["startIndex"] - 1:span["endIndex"] - 1]
+
+    @property
+    def sheet1(self):
+        return next(iter(self._worksheets.values()))
+
+    def worksheet(self, title):
+        self.counter.hit("worksheet")
+        return self._worksheets[title]
+
+    def worksheets(self):
+        self.counter.hit("worksheets")
+        return list(self._worksheets.values())
+
+
+class FakeClient:
+    def __init__(self, spreadsheet, counter):
+        self.spreadsheet = spreadsheet
+        self.counter = counter
+
+    def open_by_key(self, key):
+        self.counter.hit("open_by_key")
+        return self.spreadsheet
+
+
+# ---------------------- SMTP SINK ----------------------
+class SMTPSink:
+    """Drop-in for smtplib.SMTP that keeps messages in memory."""
+
+    messages = []
+    counter = None
+
+    def __init__(self, host="", port=0, *args, **kwargs):
+        self.host = host
+        self.port = port
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def login(self, user, password):
+        if self.counter is not None:
+            self.counter.hit("smtp_login")
+
+    def send_message(self, msg, *args, **kwargs):
+        if self.counter is not None:
+            self.counter.hit("smtp_send")
+        SMTPSink.messages.append(msg)
+
+    def quit(self):
+        pass
+
+
+# ---------------------- DATA ----------------------
+def make_report_rows(n, seed=0):
+    rng = random.Random(seed)
+    start = datetime(2023, 1, 1)
+    rows = []
+    for i in range(n):
+        lat = -34.0 + rng.random() * 12
+        lon = 18.0 + rng.random() * 14
+        rows.append([
+            f"{i:08X}",
+            f"Citizen {i}",
+            f"citizen{i}@example.org",
+            rng.choice(MUNICIPALITIES),
+            rng.choice(LEAK_TYPES),
+            f"{lat:.5f},{lon:.5f}",
+            (start + timedelta(minutes=17 * i)).strftime("%Y-%m-%d %H:%M:%S"),
+            "",
+            "Resolved" if rng.random() < 0.6 else "Pending",
+            "",
+        ])
+    return rows
+
+
+def make_backend(n_reports, seed=0):
+    counter = CallCounter()
+    reports = FakeWorksheet("Sheet1", REPORT_HEADER, make_report_rows(n_reports, seed), counter)
+    admins = FakeWorksheet(
+        "Sheet2", ADMIN_HEADER,
+        [[f"ADMIN{i}", f"Admin {i}", muni] for i, muni in enumerate(MUNICIPALITIES)],
+        counter
+    )
+    client = FakeClient(FakeSpreadsheet([reports, admins], counter), counter)
+    return client, counter
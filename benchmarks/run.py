@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""Headless load and latency benchmark for the citizen and admin apps.
+
+Drives the Submit Report, Check Status, Dashboard and Manage Reports flows
+through Streamlit's AppTest against the in-memory Sheets backend and SMTP sink
+in benchmarks/fakes.py. Each report-count size runs in a fresh process so the
+peak RSS figure belongs to that size only.
+
+Run from the repository root:
+
+    python -m benchmarks.run
+    python -m benchmarks.run --sizes 1000 10000 --iterations 20
+    python -m benchmarks.run --compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import platform
+import resource
+import smtplib
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+from benchmarks.fakes import SMTPSink, make_backend
+
+ROOT = Path(__file__).resolve().parent.parent
+CITIZEN_APP = str(ROOT / "leak_report_app_py.py")
+ADMIN_APP = str(ROOT / "admin.py")
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+FLOWS = ["submit", "check_status", "dashboard", "manage_reports"]
+
+SECRETS = {
+    "google_service_account": {"type": "service_account"},
+    "general": {"sheet_id": "benchmark"},
+    "mailtrap": {"user": "benchmark", "password": "benchmark"},
+    # Every iteration submits from one session; keep the throttle out of the measurement.
+    "rate_limit": {"session_capacity": 10**9, "email_capacity": 10**9},
+}
+
+
+# ---------------------- STATS ----------------------
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+def summarize(samples_ms, calls_per_action):
+    actions = max(len(calls_per_action), 1)
+    totals = {}
+    for calls in calls_per_action:
+        for name, count in calls.items():
+            totals[name] = totals.get(name, 0) + count
+    return {
+        "samples": len(samples_ms),
+        "p50_ms": percentile(samples_ms, 50),
+        "p95_ms": percentile(samples_ms, 95),
+        "p99_ms": percentile(samples_ms, 99),
+        "api_calls_per_action": {k: v / actions for k, v in sorted(totals.items())},
+    }
+
+
+def peak_rss_kb():
+    # ru_maxrss is kilobytes on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+# ---------------------- APP DRIVERS ----------------------
+def _app(path, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(path, default_timeout=timeout)
+    for section, values in SECRETS.items():
+        at.secrets[section] = values
+    return at
+
+
+def _by_label(widgets, label):
+    return next(w for w in widgets if w.label == label)
+
+
+def _timed(at, counter):
+    counter.reset()
+    start = time.perf_counter()
+    at.run()
+    elapsed = (time.perf_counter() - start) * 1000
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return elapsed, counter.snapshot()
+
+
+def _admin_app(page, timeout):
+    at = _app(ADMIN_APP, timeout)
+    at.session_state["logged_in"] = True
+    at.session_state["page"] = page
+    at.session_state["admin_name"] = "Admin 0"
+    at.session_state["admin_municipality"] = "City of Johannesburg"
+    return at
+
+
+def bench_submit(counter, iterations, timeout, client):
+    at = _app(CITIZEN_APP, timeout)
+    at.run()
+    at.sidebar.radio[0].set_value("Submit Report")
+    at.run()
+    samples, calls = [], []
+    for i in range(iterations):
+        _by_label(at.text_input, "Full Name").input(f"Benchmark {i}")
+        _by_label(at.text_input, "Email Address").input(f"bench{i}@example.org")
+        _by_label(at.text_input, "Location (Address or Coordinates)").input("-26.2041,28.0473")
+        _by_label(at.button, "Submit Report").click()
+        elapsed, snapshot = _timed(at, counter)
+        samples.append(elapsed)
+        calls.append(snapshot)
+    return summarize(samples, calls)
+
+
+def bench_check_status(counter, iterations, timeout, client):
+    rows = client.spreadsheet.worksheet("Sheet1").rows
+    at = _app(CITIZEN_APP, timeout)
+    at.run()
+    at.sidebar.radio[0].set_value("Check Status")
+    at.run()
+    samples, calls = [], []
+    for i in range(iterations):
+        report_id = rows[(i * 7919) % len(rows)][0] if rows else "MISSING"
+        _by_label(at.text_input, "Enter Your Report ID").input(report_id)
+        _by_label(at.button, "Check Status").click()
+        elapsed, snapshot = _timed(at, counter)
+        samples.append(elapsed)
+        calls.append(snapshot)
+    return summarize(samples, calls)
+
+
+def bench_dashboard(counter, iterations, timeout, client):
+    at = _admin_app("Dashboard", timeout)
+    cold_ms, cold_calls = _timed(at, counter)
+    samples, calls = [], []
+    for _ in range(iterations):
+        elapsed, snapshot = _timed(at, counter)
+        samples.append(elapsed)
+        calls.append(snapshot)
+    result = summarize(samples, calls)
+    result.update(cold_ms=cold_ms, cold_api_calls=cold_calls)
+    return result
+
+
+def bench_manage_reports(counter, iterations, timeout, client):
+    at = _admin_app("Manage Reports", timeout)
+    cold_ms, cold_calls = _timed(at, counter)
+    samples, calls = [], []
+    for i in range(iterations):
+        updates = [b for b in at.button if str(b.key).startswith("update_")]
+        if not updates:
+            break
+        updates[i % len(updates)].click()
+        elapsed, snapshot = _timed(at, counter)
+        samples.append(elapsed)
+        calls.append(snapshot)
+    result = summarize(samples, calls)
+    result.update(cold_ms=cold_ms, cold_api_calls=cold_calls)
+    return result
+
+
+BENCHMARKS = {
+    "submit": bench_submit,
+    "check_status": bench_check_status,
+    "dashboard": bench_dashboard,
+    "manage_reports": bench_manage_reports,
+}
+
+
+# ---------------------- RUNNER ----------------------
+def run_size(n_reports, flows, iterations, timeout):
+    """Run every flow against a backend holding n_reports rows (one process per size)."""
+    from google.oauth2.service_account import Credentials
+
+    import snapshot
+
+    os.chdir(ROOT)
+    client, counter = make_backend(n_reports)
+    SMTPSink.counter = counter
+    result = {"reports": n_reports, "flows": {}}
+
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch("gspread.authorize", return_value=client))
+        stack.enter_context(mock.patch.object(Credentials, "from_service_account_info", return_value=object()))
+        stack.enter_context(mock.patch.object(smtplib, "SMTP", SMTPSink))
+        # Fresh host snapshot per size: the first admin flow pulls the sheet, later ones share it.
+        cache_dir = stack.enter_context(tempfile.TemporaryDirectory(prefix="dropwatch-bench-"))
+        stack.enter_context(mock.patch.object(snapshot, "SNAPSHOT_PATH", os.path.join(cache_dir, "reports.arrow")))
+        for name in flows:
+            try:
+                result["flows"][name] = BENCHMARKS[name](counter, iterations, timeout, client)
+            except Exception as e:
+                result["flows"][name] = {"error": f"{type(e).__name__}: {e}"}
+
+    result["peak_rss_kb"] = peak_rss_kb()
+    return result
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return ""
+
+
+def run(sizes, flows, iterations, timeout, output=None):
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for n in sizes:
+        print(f"[bench] {n:,} reports ...", flush=True)
+        with ctx.Pool(1) as pool:
+            result = pool.apply(run_size, (n, flows, iterations, timeout))
+        for name, stats in result["flows"].items():
+            if "error" in stats:
+                print(f"    {name:<15} ERROR {stats['error']}")
+            else:
+                print(f"    {name:<15} p50={stats['p50_ms']:.1f}ms p95={stats['p95_ms']:.1f}ms p99={stats['p99_ms']:.1f}ms")
+        print(f"    peak RSS {result['peak_rss_kb'] / 1024:.1f} MiB")
+        results.append(result)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "iterations": iterations,
+        },
+        "results": results,
+    }
+    if output is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        output = RESULTS_DIR / f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    Path(output).write_text(json.dumps(report, indent=2, default=str))
+    print(f"[bench] results written to {output}")
+    return report
+
+
+# ---------------------- COMPARE ----------------------
+def compare(baseline_path, candidate_path, threshold=0.10):
+    """Print p95 / API call deltas between two result files; return the number of regressions."""
+    def index(path):
+        data = json.loads(Path(path).read_text())
+        return {(r["reports"], flow): stats for r in data["results"] for flow, stats in r["flows"].items()}
+
+    baseline, candidate = index(baseline_path), index(candidate_path)
+    regressions = 0
+    for key in sorted(set(baseline) & set(candidate)):
+        old, new = baseline[key], candidate[key]
+        if "error" in old or "error" in new or not old.get("p95_ms"):
+            continue
+        change = (new["p95_ms"] - old["p95_ms"]) / old["p95_ms"]
+        old_calls = sum(old["api_calls_per_action"].values())
+        new_calls = sum(new["api_calls_per_action"].values())
+        flag = ""
+        if change > threshold or new_calls > old_calls:
+            flag = "  <-- REGRESSION"
+            regressions += 1
+        print(f"{key[0]:>10,} {key[1]:<15} p95 {old['p95_ms']:.1f} -> {new['p95_ms']:.1f} ms "
+              f"({change:+.0%}), calls {old_calls:.1f} -> {new_calls:.1f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drop Watch SA load / latency benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--flows", nargs="+", choices=FLOWS, default=FLOWS)
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--timeout", type=float, default=300, help="per-rerun timeout in seconds")
+    parser.add_argument("--output", help="result JSON path (default: benchmarks/results/bench_<timestamp>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CANDIDATE"))
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed p95 slowdown when comparing")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return 1 if compare(*args.compare, threshold=args.threshold) else 0
+    run(args.sizes, args.flows, args.iterations, args.timeout, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
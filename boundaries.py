@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""Municipality assignment by point-in-polygon over data/municipal_boundaries.geojson.
+
+Polygons are registered in a regular lat/lon grid by bounding box. To classify
+a batch of points, points are grouped by grid cell and each group is only
+ray-cast against the polygons that touch its cell, with numpy doing the
+edge crossings for every point in the group at once. Points outside every
+polygon get "Other".
+"""
+
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+BOUNDARIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "municipal_boundaries.geojson")
+CELL_DEGREES = 0.25
+DEFAULT_MUNICIPALITY = "Other"
+
+_COORDINATES = r"^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$"
+
+
+class Polygon:
+    """One municipality polygon: an outer ring and optional holes, as (lon, lat) arrays."""
+
+    def __init__(self, name, rings):
+        self.name = name
+        self.rings = [np.asarray(r, dtype=float) for r in rings]
+        outer = self.rings[0]
+        self.min_lon, self.min_lat = outer.min(axis=0)
+        self.max_lon, self.max_lat = outer.max(axis=0)
+
+    @staticmethod
+    def _inside_ring(ring, lons, lats):
+        x1, y1 = ring[:-1, 0], ring[:-1, 1]
+        x2, y2 = ring[1:, 0], ring[1:, 1]
+        # points along axis 0, edges along axis 1
+        px, py = lons[:, None], lats[:, None]
+        crosses = (y1 > py) != (y2 > py)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_at = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+        return np.count_nonzero(crosses & (px < x_at), axis=1) % 2 == 1
+
+    def contains(self, lons, lats):
+        inside = ((lons >= self.min_lon) & (lons <= self.max_lon) &
+                  (lats >= self.min_lat) & (lats <= self.max_lat))
+        if not inside.any():
+            return inside
+        idx = np.flatnonzero(inside)
+        hit = self._inside_ring(self.rings[0], lons[idx], lats[idx])
+        for hole in self.rings[1:]:
+            hit &= ~self._inside_ring(hole, lons[idx], lats[idx])
+        inside[idx] = hit
+        return inside
+
+
+class MunicipalBoundaries:
+    def __init__(self, polygons, cell=CELL_DEGREES):
+        self.polygons = list(polygons)
+        self.cell = cell
+        self._grid = {}
+        for i, polygon in enumerate(self.polygons):
+            for gx in range(self._cell(polygon.min_lon), self._cell(polygon.max_lon) + 1):
+                for gy in range(self._cell(polygon.min_lat), self._cell(polygon.max_lat) + 1):
+                    self._grid.setdefault((gx, gy), []).append(i)
+
+    @classmethod
+    def from_geojson(cls, path=BOUNDARIES_PATH):
+        with open(path, encoding="utf-8") as f:
+            collection = json.load(f)
+        polygons = []
+        for feature in collection["features"]:
+            name = feature["properties"]["municipality"]
+            geometry = feature["geometry"]
+            parts = [geometry["coordinates"]] if geometry["type"] == "Polygon" else geometry["coordinates"]
+            polygons.extend(Polygon(name, rings) for rings in parts)
+        return cls(polygons)
+
+    def _cell(self, value):
+        return int(np.floor(value / self.cell))
+
+    @property
+    def municipalities(self):
+        return sorted({p.name for p in self.polygons})
+
+    def classify(self, lats, lons, default=DEFAULT_MUNICIPALITY):
+        """Municipality name for every (lat, lon); NaN coordinates and misses get `default`."""
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        result = np.full(lats.shape, default, dtype=object)
+        valid = np.flatnonzero(np.isfinite(lats) & np.isfinite(lons))
+        if not len(valid):
+            return result
+
+        gx = np.floor(lons[valid] / self.cell).astype(np.int64)
+        gy = np.floor(lats[valid] / self.cell).astype(np.int64)
+        cells, inverse = np.unique(np.stack([gx, gy], axis=1), axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.searchsorted(inverse[order], np.arange(len(cells) + 1))
+
+        for c, (cx, cy) in enumerate(cells):
+            candidates = self._grid.get((int(cx), int(cy)))
+            if not candidates:
+                continue
+            members = valid[order[bounds[c]:bounds[c + 1]]]
+            unassigned = np.ones(len(members), dtype=bool)
+            for i in candidates:
+                todo = np.flatnonzero(unassigned)
+                if not len(todo):
+                    break
+                hit = self.polygons[i].contains(lons[members[todo]], lats[members[todo]])
+                result[members[todo[hit]]] = self.polygons[i].name
+                unassigned[todo[hit]] = False
+        return result
+
+    def classify_point(self, lat, lon, default=DEFAULT_MUNICIPALITY):
+        return self.classify([lat], [lon], default)[0]
+
+
+@lru_cache(maxsize=1)
+def get_boundaries():
+    return MunicipalBoundaries.from_geojson()
+
+
+def classify_point(lat, lon, default=DEFAULT_MUNICIPALITY):
+    return get_boundaries().classify_point(lat, lon, default)
+
+
+# ---------------------- BULK BACKFILL ----------------------
+def report_coordinates(df, geocode_text=True):
+    """(lat, lon) float arrays for a report frame.
+
+    Uses Latitude/Longitude where present, then a "lat,lon" Location string,
+    then (unless geocode_text is False) the offline geocoder on the remaining
+    free-text Locations, once per distinct string.
+    """
+    lats = pd.Series(np.nan, index=df.index)
+    lons = pd.Series(np.nan, index=df.index)
+    if "Latitude" in df.columns and "Longitude" in df.columns:
+        lats = pd.to_numeric(df["Latitude"], errors="coerce")
+        lons = pd.to_numeric(df["Longitude"], errors="coerce")
+
+    if "Location" in df.columns:
+        missing = lats.isna() | lons.isna()
+        if missing.any():
+            location = df.loc[missing, "Location"].astype(str)
+            parsed = location.str.extract(_COORDINATES).astype(float)
+            lats.loc[missing] = parsed[0]
+            lons.loc[missing] = parsed[1]
+
+        missing = lats.isna() | lons.isna()
+        if geocode_text and missing.any():
+            from geocoder import geocode
+
+            texts = df.loc[missing, "Location"].astype(str)
+            places = {text: geocode(text) for text in texts.unique()}
+            lats.loc[missing] = texts.map(lambda t: places[t].lat if places[t] else np.nan)
+            lons.loc[missing] = texts.map(lambda t: places[t].lon if places[t] else np.nan)
+    return lats.to_numpy(dtype=float), lons.to_numpy(dtype=float)
+
+
+def backfill_municipalities(df):
+    """Classified municipality per report and a mask of rows where it differs from the stored one.
+
+    Only a boundary match re-files a report: reports that cannot be located, or
+    that fall outside every boundary, keep their stored municipality.
+    """
+    lats, lons = report_coordinates(df)
+    classified = pd.Series(get_boundaries().classify(lats, lons, default=None), index=df.index)
+    stored = df["Municipality"].astype(str) if "Municipality" in df.columns else pd.Series("", index=df.index)
+    matched = classified.notna()
+    classified[~matched] = stored[~matched]
+    return classified, classified != stored
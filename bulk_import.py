@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""Bulk import and replay of leak reports into Sheet1.
+
+Reads a CSV (header row) or JSONL file of reports, validates each one with
+the same rules as the submit form (schema.validate_report) and appends the
+valid ones in chunks with append_rows: one API call per chunk instead of one
+append_row per report. Rejected records go to <input>.rejects.jsonl with their
+line number and errors.
+
+Resuming: after every chunk the number of input records handled is written to
+<input>.import-state.json, and a rerun on the same file skips them. Reports
+without a reference get a code derived from the file's digest and their record
+number, so a rerun regenerates the same codes. Together with the skip of
+references already in the sheet, a crash between an append and its checkpoint
+does not duplicate rows.
+
+Nothing here imports Streamlit:
+
+    python bulk_import.py --credentials service_account.json --sheet-key <key> reports.csv
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+import uuid
+
+from schema import report_to_row, sheet_header, validate_report
+from snapshot import id_column
+
+CHUNK_SIZE = 500          # reports per append_rows call
+MAX_RETRIES = 5           # per chunk, for quota (429) and transient 5xx errors
+RETRY_BACKOFF = 2.0       # seconds, doubled after each retry
+
+
+# ---------------------- INPUT ----------------------
+def read_records(path, fmt=None):
+    """Yield (record number, dict) from a CSV or JSONL file; numbers start at 1."""
+    fmt = fmt or ("jsonl" if path.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv")
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if fmt == "csv":
+            yield from enumerate(csv.DictReader(f), start=1)
+            return
+        number = 0
+        for line in f:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                record = {"_error": f"invalid JSON: {e}", "_line": line.rstrip("\n")}
+            if not isinstance(record, dict):
+                record = {"_error": "not a JSON object", "_line": line.rstrip("\n")}
+            yield number, record
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def stable_reference(digest, number):
+    """Reference code for a record without one; the same on every run over the same file."""
+    return uuid.uuid5(uuid.NAMESPACE_URL, f"dropwatch-import:{digest}:{number}").hex[:8].upper()
+
+
+# ---------------------- CHECKPOINT ----------------------
+def state_path(path):
+    return f"{path}.import-state.json"
+
+
+def rejects_path(path):
+    return f"{path}.rejects.jsonl"
+
+
+def load_state(path, digest):
+    """Checkpoint for this exact input file, or a fresh one."""
+    try:
+        with open(state_path(path)) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = None
+    if not state or state.get("digest") != digest:
+        return {"digest": digest, "done": 0, "appended": 0, "rejected": 0, "skipped": 0}
+    return state
+
+
+def save_state(path, state):
+    tmp = f"{state_path(path)}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, state_path(path))
+
+
+# ---------------------- SHEET ----------------------
+def append_with_retry(sheet, rows):
+    from gspread.exceptions import APIError
+
+    delay = RETRY_BACKOFF
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return sheet.append_rows(rows)
+        except APIError as e:
+            code = getattr(getattr(e, "response", None), "status_code", None)
+            if attempt == MAX_RETRIES or code not in (429, 500, 502, 503, 504):
+                raise
+            time.sleep(delay)
+            delay *= 2
+
+
+def sheet_layout(sheet):
+    """(header, IDs already in the sheet) with two reads."""
+    header = sheet_header(sheet.row_values(1))
+    key = id_column(header)
+    existing = set()
+    if key is not None:
+        existing = {str(v).strip().upper() for v in sheet.col_values(header.index(key) + 1)[1:]}
+    return header, existing
+
+
+# ---------------------- IMPORT ----------------------
+def import_reports(sheet, path, fmt=None, chunk_size=CHUNK_SIZE, resume=True, dry_run=False, progress=None):
+    """Validate and append every report in `path`. Returns the final checkpoint dict.
+
+    `progress(state)` is called after every chunk. With dry_run nothing is
+    appended and no checkpoint is written; the counts show what would happen.
+    """
+    digest = file_digest(path)
+    state = load_state(path, digest) if resume else {
+        "digest": digest, "done": 0, "appended": 0, "rejected": 0, "skipped": 0
+    }
+    header, seen = sheet_layout(sheet)
+    if state["done"] == 0 and not dry_run and os.path.exists(rejects_path(path)):
+        os.remove(rejects_path(path))
+
+    rows, rejects = [], []
+
+    def flush(done):
+        if rows and not dry_run:
+            append_with_retry(sheet, rows)
+        if rejects and not dry_run:
+            with open(rejects_path(path), "a") as f:
+                f.writelines(json.dumps(r) + "\n" for r in rejects)
+        state["appended"] += len(rows)
+        state["rejected"] += len(rejects)
+        state["done"] = done
+        if not dry_run:
+            save_state(path, state)
+        rows.clear()
+        rejects.clear()
+        if progress is not None:
+            progress(state)
+
+    number = state["done"]
+    for number, record in read_records(path, fmt):
+        if number <= state["done"]:
+            continue
+        if "_error" in record:
+            report, errors = None, [record["_error"]]
+        else:
+            report, errors = validate_report(record, reference=stable_reference(digest, number))
+        if errors:
+            rejects.append({"record": number, "errors": errors, "input": record})
+        elif report["Reference"] in seen:
+            state["skipped"] += 1  # already in the sheet: imported before, or a duplicate in the file
+        else:
+            seen.add(report["Reference"])
+            rows.append(report_to_row(report, header))
+        if len(rows) >= chunk_size:
+            flush(number)
+    flush(number)
+    state["finished"] = True
+    if not dry_run:
+        save_state(path, state)
+    return state
+
+
+def main(argv=None):
+    import gspread
+
+    parser = argparse.ArgumentParser(description="Validate and bulk-append leak reports from a CSV or JSONL file.")
+    parser.add_argument("input", help="CSV with a header row, or JSONL with one report object per line")
+    parser.add_argument("--credentials", required=True, help="service account JSON file")
+    parser.add_argument("--sheet-key", required=True)
+    parser.add_argument("--worksheet", default="Sheet1")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="default: from the file extension")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from the first record")
+    parser.add_argument("--dry-run", action="store_true", help="validate only; append nothing")
+    args = parser.parse_args(argv)
+
+    client = gspread.service_account(filename=args.credentials)
+    sheet = client.open_by_key(args.sheet_key).worksheet(args.worksheet)
+    started, first = time.perf_counter(), None
+
+    def progress(state):
+        nonlocal first
+        first = state["done"] if first is None else first
+        rate = (state["done"] - first) / max(time.perf_counter() - started, 1e-9)
+        print(f"record {state['done']:,}: {state['appended']:,} appended, {state['rejected']:,} rejected, "
+              f"{state['skipped']:,} already present ({rate:,.0f} records/s)", file=sys.stderr, flush=True)
+
+    state = import_reports(sheet, args.input, args.format, args.chunk_size, not args.restart, args.dry_run, progress)
+    verb = "would append" if args.dry_run else "appended"
+    print(f"{verb} {state['appended']:,} reports; {state['rejected']:,} rejected"
+          + (f" (see {rejects_path(args.input)})" if state["rejected"] and not args.dry_run else "")
+          + f"; {state['skipped']:,} already present")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+"""Headless Drop Watch services shared by the Streamlit apps, the HTTP API and workers.
+
+Nothing in this package imports Streamlit or reads st.secrets; build a Config
+(Config.from_mapping(st.secrets) in the apps, Config.from_env() elsewhere) and
+hand it to the services.
+"""
+
+from core.analytics import AnalyticsService
+from core.config import Config
+from core.notifications import NotificationService
+from core.reports import InvalidReport, ReportsService
+
+__all__ = ["AnalyticsService", "Config", "InvalidReport", "NotificationService", "ReportsService"]
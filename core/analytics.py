@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""Dashboard metrics over a report frame, with no charting or UI attached."""
+
+import pandas as pd
+
+
+class AnalyticsService:
+    def __init__(self, df):
+        self.df = df
+
+    def for_municipality(self, municipality):
+        if "Municipality" not in self.df.columns:
+            return self
+        return AnalyticsService(self.df[self.df["Municipality"] == municipality])
+
+    def totals(self):
+        """{"total", "resolved", "pending"} report counts."""
+        status = self.df["Status"] if "Status" in self.df.columns else pd.Series(dtype=object)
+        return {
+            "total": len(self.df),
+            "resolved": int((status == "Resolved").sum()),
+            "pending": int((status == "Pending").sum()),
+        }
+
+    def _counts(self, column, label="Count"):
+        if column not in self.df.columns:
+            return pd.DataFrame(columns=[column, label])
+        counts = self.df[column].value_counts().reset_index()
+        counts.columns = [column, label]
+        return counts
+
+    def by_leak_type(self):
+        return self._counts("Leak Type")
+
+    def by_status(self):
+        return self._counts("Status")
+
+    def top_municipalities(self, n=3):
+        return self._counts("Municipality", "Reports").head(n)
+
+    def submissions(self):
+        """Submission times as datetimes, unparseable ones dropped."""
+        if "DateTime" not in self.df.columns:
+            return pd.Series(dtype="datetime64[ns]")
+        return pd.to_datetime(self.df["DateTime"], errors="coerce").dropna()
+
+    def daily_counts(self):
+        submitted = self.submissions()
+        return submitted.groupby(submitted.dt.date).size().rename_axis("DateTime").reset_index(name="Count")
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Service configuration, injected instead of read from st.secrets."""
+
+import json
+import os
+from dataclasses import dataclass, field
+
+RESOLVED_RETENTION_DAYS = 365  # resolved reports older than this move to the archive
+
+
+@dataclass(frozen=True)
+class Config:
+    sheet_key: str
+    service_account_info: dict = field(default_factory=dict, repr=False)
+    worksheet: str = "Sheet1"
+    smtp_host: str = "sandbox.smtp.mailtrap.io"
+    smtp_port: int = 2525
+    smtp_user: str = ""
+    smtp_password: str = field(default="", repr=False)
+    sender_email: str = "leak-reporter@municipality.org"
+    rate_limits: dict = field(default_factory=dict)
+    retention_days: int = RESOLVED_RETENTION_DAYS
+    # The API sees the real client address: no proxy in front, or uvicorn run with
+    # --proxy-headers --forwarded-allow-ips=<load balancer addresses>.
+    trust_client_ip: bool = False
+
+    @classmethod
+    def from_mapping(cls, secrets, **overrides):
+        """From a secrets.toml-shaped mapping (st.secrets in the apps, a parsed file elsewhere)."""
+        mailtrap = secrets.get("mailtrap", {})
+        values = {
+            "sheet_key": secrets.get("general", {}).get("sheet_id", ""),
+            "service_account_info": dict(secrets.get("google_service_account", {})),
+            "smtp_user": mailtrap.get("user", ""),
+            "smtp_password": mailtrap.get("password", ""),
+            "rate_limits": dict(secrets.get("rate_limit", {})),
+            "retention_days": int(secrets.get("retention", {}).get("resolved_days", RESOLVED_RETENTION_DAYS)),
+            "trust_client_ip": bool(secrets.get("api", {}).get("trust_client_ip", False)),
+        }
+        values.update(overrides)
+        return cls(**values)
+
+    @classmethod
+    def from_env(cls, environ=None):
+        """From DROPWATCH_* variables, for processes that run without Streamlit.
+
+        DROPWATCH_SECRETS may point at a secrets.toml; individual variables
+        override it. DROPWATCH_SERVICE_ACCOUNT is a service account JSON file.
+        """
+        env = os.environ if environ is None else environ
+        secrets = {}
+        if env.get("DROPWATCH_SECRETS"):
+            import tomllib
+
+            with open(env["DROPWATCH_SECRETS"], "rb") as f:
+                secrets = tomllib.load(f)
+        overrides = {}
+        if env.get("DROPWATCH_SHEET_KEY"):
+            overrides["sheet_key"] = env["DROPWATCH_SHEET_KEY"]
+        if env.get("DROPWATCH_SERVICE_ACCOUNT"):
+            with open(env["DROPWATCH_SERVICE_ACCOUNT"]) as f:
+                overrides["service_account_info"] = json.load(f)
+        if env.get("DROPWATCH_SMTP_USER"):
+            overrides["smtp_user"] = env["DROPWATCH_SMTP_USER"]
+        if env.get("DROPWATCH_SMTP_PASSWORD"):
+            overrides["smtp_password"] = env["DROPWATCH_SMTP_PASSWORD"]
+        if env.get("DROPWATCH_TRUST_CLIENT_IP"):
+            overrides["trust_client_ip"] = env["DROPWATCH_TRUST_CLIENT_IP"].lower() in ("1", "true", "yes")
+        config = cls.from_mapping(secrets, **overrides)
+        if not config.sheet_key:
+            raise ValueError("no sheet key: set DROPWATCH_SHEET_KEY or [general] sheet_id in DROPWATCH_SECRETS")
+        return config
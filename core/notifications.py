@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""Citizen email: reference codes on submit, a note once a report is resolved."""
+
+import smtplib
+from email.message import EmailMessage
+
+from tracing import traced
+
+SIGNATURE = "Regards,\nMunicipal Water Department"
+
+
+class NotificationService:
+    def __init__(self, config):
+        self.config = config
+
+    @traced("smtp.send", external=True)
+    def send(self, to_email, subject, content):
+        """Raises on SMTP failure; callers decide whether that blocks anything."""
+        msg = EmailMessage()
+        msg["Subject"] = subject
+        msg["From"] = self.config.sender_email
+        msg["To"] = to_email
+        msg.set_content(content)
+        with smtplib.SMTP(self.config.smtp_host, self.config.smtp_port) as smtp:
+            smtp.login(self.config.smtp_user, self.config.smtp_password)
+            smtp.send_message(msg)
+
+    def send_reference(self, to_email, ref_code, name):
+        self.send(
+            to_email, "Your Water Leak Report",
+            f"Hi {name},\n\nThank you for reporting the leak.\nYour reference number is: {ref_code}\n"
+            f"Use this code to check the status.\n\n{SIGNATURE}"
+        )
+
+    def send_resolved(self, to_email, ref_code, name):
+        self.send(
+            to_email, "Your Water Leak Report has been Resolved",
+            f"Hi {name},\n\nYour report with ID {ref_code} has been resolved.\n"
+            f"Thank you for helping us save water!\n\n{SIGNATURE}"
+        )
+
+    def notify_if_resolved(self, report, reports):
+        """Email the reporter once their report is resolved; True if an email went out.
+
+        `reports` (a ReportsService) records the Notified flag so the email is
+        sent only once.
+        """
+        if report.get("Status") != "Resolved" or report.get("Notified") == "Yes":
+            return False
+        report_id = report.get("ReportID", report.get("Reference"))
+        self.send_resolved(report.get("Contact"), report_id, report.get("Name"))
+        reports.mark_notified(report_id)
+        return True
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""Report storage: submit, look up and flag reports in the sheet (and archive)."""
+
+import threading
+import time
+
+from events import ReportCreated, publish
+from schema import report_to_row, sheet_header, validate_submission
+from snapshot import id_column
+from tracing import instrument, traced
+
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive"
+]
+HEADER_TTL = 600  # seconds a fetched header row is reused
+
+
+class InvalidReport(ValueError):
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+class ReportsService:
+    """One per process. gspread calls are blocking; async callers run them in a thread pool.
+
+    `archive_lookup(report_id)` returns an archived report dict or None; the
+    apps wire in archive.find_report. Without it, find() only searches the sheet.
+    """
+
+    def __init__(self, config, client=None, archive_lookup=None):
+        self.config = config
+        self._client = client
+        self._sheet = None
+        self._header = (None, 0.0)
+        self._lock = threading.Lock()
+        self.archive_lookup = archive_lookup
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                import gspread
+                from google.oauth2.service_account import Credentials
+
+                creds = Credentials.from_service_account_info(self.config.service_account_info, scopes=SCOPES)
+                self._client = instrument(gspread.authorize(creds), "gspread", external=True)
+            return self._client
+
+    @property
+    def sheet(self):
+        if self._sheet is None:
+            spreadsheet = self.client.open_by_key(self.config.sheet_key)
+            if self.config.worksheet == "Sheet1":
+                self._sheet = spreadsheet.sheet1
+            else:
+                self._sheet = spreadsheet.worksheet(self.config.worksheet)
+        return self._sheet
+
+    def header(self):
+        """Sheet header row, cached for HEADER_TTL; the legacy layout if missing or unrecognisable."""
+        header, fetched = self._header
+        if header is None or time.monotonic() - fetched > HEADER_TTL:
+            try:
+                header = sheet_header(self.sheet.row_values(1))
+            except Exception:
+                header = sheet_header([])
+            self._header = (header, time.monotonic())
+        return header
+
+    # --- writes ---
+    @traced("reports.save")
+    def save(self, report):
+        self.sheet.append_row(report_to_row(report, self.header()))
+
+    def create(self, report):
+        """Store an already validated report and announce it to live admin sessions on this host."""
+        self.save(report)
+        publish(ReportCreated(report))
+        return report
+
+    def submit(self, record):
+        """Validate, store and announce a citizen's new report. Raises InvalidReport."""
+        report, errors = validate_submission(record)
+        if errors:
+            raise InvalidReport(errors)
+        return self.create(report)
+
+    def mark_notified(self, report_id):
+        cell = self.sheet.find(str(report_id))
+        col_num = self.sheet.find("Notified").col
+        self.sheet.update_cell(cell.row, col_num, "Yes")
+
+    # --- reads ---
+    @traced("reports.find")
+    def find(self, report_id):
+        """(report dict, "sheet" | "archive") for an ID, or (None, None).
+
+        Old resolved reports live in the archive, not the sheet.
+        """
+        report_id = str(report_id).strip()
+        header = self.header()
+        key = id_column(header)
+        if report_id and key is not None:
+            cell = self.sheet.find(report_id, in_column=header.index(key) + 1)
+            if cell is not None:
+                values = self.sheet.row_values(cell.row)
+                return dict(zip(header, values + [""] * (len(header) - len(values)))), "sheet"
+        archived = self.archive_lookup(report_id) if report_id and self.archive_lookup else None
+        return (archived, "archive") if archived is not None else (None, None)
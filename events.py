@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""Publish/subscribe bus for report events, shared by every process on the host.
+
+The submit flow publishes ReportCreated and the admin Manage Reports flow
+publishes StatusChanged. Admin sessions hold a Subscription in their session
+state and drain it on every rerun / fragment refresh to patch their cached
+report frame instead of re-downloading the whole sheet.
+
+The bus lives at module level, so it is shared by every session served by the
+same process (modules are imported once per process, not per rerun). The
+citizen app, the admin app and the API run as separate processes, so every
+event is also appended to a SQLite outbox on disk (DROPWATCH_EVENTS_PATH,
+cache/events.sqlite by default). Subscribers receive events from the outbox, in
+outbox order, whichever process published them: publishing polls straight
+away, and draining a subscription polls for the other processes' events. Only
+when the outbox cannot be reached are events handed to local subscribers
+directly. Outbox rows are pruned after OUTBOX_TTL seconds.
+"""
+
+import itertools
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+
+log = logging.getLogger("dropwatch.events")
+
+OUTBOX_PATH = os.environ.get("DROPWATCH_EVENTS_PATH", os.path.join("cache", "events.sqlite"))
+OUTBOX_TTL = 24 * 3600
+PRUNE_EVERY = 100  # appends between pruning passes
+
+
+# ---------------------- EVENTS ----------------------
+@dataclass(frozen=True)
+class ReportCreated:
+    report: dict
+    at: datetime = field(default_factory=datetime.now)
+
+    @property
+    def municipality(self):
+        return self.report.get("Municipality", "")
+
+
+@dataclass(frozen=True)
+class StatusChanged:
+    report_id: str
+    old_status: str
+    new_status: str
+    municipality: str = ""
+    at: datetime = field(default_factory=datetime.now)
+    resolved_at: str = ""
+    submitted_at: str = ""
+
+
+EVENT_TYPES = {cls.__name__: cls for cls in (ReportCreated, StatusChanged)}
+
+
+def encode(event):
+    payload = asdict(event)
+    payload["at"] = event.at.isoformat()
+    return type(event).__name__, json.dumps(payload, default=str)
+
+
+def decode(kind, payload):
+    fields = json.loads(payload)
+    fields["at"] = datetime.fromisoformat(fields["at"])
+    return EVENT_TYPES[kind](**fields)
+
+
+# ---------------------- OUTBOX ----------------------
+class Outbox:
+    """Append-only event log in a SQLite file, read back in id order by every process.
+
+    One connection per process (reopened after a fork), shared by its threads.
+    """
+
+    def __init__(self, path=OUTBOX_PATH):
+        self.path = path
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._appends = itertools.count(1)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connection(self):
+        """The process's connection; callers hold self._lock."""
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS events ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, origin TEXT, kind TEXT, payload TEXT, created REAL)"
+            )
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def append(self, event):
+        """Store an event; returns its outbox id."""
+        kind, payload = encode(event)
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                row_id = conn.execute(
+                    "INSERT INTO events (origin, kind, payload, created) VALUES (?, ?, ?, ?)",
+                    (self.origin, kind, payload, time.time())
+                ).lastrowid
+                if next(self._appends) % PRUNE_EVERY == 0:
+                    conn.execute("DELETE FROM events WHERE created < ?", (time.time() - OUTBOX_TTL,))
+        return row_id
+
+    def last_id(self):
+        with self._lock:
+            return self._connection().execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+
+    def since(self, cursor):
+        """(last id read, [events]) after `cursor`, this process's own included, in outbox order."""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT id, kind, payload FROM events WHERE id > ? ORDER BY id", (cursor,)
+            ).fetchall()
+        events = []
+        for row_id, kind, payload in rows:
+            try:
+                events.append(decode(kind, payload))
+            except (KeyError, TypeError, ValueError):
+                log.warning("skipping unreadable outbox event %s", row_id)
+        return (rows[-1][0] if rows else cursor), events
+
+
+# ---------------------- BUS ----------------------
+class Subscription:
+    """A bounded queue of events for one subscriber (usually one admin session)."""
+
+    def __init__(self, bus, token, predicate=None, maxsize=1000):
+        self._bus = bus
+        self.token = token
+        self.predicate = predicate
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def offer(self, event):
+        if self.predicate is not None and not self.predicate(event):
+            return
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # Keep the newest events; the subscriber can always reload the sheet.
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.dropped += 1
+            self.queue.put_nowait(event)
+
+    def drain(self):
+        self._bus.poll()
+        events = []
+        while True:
+            try:
+                events.append(self.queue.get_nowait())
+            except queue.Empty:
+                return events
+
+    def close(self):
+        self._bus.unsubscribe(self.token)
+
+
+class EventBus:
+    def __init__(self, outbox=None):
+        self._lock = threading.Lock()
+        self._tokens = itertools.count(1)
+        # Weak references: a subscription disappears with the session that owns it.
+        self._subscribers = weakref.WeakValueDictionary()
+        self.outbox = outbox
+        self._poll_lock = threading.Lock()
+        self._cursor = None  # outbox id read up to; set by the first subscriber
+
+    def subscribe(self, predicate=None, maxsize=1000):
+        if self.outbox is not None and self._cursor is None:
+            # Subscribers start from a fresh frame, so earlier outbox rows are not replayed.
+            with self._poll_lock:
+                if self._cursor is None:
+                    self._cursor = self._outbox_call(self.outbox.last_id)
+        with self._lock:
+            sub = Subscription(self, next(self._tokens), predicate, maxsize)
+            self._subscribers[sub.token] = sub
+        return sub
+
+    def _outbox_call(self, method, *args):
+        try:
+            return method(*args)
+        except (sqlite3.Error, OSError):
+            # Sessions in this process still get the event; others catch up from the snapshot.
+            log.warning("event outbox %s failed", self.outbox.path, exc_info=True)
+            return None
+
+    def unsubscribe(self, token):
+        with self._lock:
+            self._subscribers.pop(token, None)
+
+    def publish(self, event):
+        # Through the outbox when it works, so every process sees events in one order.
+        stored = self.outbox is not None and self._outbox_call(self.outbox.append, event) is not None
+        if stored and self._cursor is not None:
+            self.poll()
+        else:
+            self._offer(event)
+
+    def _offer(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+        for sub in subscribers:
+            sub.offer(event)
+
+    def poll(self):
+        """Hand new outbox events, from any process, to this process's subscribers in outbox order."""
+        if self.outbox is None or self._cursor is None:
+            return 0
+        with self._poll_lock:
+            result = self._outbox_call(self.outbox.since, self._cursor)
+            if result is None:
+                return 0
+            self._cursor, events = result
+            for event in events:
+                self._offer(event)
+        return len(events)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+bus = EventBus(Outbox())
+
+
+def publish(event):
+    bus.publish(event)
+
+
+def subscribe(predicate=None, maxsize=1000):
+    return bus.subscribe(predicate, maxsize)
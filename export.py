@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""Chunked CSV / Parquet export of report data.
+
+Works on the report frame the admin app already holds, so an export never
+triggers a Sheets pull. Output is produced as a stream of byte chunks, each
+covering at most `chunk_rows` reports, so the extra memory needed is one chunk
+(or one archive partition) regardless of how many rows are exported.
+"""
+
+import io
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+CHUNK_ROWS = 50_000
+EXPORT_DIR = "exports"
+FORMATS = {"CSV": ".csv", "Parquet": ".parquet"}
+
+# Columns that never leave the admin portal.
+EXCLUDED_COLUMNS = ["Image"]
+
+
+def report_mask(df, municipality=None, start=None, end=None, statuses=None):
+    """Vectorised filter by municipality, inclusive DateTime date range and status, as a boolean mask."""
+    mask = pd.Series(True, index=df.index)
+    if municipality and "Municipality" in df.columns:
+        mask &= df["Municipality"] == municipality
+    if "DateTime" in df.columns and (start or end):
+        dates = pd.to_datetime(df["DateTime"], errors="coerce")
+        if start:
+            mask &= dates >= pd.Timestamp(start)
+        if end:
+            mask &= dates < pd.Timestamp(end) + pd.Timedelta(days=1)
+    if statuses and "Status" in df.columns:
+        mask &= df["Status"].isin(statuses)
+    return mask
+
+
+def filter_reports(df, municipality=None, start=None, end=None, statuses=None):
+    """The matching reports as one frame (a copy); exports use report_chunks() instead."""
+    return df.loc[report_mask(df, municipality, start, end, statuses)].drop(columns=EXCLUDED_COLUMNS, errors="ignore")
+
+
+def _archived(df, municipality, start, end, statuses, root, columns=None):
+    """Matching archived reports, one partition at a time. The session frame's copy of a report wins."""
+    import pyarrow.parquet as pq
+
+    import archive
+    from snapshot import id_column
+
+    hot_key = id_column(list(df.columns))
+    hot_ids = set(df[hot_key].astype(str)) if hot_key is not None else set()
+    for path in archive.partition_paths(municipality, start, end, root):
+        names = pq.read_schema(path).names
+        key = id_column(names)
+        wanted = None if columns is None else [c for c in names if c in columns or c == key]
+        part = pq.read_table(path, columns=wanted).to_pandas()
+        if key is not None:
+            part = part[~part[key].astype(str).isin(hot_ids)]
+        yield part.loc[report_mask(part, municipality, start, end, statuses)]
+
+
+def report_chunks(df, municipality=None, start=None, end=None, statuses=None, archive_root=None,
+                  chunk_rows=CHUNK_ROWS):
+    """Matching reports as frames of at most chunk_rows rows.
+
+    Archived partitions in range come first (only with an archive_root), one
+    partition at a time, then the session frame. Only row positions of the
+    selection are kept, so the full selection is never materialised.
+    """
+    if archive_root is not None:
+        for part in _archived(df, municipality, start, end, statuses, archive_root):
+            yield from _chunks(part, chunk_rows)
+    rows = np.flatnonzero(report_mask(df, municipality, start, end, statuses).to_numpy())
+    for first in range(0, len(rows), chunk_rows):
+        yield df.iloc[rows[first:first + chunk_rows]]
+
+
+def count_reports(df, municipality=None, start=None, end=None, statuses=None, archive_root=None):
+    """Number of reports report_chunks() would yield; archive partitions are read with just the filter columns."""
+    count = int(report_mask(df, municipality, start, end, statuses).sum())
+    if archive_root is not None:
+        columns = {"Municipality", "DateTime", "Status"}
+        count += sum(len(part) for part in _archived(df, municipality, start, end, statuses, archive_root, columns))
+    return count
+
+
+def export_columns(df, municipality=None, start=None, end=None, archive_root=None):
+    """Output columns: the session frame's, plus any only archived partitions in range still have."""
+    columns = list(df.columns)
+    if archive_root is not None:
+        import pyarrow.parquet as pq
+
+        import archive
+
+        for path in archive.partition_paths(municipality, start, end, archive_root):
+            columns += [c for c in pq.read_schema(path).names if c not in columns]
+    return [c for c in columns if c not in EXCLUDED_COLUMNS]
+
+
+def _chunks(df, chunk_rows):
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def iter_csv(chunks, columns):
+    """Yield UTF-8 CSV bytes, header first, one chunk of rows at a time."""
+    yield pd.DataFrame(columns=columns).to_csv(index=False).encode("utf-8")
+    for chunk in chunks:
+        if len(chunk):
+            chunk = chunk.reindex(columns=columns)
+            yield chunk.to_csv(index=False, header=False, date_format="%Y-%m-%d %H:%M:%S").encode("utf-8")
+
+
+class _ByteSink(io.RawIOBase):
+    """Write-only file object whose contents are drained after every row group."""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def _parquet_schema(columns):
+    import pyarrow as pa
+
+    # Sheet columns are loosely typed; keep everything except DateTime as text
+    # so every row group shares one schema.
+    fields = []
+    for column in columns:
+        if column == "DateTime":
+            fields.append(pa.field(column, pa.timestamp("us")))
+        else:
+            fields.append(pa.field(column, pa.string()))
+    return pa.schema(fields)
+
+
+def _arrow_chunk(chunk, schema):
+    import pyarrow as pa
+
+    chunk = chunk.reindex(columns=schema.names)
+    columns = {}
+    for field in schema:
+        values = chunk[field.name]
+        if field.name == "DateTime":
+            columns[field.name] = pd.to_datetime(values, errors="coerce")
+        else:
+            columns[field.name] = values.map(lambda v: None if pd.isna(v) else str(v))
+    return pa.Table.from_pandas(pd.DataFrame(columns), schema=schema, preserve_index=False)
+
+
+def iter_parquet(chunks, columns):
+    """Yield a Parquet file as byte chunks, one row group per chunk of reports."""
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema(columns)
+    sink = _ByteSink()
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for chunk in chunks:
+            if not len(chunk):
+                continue
+            writer.write_table(_arrow_chunk(chunk, schema))
+            data = sink.drain()
+            if data:
+                yield data
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def iter_export(chunks, fmt, columns):
+    if fmt == "Parquet":
+        return iter_parquet(chunks, columns)
+    if fmt == "CSV":
+        return iter_csv(chunks, columns)
+    raise ValueError(f"Unsupported export format: {fmt}")
+
+
+def export_filename(municipality, fmt, start=None, end=None):
+    slug = "".join(c if c.isalnum() else "_" for c in (municipality or "all")).strip("_").lower()
+    period = f"_{start:%Y%m%d}-{end:%Y%m%d}" if start and end else ""
+    return f"reports_{slug}{period}{FORMATS[fmt]}"
+
+
+def write_export(chunks, path, fmt, columns):
+    """Stream an export of report_chunks() to disk; returns (path, bytes written)."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    size = 0
+    tmp = f"{path}.{datetime.now():%H%M%S%f}.tmp"
+    with open(tmp, "wb") as f:
+        for data in iter_export(chunks, fmt, columns):
+            f.write(data)
+            size += len(data)
+    os.replace(tmp, path)
+    return path, size
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""Offline geocoding over the bundled South African gazetteer (data/gazetteer.csv).
+
+* Forward lookups (free-text Location -> coordinates) use an exact-name index
+  plus a prefix trie over names and aliases for partial input.
+* Reverse lookups (map pin -> nearest place / municipality) use a 2-d KD-tree
+  over an equirectangular projection of the gazetteer points.
+
+Both are pure Python, need no network access and sit behind LRU caches.
+"""
+
+import csv
+import math
+import os
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from boundaries import DEFAULT_MUNICIPALITY, classify_point
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "gazetteer.csv")
+EARTH_RADIUS_KM = 6371.0
+MAX_REVERSE_KM = 40.0  # pins further than this from any known place get no place name
+
+# More specific places win when several names appear in one address.
+KIND_RANK = {"suburb": 0, "town": 1, "municipality": 2, "coordinates": 3}
+
+Place = namedtuple("Place", "name kind municipality province lat lon")
+
+_COORDINATES = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$")
+
+
+def normalize(text):
+    text = str(text).lower().replace("'", "")
+    return " ".join(re.findall(r"[a-z0-9]+", text))
+
+
+def parse_coordinates(text):
+    """'lat,lon' -> (lat, lon) if it is a valid coordinate pair, else None."""
+    match = _COORDINATES.match(str(text or ""))
+    if not match:
+        return None
+    lat, lon = float(match.group(1)), float(match.group(2))
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+# ---------------------- PREFIX TRIE ----------------------
+class PrefixTrie:
+    def __init__(self):
+        self._root = {}
+
+    def insert(self, key, value):
+        node = self._root
+        for ch in key:
+            node = node.setdefault(ch, {})
+        node.setdefault(None, []).append(value)
+
+    def search(self, prefix, limit=10):
+        node = self._root
+        for ch in prefix:
+            node = node.get(ch)
+            if node is None:
+                return []
+        results, stack = [], [node]
+        while stack and len(results) < limit:
+            node = stack.pop()
+            for value in node.get(None, []):
+                if value not in results:
+                    results.append(value)
+            stack.extend(child for key, child in sorted(node.items(), key=lambda kv: str(kv[0]), reverse=True)
+                         if key is not None)
+        return results[:limit]
+
+
+# ---------------------- KD-TREE ----------------------
+class KDTree:
+    """2-d tree over (x, y) points; values are indexes into the caller's list."""
+
+    def __init__(self, points):
+        self._root = self._build([(x, y, i) for i, (x, y) in enumerate(points)], 0)
+
+    def _build(self, points, depth):
+        if not points:
+            return None
+        axis = depth % 2
+        points.sort(key=lambda p: p[axis])
+        mid = len(points) // 2
+        return (points[mid], axis, self._build(points[:mid], depth + 1), self._build(points[mid + 1:], depth + 1))
+
+    def nearest(self, x, y):
+        best = [None, float("inf")]
+
+        def visit(node):
+            if node is None:
+                return
+            point, axis, left, right = node
+            d = (point[0] - x) ** 2 + (point[1] - y) ** 2
+            if d < best[1]:
+                best[0], best[1] = point[2], d
+            diff = (x, y)[axis] - point[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            visit(near)
+            if diff * diff < best[1]:
+                visit(far)
+
+        visit(self._root)
+        return best[0]
+
+
+# ---------------------- GAZETTEER ----------------------
+class Gazetteer:
+    def __init__(self, places):
+        self.places = list(places)
+        self._by_name = {}
+        self._trie = PrefixTrie()
+        for i, place in enumerate(self.places):
+            for name in place.names:
+                key = normalize(name)
+                self._by_name.setdefault(key, []).append(i)
+                # Index every word start so "point" finds "Sea Point".
+                words = key.split()
+                for w in range(len(words)):
+                    self._trie.insert(" ".join(words[w:]), i)
+        self._lat0 = math.radians(sum(p.lat for p in self.places) / max(len(self.places), 1))
+        self._tree = KDTree([self._project(p.lat, p.lon) for p in self.places])
+        self._max_words = max((len(k.split()) for k in self._by_name), default=1)
+
+    @classmethod
+    def from_csv(cls, path=GAZETTEER_PATH):
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        return cls(_GazetteerPlace.from_row(r) for r in rows)
+
+    def _project(self, lat, lon):
+        return math.radians(lon) * math.cos(self._lat0), math.radians(lat)
+
+    def _best(self, indexes):
+        return min((self.places[i] for i in indexes), key=lambda p: KIND_RANK.get(p.kind, 9))
+
+    def lookup(self, name):
+        indexes = self._by_name.get(normalize(name))
+        return self._best(indexes).place if indexes else None
+
+    def suggest(self, prefix, limit=5):
+        key = normalize(prefix)
+        if not key:
+            return []
+        candidates = [self.places[i] for i in self._trie.search(key, limit * 4)]
+        # Names that start with the prefix before ones where a later word does.
+        candidates.sort(key=lambda p: (
+            not any(normalize(n).startswith(key) for n in p.names), KIND_RANK.get(p.kind, 9), p.name
+        ))
+        return [p.place for p in candidates[:limit]]
+
+    def geocode(self, text):
+        """Best place for a free-text address, or None.
+
+        Comma-separated parts are tried left to right (most specific first), then
+        any run of words in the text that matches a known name, then a prefix match.
+        """
+        for part in str(text).split(","):
+            place = self.lookup(part)
+            if place is not None:
+                return place
+
+        words = normalize(text).split()
+        matches = []
+        for n in range(min(self._max_words, len(words)), 0, -1):
+            for start in range(len(words) - n + 1):
+                indexes = self._by_name.get(" ".join(words[start:start + n]))
+                if indexes:
+                    matches.append(self._best(indexes))
+            if matches:
+                return min(matches, key=lambda p: KIND_RANK.get(p.kind, 9)).place
+
+        suggestions = self.suggest(text, limit=1)
+        return suggestions[0] if suggestions else None
+
+    def reverse(self, lat, lon):
+        """Nearest gazetteer place and its distance in km."""
+        if not self.places:
+            return None, None
+        place = self.places[self._tree.nearest(*self._project(lat, lon))]
+        return place.place, distance_km(lat, lon, place.lat, place.lon)
+
+
+class _GazetteerPlace(namedtuple("_GazetteerPlace", Place._fields + ("names",))):
+    @classmethod
+    def from_row(cls, row):
+        aliases = [a.strip() for a in (row.get("aliases") or "").split("|") if a.strip()]
+        return cls(
+            row["name"], row["kind"], row["municipality"], row["province"],
+            float(row["lat"]), float(row["lon"]), [row["name"]] + aliases
+        )
+
+    @property
+    def place(self):
+        return Place(*self[:6])
+
+
+@lru_cache(maxsize=1)
+def get_gazetteer():
+    return Gazetteer.from_csv()
+
+
+# ---------------------- CACHED API ----------------------
+@lru_cache(maxsize=4096)
+def _geocode_cached(key):
+    return get_gazetteer().geocode(key)
+
+
+@lru_cache(maxsize=4096)
+def _reverse_cached(lat, lon):
+    return get_gazetteer().reverse(lat, lon)
+
+
+def reverse_geocode(lat, lon):
+    # ~11 m grid so repeated pins on the same spot share a cache entry.
+    return _reverse_cached(round(float(lat), 4), round(float(lon), 4))
+
+
+def municipality_for(lat, lon, default=DEFAULT_MUNICIPALITY):
+    """Municipality whose boundary contains the point (`default` outside every boundary)."""
+    return classify_point(float(lat), float(lon), default)
+
+
+def geocode(text):
+    """Location text ('lat,lon' or an address) -> Place, or None if nothing matches."""
+    coords = parse_coordinates(text)
+    if coords is not None:
+        lat, lon = coords
+        nearest, km = reverse_geocode(lat, lon)
+        name = nearest.name if nearest is not None and km <= MAX_REVERSE_KM else ""
+        return Place(name, "coordinates", municipality_for(lat, lon), nearest.province if name else "", lat, lon)
+    key = " ".join(str(text or "").split())
+    if not key:
+        return None
+    return _geocode_cached(key)
+
+
+def suggest(prefix, limit=5):
+    return get_gazetteer().suggest(prefix, limit)
@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+"""Leak hotspot and recurrence detection.
+
+Reports are clustered spatially with grid-based DBSCAN. Points go into square
+cells of side eps/sqrt(2), so any two points in one cell are within eps of
+each other:
+
+* a cell holding min_samples points makes all of them core points without any
+  distance checks; points in sparser cells are counted against the 5x5 block
+  of cells around them;
+* core cells are joined in a union-find when any two of their core points lie
+  within eps;
+* a non-core point within eps of a core point is a border point of that
+  point's cluster; everything else is noise.
+
+New reports are added one at a time. Only the cells around the new point are
+touched, and points that become core merge their cell into the neighbouring
+clusters.
+
+Each cluster is then split in time into episodes (bursts of reports separated
+by more than EPISODE_GAP_DAYS). A spot that keeps bursting scores higher than
+one busy afternoon. The recurrence score sums one point per episode, halved for
+every HALF_LIFE_DAYS since the episode started.
+
+Only reports with an exact position are clustered: a map pin, or coordinates
+typed as the location. Free-text addresses geocode to a gazetteer centroid,
+and every report in a suburb would pile onto that one point.
+"""
+
+import math
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from boundaries import report_coordinates
+from events import ReportCreated
+from geocoder import parse_coordinates
+
+EPS_METERS = 150.0
+MIN_SAMPLES = 3
+EPISODE_GAP_DAYS = 7
+HALF_LIFE_DAYS = 180
+
+_M_PER_DEG_LAT = 110_540.0
+_M_PER_DEG_LON = 111_320.0
+_OFFSETS = [(dx, dy) for dx in range(-2, 3) for dy in range(-2, 3)]
+_BIAS, _STRIDE = 1 << 30, 1 << 31  # packs a (gx, gy) cell into one int64 key
+
+
+def project(lats, lons):
+    """Degrees -> local metres (equirectangular at each point's own latitude)."""
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    return lons * _M_PER_DEG_LON * np.cos(np.radians(lats)), lats * _M_PER_DEG_LAT
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, key):
+        parent = self.parent.setdefault(key, key)
+        if parent != key:
+            parent = self.parent[key] = self.find(parent)
+        return parent
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[rb] = ra
+
+
+class HotspotEngine:
+    def __init__(self, eps=EPS_METERS, min_samples=MIN_SAMPLES):
+        self.eps = eps
+        self.min_samples = min_samples
+        self.cell_size = eps / math.sqrt(2)
+        self._xy = np.empty((0, 2))
+        self._n = 0
+        self._cells = defaultdict(list)   # cell -> point indexes
+        self._cell_of = []
+        self._counts = []                 # eps-neighbourhood size (exact for non-core points)
+        self._core = []
+        self._anchor = []                 # core cell a point belongs to, or None for noise
+        self._core_cells = set()
+        self._clusters = _UnionFind()
+        self._meta = []                   # (report id, municipality, leak type, submitted)
+        self._summary = None
+
+    def __len__(self):
+        return self._n
+
+    # --- building ---
+    @classmethod
+    def from_frame(cls, df, eps=EPS_METERS, min_samples=MIN_SAMPLES):
+        engine = cls(eps, min_samples)
+        lats, lons = report_coordinates(df, geocode_text=False)
+        located = np.isfinite(lats) & np.isfinite(lons)
+        x, y = project(lats[located], lons[located])
+        engine._build(np.column_stack([x, y]), _report_meta(df.loc[located]))
+        return engine
+
+    def _build(self, xy, meta):
+        """Cluster a whole frame at once. Cell occupancy is counted with numpy
+        first, so only points with company in their 5x5 block get distance checks."""
+        n = len(xy)
+        self._xy, self._n, self._meta = xy, n, list(meta)
+        gx = np.floor(xy[:, 0] / self.cell_size).astype(np.int64)
+        gy = np.floor(xy[:, 1] / self.cell_size).astype(np.int64)
+        self._cell_of = list(zip(gx.tolist(), gy.tolist()))
+        for i, cell in enumerate(self._cell_of):
+            self._cells[cell].append(i)
+
+        keys = (gx + _BIAS) * _STRIDE + (gy + _BIAS)
+        cells, inverse, sizes = np.unique(keys, return_inverse=True, return_counts=True)
+        inverse = inverse.ravel()
+        core = sizes[inverse] >= self.min_samples
+        counts = np.where(core, sizes[inverse], 1)  # exact for lone points, a lower bound for core ones
+        crowded = ~core & (_block_sum(cells, sizes)[inverse] > 1)
+        for i in np.flatnonzero(crowded).tolist():
+            counts[i] = len(self._within(i, self._near_points(self._cell_of[i])))
+            core[i] = counts[i] >= self.min_samples
+        self._counts, self._core = counts.tolist(), core.tolist()
+        self._anchor = [cell if is_core else None for cell, is_core in zip(self._cell_of, self._core)]
+
+        self._core_cells = {self._cell_of[i] for i in np.flatnonzero(core).tolist()}
+        for cell in self._core_cells:
+            self._clusters.find(cell)
+            self._join_neighbours(cell)
+        has_core = np.zeros(len(cells), dtype=np.int64)
+        has_core[inverse[core]] = 1
+        near_core = ~core & (_block_sum(cells, has_core)[inverse] > 0)
+        for i in np.flatnonzero(near_core).tolist():
+            self._anchor[i] = self._nearest_core_cell(i)
+        self._summary = None
+
+    def _cell(self, x, y):
+        return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    def _dense(self, cell):
+        # Any two points in one cell are within eps, so a cell of min_samples makes them all core.
+        return len(self._cells.get(cell, ())) >= self.min_samples
+
+    def _near(self, cell, sparse_only=False):
+        for dx, dy in _OFFSETS:
+            other = (cell[0] + dx, cell[1] + dy)
+            members = self._cells.get(other)
+            if members and not (sparse_only and len(members) >= self.min_samples):
+                yield other, members
+
+    def _near_points(self, cell):
+        return [i for _, members in self._near(cell) for i in members]
+
+    def _within(self, point, indexes):
+        idx = np.asarray(indexes, dtype=np.int64)
+        d = self._xy[idx] - self._xy[point]
+        return idx[np.einsum("ij,ij->i", d, d) <= self.eps * self.eps]
+
+    def _any_within(self, a, b):
+        a, b = self._xy[np.asarray(a, dtype=np.int64)], self._xy[np.asarray(b, dtype=np.int64)]
+        step = max(1, 1_000_000 // max(len(b), 1))  # bound the pairwise block to ~1M distances
+        for start in range(0, len(a), step):
+            d = a[start:start + step, None, :] - b[None, :, :]
+            if (np.einsum("ijk,ijk->ij", d, d) <= self.eps * self.eps).any():
+                return True
+        return False
+
+    def _core_points(self, cell):
+        members = self._cells[cell]
+        return members if len(members) >= self.min_samples else [i for i in members if self._core[i]]
+
+    def _join_neighbours(self, cell):
+        mine = None
+        for dx, dy in _OFFSETS:
+            other = (cell[0] + dx, cell[1] + dy)
+            if other == cell or other not in self._core_cells:
+                continue
+            if self._clusters.find(other) == self._clusters.find(cell):
+                continue
+            mine = self._core_points(cell) if mine is None else mine
+            if self._any_within(mine, self._core_points(other)):
+                self._clusters.union(cell, other)
+
+    def _nearest_core_cell(self, point):
+        for cell, _ in self._near(self._cell_of[point]):
+            if cell in self._core_cells and self._any_within([point], self._core_points(cell)):
+                return cell
+        return None
+
+    def _grow(self, extra):
+        needed = self._n + extra
+        if needed > len(self._xy):
+            grown = np.empty((max(needed, 2 * len(self._xy), 64), 2))
+            grown[:self._n] = self._xy[:self._n]
+            self._xy = grown
+
+    # --- incremental updates ---
+    def add(self, lat, lon, meta):
+        """Add one located report; meta is (report id, municipality, leak type, submitted).
+
+        Non-core points only ever sit in sparse cells, so neighbourhood counts
+        are only updated there; dense cells cost nothing per add.
+        """
+        x, y = project([lat], [lon])
+        self._grow(1)
+        i = self._n
+        self._xy[i] = (x[0], y[0])
+        self._n += 1
+        cell = self._cell(x[0], y[0])
+        self._cells[cell].append(i)
+        self._cell_of.append(cell)
+        self._meta.append(meta)
+        self._core.append(False)
+        self._anchor.append(None)
+
+        if self._dense(cell):
+            self._counts.append(len(self._cells[cell]))
+            promoted = [j for j in self._cells[cell] if not self._core[j]]
+        else:
+            count = 0
+            for _, members in self._near(cell):
+                count += len(self._within(i, members))
+                if count >= self.min_samples:
+                    break
+            self._counts.append(count)
+            promoted = [i] if count >= self.min_samples else []
+        for _, members in self._near(cell, sparse_only=True):
+            for j in self._within(i, members).tolist():
+                if j == i or self._core[j]:
+                    continue
+                self._counts[j] += 1
+                if self._counts[j] >= self.min_samples:
+                    promoted.append(j)
+
+        for j in promoted:
+            self._core[j] = True
+            self._anchor[j] = self._cell_of[j]
+        for core_cell in {self._cell_of[j] for j in promoted}:
+            if core_cell not in self._core_cells:
+                self._core_cells.add(core_cell)
+                self._clusters.find(core_cell)
+            self._join_neighbours(core_cell)
+        for j in promoted:
+            # Noise near a new core point becomes its border.
+            for _, members in self._near(self._cell_of[j], sparse_only=True):
+                for k in self._within(j, members).tolist():
+                    if not self._core[k] and self._anchor[k] is None:
+                        self._anchor[k] = self._cell_of[j]
+        if not self._core[i] and self._anchor[i] is None:
+            self._anchor[i] = self._nearest_core_cell(i)
+        self._summary = None
+
+    def apply(self, event):
+        if not isinstance(event, ReportCreated):
+            return
+        report = event.report
+        located = report_location(report)
+        if located is not None:
+            report_id = report.get("ReportID", report.get("Reference", ""))
+            meta = tuple(str(v or "") for v in (report_id, report.get("Municipality"), report.get("Leak Type")))
+            self.add(*located, meta + (pd.to_datetime(report.get("DateTime"), errors="coerce"),))
+
+    # --- results ---
+    def labels(self):
+        """Cluster id per point (-1 for noise), as root cells mapped to small integers."""
+        roots, out = {}, np.full(self._n, -1, dtype=np.int64)
+        for i, anchor in enumerate(self._anchor):
+            if anchor is not None:
+                out[i] = roots.setdefault(self._clusters.find(anchor), len(roots))
+        return out
+
+    def summary(self, now=None):
+        """One row per cluster with its size, episodes and recurrence score.
+
+        Scored as of `now`; the default (current time) result is cached until the next add.
+        """
+        cache = now is None
+        if cache and self._summary is not None:
+            return self._summary
+        now = pd.Timestamp(now or datetime.now())
+        labels = self.labels()
+        clustered = labels >= 0
+        columns = ["Hotspot", "Municipality", "Latitude", "Longitude", "Reports", "Episodes",
+                   "First Report", "Last Report", "Main Leak Type", "Recurrence Score"]
+        if not clustered.any():
+            return pd.DataFrame(columns=columns)
+
+        meta = pd.DataFrame(self._meta, columns=["ReportID", "Municipality", "Leak Type", "DateTime"])
+        y = self._xy[:self._n, 1] / _M_PER_DEG_LAT
+        meta["Latitude"] = y
+        meta["Longitude"] = self._xy[:self._n, 0] / (_M_PER_DEG_LON * np.cos(np.radians(y)))
+        meta["Hotspot"] = labels
+        meta = meta[clustered].sort_values("DateTime")
+
+        gaps = meta.groupby("Hotspot")["DateTime"].diff() > pd.Timedelta(days=EPISODE_GAP_DAYS)
+        meta["Episode"] = gaps.groupby(meta["Hotspot"]).cumsum()
+        episodes = meta.groupby(["Hotspot", "Episode"])["DateTime"].min()
+        age_days = (now - episodes).dt.total_seconds() / 86400
+        weights = np.power(0.5, age_days.clip(lower=0) / HALF_LIFE_DAYS).fillna(0)
+
+        grouped = meta.groupby("Hotspot")
+        summary = pd.DataFrame({
+            "Municipality": grouped["Municipality"].agg(_mode),
+            "Latitude": grouped["Latitude"].mean(),
+            "Longitude": grouped["Longitude"].mean(),
+            "Reports": grouped.size(),
+            "Episodes": episodes.groupby(level=0).size(),
+            "First Report": grouped["DateTime"].min(),
+            "Last Report": grouped["DateTime"].max(),
+            "Main Leak Type": grouped["Leak Type"].agg(_mode),
+            "Recurrence Score": weights.groupby(level=0).sum().round(2),
+        }).reset_index()
+        summary = summary.sort_values(["Recurrence Score", "Reports"], ascending=False, ignore_index=True)[columns]
+        if cache:
+            self._summary = summary
+        return summary
+
+    def top_hotspots(self, municipality=None, n=5):
+        summary = self.summary()
+        if municipality is not None:
+            summary = summary[summary["Municipality"] == municipality]
+        return summary.head(n)
+
+
+def report_location(report):
+    """Exact (lat, lon) for one report dict, as report_coordinates(geocode_text=False) finds it, or None."""
+    try:
+        lat, lon = float(report.get("Latitude")), float(report.get("Longitude"))
+        if math.isfinite(lat) and math.isfinite(lon):
+            return lat, lon
+    except (TypeError, ValueError):
+        pass
+    return parse_coordinates(report.get("Location"))
+
+
+def _block_sum(cells, values):
+    """For each packed cell key, the sum of `values` over its 5x5 block of cells."""
+    total = np.zeros(len(cells), dtype=np.int64)
+    for dx, dy in _OFFSETS:
+        shifted = cells + dx * _STRIDE + dy
+        pos = np.searchsorted(cells, shifted).clip(max=len(cells) - 1)
+        hit = cells[pos] == shifted
+        total[hit] += values[pos[hit]]
+    return total
+
+
+def _mode(values):
+    counts = values.value_counts()
+    return counts.index[0] if len(counts) else ""
+
+
+def _report_meta(df):
+    def column(name):
+        return df[name].fillna("").astype(str).tolist() if name in df.columns else [""] * len(df)
+
+    ids = column("ReportID") if "ReportID" in df.columns else column("Reference")
+    submitted = (pd.to_datetime(df["DateTime"], errors="coerce") if "DateTime" in df.columns
+                 else pd.Series(pd.NaT, index=df.index))
+    return list(zip(ids, column("Municipality"), column("Leak Type"), submitted.tolist()))
@@ -3,20 +3,19 @@
 
 import streamlit as st
 import os
-import re
-import gspread
 import uuid
 from datetime import datetime
 from pathlib import Path
-from email.message import EmailMessage
-import smtplib
 import base64
 import folium
 from streamlit_folium import st_folium
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from mimetypes import guess_type
+import archive
+from core import Config, NotificationService, ReportsService
+from geocoder import geocode, municipality_for, suggest
+from rate_limit import SubmissionThrottle
+from schema import LEAK_TYPES, MUNICIPALITIES, is_valid_email, new_reference
+from templates import CITIZEN_CSS, IMAGE_BANNER, SUCCESS_CARD, begin_page, data_uri, register_style, use_background, use_style
+from tracing import begin_rerun, count, end_rerun, span, streamlit_session_id, traced
 
 # ---------------------- COLORS ----------------------
 COLORS = {
@@ -27,204 +26,78 @@ COLORS = {
     "white_smoke": "#F5F5F5"
 }
 
-# ---------------------- GOOGLE SHEETS ----------------------
+# ---------------------- SERVICES ----------------------
 SPREADSHEET_ID = "1leh-sPgpoHy3E62l_Rnc11JFyyF-kBNlWTICxW1tam8"
+CONFIG = Config.from_mapping(st.secrets, sheet_key=SPREADSHEET_ID)
 
-def get_gsheet_client():
-    creds = Credentials.from_service_account_info(
-        st.secrets["google_service_account"],
-        scopes=[
-            "https://www.googleapis.com/auth/spreadsheets",
-            "https://www.googleapis.com/auth/drive"
-        ]
-    )
-    return gspread.authorize(creds)
-
-def save_report_to_sheet(report):
-    client = get_gsheet_client()
-    sheet = client.open_by_key(SPREADSHEET_ID).sheet1
-    row = [
-        report["Reference"],
-        report["Name"],
-        report["Contact"],
-        report["Municipality"],
-        report["Leak Type"],
-        report["Location"],
-        report["DateTime"],
-        report.get("ImageURL", ""),
-        report["Status"]
-    ]
-    sheet.append_row(row)
-
-# ---------------------- EMAIL ----------------------
-def is_valid_email(email):
-    pattern = r'^[\w\.-]+@[\w\.-]+\.\w+$'
-    return re.match(pattern, email) is not None
+@st.cache_resource
+def get_services():
+    # One client per process, shared by all sessions (and its cached header row).
+    return ReportsService(CONFIG, archive_lookup=archive.find_report), NotificationService(CONFIG)
 
-def send_reference_email(to_email, ref_code, name):
-    smtp_server = "sandbox.smtp.mailtrap.io"
-    smtp_port = 2525
-    smtp_user = st.secrets["mailtrap"]["user"]
-    smtp_password = st.secrets["mailtrap"]["password"]
-
-    sender_email = "leak-reporter@municipality.org"
-    subject = "Your Water Leak Report - Reference Code"
-
-    msg = EmailMessage()
-    msg["Subject"] = subject
-    msg["From"] = sender_email
-    msg["To"] = to_email
-    msg.set_content(
-        f"Hi {name},\n\nThank you for reporting the leak.\nYour reference number is: {ref_code}\n\n"
-        "Use this code in the app to check the status.\n\nRegards,\nMunicipal Water Department"
-    )
-
-    try:
-        with smtplib.SMTP(smtp_server, smtp_port) as smtp:
-            smtp.login(smtp_user, smtp_password)
-            smtp.send_message(msg)
-        return True
-    except Exception as e:
-        st.error(f"Email failed: {e}")
-        return False
+reports, notifications = get_services()
 
 # ---------------------- BACKGROUNDS ----------------------
+@traced("ui.set_main_background")
 def set_main_background(image_file):
-    with open(image_file, "rb") as f:
-        encoded = base64.b64encode(f.read()).decode()
-    st.markdown(
-        f"""
-        <style>
-        .stApp {{
-            background-image: url("data:image/jpg;base64,{encoded}");
-            background-size: cover;
-            background-position: center;
-            background-attachment: fixed;
-        }}
-        </style>
-        """,
-        unsafe_allow_html=True
-    )
+    use_background(image_file, ".stApp")
 
+@traced("ui.set_sidebar_background")
 def set_sidebar_background(image_file):
-    with open(image_file, "rb") as f:
-        encoded = base64.b64encode(f.read()).decode()
-    st.markdown(
-        f"""
-        <style>
-        [data-testid="stSidebar"] {{
-            background-image: url("data:image/jpg;base64,{encoded}");
-            background-size: cover;
-            background-position: center;
-        }}
-        </style>
-        """,
-        unsafe_allow_html=True
-    )
+    use_background(image_file, '[data-testid="stSidebar"]', fixed=False)
 
 # ---------------------- PAGE SETUP ----------------------
 st.set_page_config(page_title="Drop Watch SA", page_icon="🚰", layout="centered")
+begin_rerun()
+begin_page()
 
 set_sidebar_background("images/images/WhatsApp Image 2025-10-21 at 22.42.03_3d1ddaaa.jpg")
 st.sidebar.title("Drop Watch SA")
 page = st.sidebar.radio("Navigate", ["Home", "Submit Report", "Check Status"])
 
 # ---------------------- GLOBAL STYLE ----------------------
-st.markdown(f"""
-<style>
-body {{
-    background-color: {COLORS['white_smoke']};
-}}
-.card {{
-    background-color: rgba(255, 255, 255, 0.9);
-    border-radius: 15px;
-    padding: 25px;
-    box-shadow: 0 4px 12px rgba(0,0,0,0.1);
-    margin-bottom: 25px;
-}}
-h1, h2, h3 {{
-    color: {COLORS['teal_blue']};
-}}
-button[kind="primary"], div[data-testid="stButton"] button {{
-    background-color: {COLORS['teal_blue']} !important;
-    color: white !important;
-    border-radius: 10px;
-    border: none;
-    font-weight: 600;
-    padding: 0.6em 1.2em;
-}}
-button[kind="primary"]:hover, div[data-testid="stButton"] button:hover {{
-    background-color: {COLORS['moonstone_blue']} !important;
-    color: black !important;
-}}
-</style>
-""", unsafe_allow_html=True)
+register_style("global", CITIZEN_CSS, **COLORS)
+use_style("global")
 
 # ---------------------- HELPER FUNCTIONS ----------------------
-def send_reference_email(to_email, ref_code, name, resolved=False):
-    import smtplib
-    from email.message import EmailMessage
-
-    smtp_server = "sandbox.smtp.mailtrap.io"
-    smtp_port = 2525
-    smtp_user = st.secrets["mailtrap"]["user"]
-    smtp_password = st.secrets["mailtrap"]["password"]
-
-    sender_email = "leak-reporter@municipality.org"
-    subject = "Your Water Leak Report"
-
-    if resolved:
-        subject += " has been Resolved"
-        content = (
-            f"Hi {name},\n\n"
-            f"Your report with ID {ref_code} has been resolved.\n"
-            "Thank you for helping us save water!\n\n"
-            "Regards,\nMunicipal Water Department"
-        )
-    else:
-        content = (
-            f"Hi {name},\n\n"
-            f"Thank you for reporting the leak.\n"
-            f"Your reference number is: {ref_code}\n"
-            "Use this code to check the status.\n\n"
-            "Regards,\nMunicipal Water Department"
-        )
-
-    msg = EmailMessage()
-    msg["Subject"] = subject
-    msg["From"] = sender_email
-    msg["To"] = to_email
-    msg.set_content(content)
-
+def send_reference_email(to_email, ref_code, name):
     try:
-        with smtplib.SMTP(smtp_server, smtp_port) as smtp:
-            smtp.login(smtp_user, smtp_password)
-            smtp.send_message(msg)
+        notifications.send_reference(to_email, ref_code, name)
+        return True
     except Exception as e:
         st.error(f"Email failed: {e}")
-
+        return False
 
 def notify_if_resolved(report):
     """
     Send email to user if their report has been resolved and they haven't been notified yet.
     """
-    if report.get("Status") == "Resolved" and report.get("Notified") != "Yes":
-        try:
-            send_reference_email(
-                to_email=report.get("Contact"),
-                ref_code=report.get("ReportID"),
-                name=report.get("Name"),
-                resolved=True
-            )
-            # Update Google Sheet to mark as notified
-            client = get_gsheet_client()
-            sheet = client.open_by_key(SPREADSHEET_ID).sheet1
-            cell = sheet.find(str(report.get("ReportID")))
-            col_num = sheet.find("Notified").col
-            sheet.update_cell(cell.row, col_num, "Yes")
-
-        except Exception as e:
-            st.error(f"Error sending resolved notification: {e}")
+    try:
+        notifications.notify_if_resolved(report, reports)
+    except Exception as e:
+        st.error(f"Error sending resolved notification: {e}")
+
+# ---------------------- SUBMISSION THROTTLE ----------------------
+@st.cache_resource
+def get_submission_throttle():
+    # One limiter per process, shared by all sessions; limits can be overridden in [rate_limit] secrets.
+    return SubmissionThrottle(CONFIG.rate_limits)
+
+def check_submission_rate(email):
+    """Returns None if the submission may go ahead, otherwise the seconds to wait."""
+    allowed, wait, reason = get_submission_throttle().check(streamlit_session_id(), email)
+    if allowed:
+        return None
+    count(f"submit.rejected.{reason}")
+    return wait
+
+# ---------------------- LOCATION AUTOFILL ----------------------
+def autofill_municipality_from_text():
+    # Runs before the rerun, so the selectbox can still be updated.
+    place = geocode(st.session_state.get("location_input", ""))
+    # "Other" is what a miss looks like; it never replaces the citizen's own choice.
+    if place is not None and place.municipality in MUNICIPALITIES and place.municipality != "Other":
+        st.session_state["municipality"] = place.municipality
 
 # ---------------------- LOCAL IMAGE UPLOAD ----------------------
 def save_image_locally(image):
@@ -238,42 +111,12 @@ def save_image_locally(image):
     
 
 # ---------------------- HOME PAGE ----------------------
-import base64
-from pathlib import Path
-
 if page == "Home":
     # --- Banner Image ---
     banner_path = Path("images/images/WhatsApp Image 2025-10-24 at 20.20.59_8bd302d5.jpg")
     if banner_path.exists():
-        with open(banner_path, "rb") as f:
-            banner_base64 = base64.b64encode(f.read()).decode()
-        st.markdown(f"""
-            <div style="
-                position: relative;
-                width: 100%;
-                height: 300px;
-                overflow: hidden;
-                border-radius: 0 0 30px 30px;
-                margin-bottom: 50px;
-            ">
-                <img src="data:image/jpg;base64,{banner_base64}" 
-                     style="width:100%; height:100%; object-fit:cover; filter: brightness(0.45);">
-                <div style="
-                    position: absolute;
-                    top: 50%;
-                    left: 50%;
-                    transform: translate(-50%, -50%);
-                    color: #f5f5f5;
-                    font-size: 42px;
-                    font-weight: 800;
-                    text-align: center;
-                    text-shadow: 3px 3px 12px rgba(0,0,0,0.6);
-                    font-family: 'Poppins', sans-serif;
-                ">
-                    Drop Watch SA
-                </div>
-            </div>
-        """, unsafe_allow_html=True)
+        with span("ui.banner_encode"):
+            IMAGE_BANNER.markdown(kind="hero-banner", image=data_uri(banner_path), title="Drop Watch SA")
     else:
         st.warning("⚠ Banner image not found. Please check the file path.")
 
@@ -342,19 +185,8 @@ elif page == "Submit Report":
     # --- Banner ---
     banner_path = Path("images/images/360_F_1467195115_oNV9D8TzjhTF3rfhbty256ZTHgGodmtW.jpg")
     if banner_path.exists():
-        with open(banner_path, "rb") as f:
-            img_base64 = base64.b64encode(f.read()).decode()
-        st.markdown(f"""
-            <div style="position:relative;width:100%;height:140px;overflow:hidden;border-radius:15px;margin-bottom:25px;">
-                <img src="data:image/jpg;base64,{img_base64}" 
-                     style="width:100%; height:100%; object-fit:cover; filter: brightness(0.65);">
-                <div style="position:absolute;top:50%;left:50%;transform:translate(-50%,-50%);
-                            color:white;font-size:26px;font-weight:bold;text-shadow:1px 1px 4px rgba(0,0,0,0.6);
-                            font-family:'Poppins', sans-serif;">
-                    Report a Water Leak
-                </div>
-            </div>
-        """, unsafe_allow_html=True)
+        with span("ui.banner_encode"):
+            IMAGE_BANNER.markdown(kind="page-banner", image=data_uri(banner_path), title="Report a Water Leak")
     else:
         st.warning("⚠ Banner image not found. Please check the file path.")
 
@@ -363,38 +195,42 @@ elif page == "Submit Report":
     st.header("Submit a Water Leak Report")
     st.markdown("Please fill in the details below to help your municipality respond promptly.")
 
+    # Municipality detected from a map pin on the previous run.
+    detected = st.session_state.pop("detected_municipality", None)
+    if detected in MUNICIPALITIES:
+        st.session_state["municipality"] = detected
+
     col1, col2 = st.columns(2)
 
     with col1:
         name = st.text_input("Full Name")
         contact = st.text_input("Email Address", placeholder="example@email.com")
-        municipality = st.selectbox(
-            "Select Municipality",
-            [
-                "City of Johannesburg", "City of Cape Town", "eThekwini",
-                "Buffalo City", "Mangaung", "Nelson Mandela Bay", "Other"
-            ]
-        )
+        municipality = st.selectbox("Select Municipality", MUNICIPALITIES, key="municipality")
 
     with col2:
-        leak_type = st.selectbox("Type of Leak", ["Burst Pipe", "Leakage", "Sewage Overflow", "Other"])
-        location_input = st.text_input("Location (Address or Coordinates)")
-
-        st.markdown("*Or select location on the map (drag or double-click pin):*")
-        m = folium.Map(location=[-30.5595, 22.9375], zoom_start=5)
+        leak_type = st.selectbox("Type of Leak", LEAK_TYPES)
+        location_input = st.text_input(
+            "Location (Address or Coordinates)", key="location_input", on_change=autofill_municipality_from_text
+        )
 
-        if location_input and "," in location_input:
-            try:
-                lat, lon = map(float, location_input.split(","))
-            except:
-                lat, lon = -30.5595, 22.9375
+        place = geocode(location_input) if location_input else None
+        if place is not None:
+            lat, lon, zoom = place.lat, place.lon, 14
+            st.caption(f"📍 {place.name or 'Pinned location'} — {place.municipality}")
         else:
-            lat, lon = -30.5595, 22.9375
+            lat, lon, zoom = -30.5595, 22.9375, 5
+            if location_input:
+                hints = ", ".join(p.name for p in suggest(location_input.split(",")[-1], limit=3))
+                st.caption("Address not recognised. " + (f"Did you mean: {hints}?" if hints else "Try adding the suburb or town."))
+
+        st.markdown("*Or select location on the map (drag or double-click pin):*")
+        m = folium.Map(location=[lat, lon], zoom_start=zoom)
 
         marker = folium.Marker(location=[lat, lon], draggable=True)
         marker.add_to(m)
 
-        map_data = st_folium(m, height=300, width=700)
+        with span("folium.st_folium"):
+            map_data = st_folium(m, height=300, width=700)
 
         latitude, longitude = None, None
         if map_data:
@@ -407,6 +243,17 @@ elif page == "Submit Report":
 
             if latitude and longitude:
                 location_input = f"{latitude},{longitude}"
+                pin = (round(latitude, 5), round(longitude, 5))
+                if st.session_state.get("last_pin") != pin:
+                    st.session_state.last_pin = pin
+                    pinned_municipality = municipality_for(latitude, longitude, default=None)
+                    if pinned_municipality is not None and pinned_municipality != municipality:
+                        st.session_state.detected_municipality = pinned_municipality
+                        st.rerun()
+
+        # A geocoded address only centres the map; its gazetteer centroid is not the leak's position.
+        if latitude is None and place is not None and place.kind == "coordinates":
+            latitude, longitude = place.lat, place.lon
 
     image = st.file_uploader("Upload an image (optional)", type=["jpg", "jpeg", "png"])
 
@@ -415,10 +262,19 @@ elif page == "Submit Report":
     st.markdown("</div>", unsafe_allow_html=True)
 
     if submit_clicked:
+        throttle_wait = None
+        if name and contact and location_input and is_valid_email(contact):
+            throttle_wait = check_submission_rate(contact)
+
         if not name or not contact or (not location_input):
             st.error("Please provide your name, email, and either an address or select a location on the map.")
         elif not is_valid_email(contact):
             st.error("Please enter a valid email address.")
+        elif throttle_wait:
+            st.error(
+                f"Too many reports have been submitted from this session or email address. "
+                f"Please try again in {max(int(throttle_wait // 60), 1)} minute(s)."
+            )
         else:
             if image:
                 os.makedirs("leak_images", exist_ok=True)
@@ -428,9 +284,14 @@ elif page == "Submit Report":
             else:
                 image_path = ""
 
-            ref_code = str(uuid.uuid4())[:8].upper()
+            ref_code = new_reference()
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
+            # A located report is filed under the municipality whose boundary contains it;
+            # outside every boundary the selected municipality stands.
+            if latitude is not None and longitude is not None:
+                municipality = municipality_for(latitude, longitude, default=None) or municipality
+
             report = {
                 "Reference": ref_code,
                 "Name": name,
@@ -446,19 +307,10 @@ elif page == "Submit Report":
             }
 
             try:
-                save_report_to_sheet(report)
+                reports.create(report)
                 send_reference_email(contact, ref_code, name)
 
-                st.markdown(f"""
-                    <div style="background-color:#00796B;border-left:5px solid #004D40;
-                                border-radius:12px;padding:20px;margin-top:30px;box-shadow:0 4px 12px rgba(0,0,0,0.1);">
-                        <h3 style="color:white;">✅ Report Submitted Successfully!</h3>
-                        <p><b>Reference Code:</b> {ref_code}</p>
-                        <p><b>Date & Time:</b> {timestamp}</p>
-                        <p><b>Confirmation sent to:</b> {contact}</p>
-                        <p style="margin-top:10px;">Use your reference code under <b>Check Status</b> to track your report.</p>
-                    </div>
-                """, unsafe_allow_html=True)
+                SUCCESS_CARD.markdown(reference=ref_code, timestamp=timestamp, contact=contact)
             except Exception as e:
                 st.error(f"Failed to save report: {e}")
 
@@ -476,20 +328,9 @@ elif page == "Check Status":
 
     if st.button("Check Status", use_container_width=True):
         try:
-            client = get_gsheet_client()
-            sheet = client.open_by_key(SPREADSHEET_ID).sheet1
-            records = sheet.get_all_records()
-
-            # Normalize keys (strip spaces)
-            normalized_records = [{k.strip(): v for k, v in row.items()} for row in records]
+            match, source = reports.find(user_reportid)
 
-            # Find the report using ReportID
-            match = next(
-                (row for row in normalized_records if str(row.get("ReportID")).strip() == user_reportid.strip()),
-                None
-            )
-
-            if match:
+            if source == "sheet":
                 # Notify user if report is resolved and not notified yet
                 notify_if_resolved(match)
 
@@ -497,6 +338,10 @@ elif page == "Check Status":
                 st.success(f"Status for Report ID {user_reportid}: {match.get('Status', 'Unknown')}")
                 st.write(match)
 
+            elif source == "archive":
+                # Old resolved reports live in the archive, not the sheet.
+                st.success(f"Status for Report ID {user_reportid}: {match.get('Status', 'Unknown')}")
+                st.write(match)
 
             else:
                 st.warning("Report ID not found. Please check your input.")
@@ -505,3 +350,5 @@ elif page == "Check Status":
             st.error(f"Could not check status: {e}")
 
     st.markdown("</div>", unsafe_allow_html=True)
+
+end_rerun()
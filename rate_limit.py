@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""Token-bucket throttling for report submissions.
+
+Each key (a browser session, an email address) gets a bucket of `capacity`
+tokens that refills at `capacity / period` tokens per second. Buckets live in a
+bounded LRU map so a flood of distinct keys cannot grow memory without limit;
+an evicted key simply starts again with a full bucket.
+"""
+
+import threading
+import time
+from collections import Counter, OrderedDict
+
+DEFAULT_LIMITS = {
+    "session_capacity": 5,     # submissions per browser session ...
+    "session_period": 600,     # ... per 10 minutes
+    "email_capacity": 3,       # submissions per email address ...
+    "email_period": 3600,      # ... per hour
+    "max_keys": 10_000,        # buckets kept per limiter
+}
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, capacity, now):
+        self.tokens = float(capacity)
+        self.updated = now
+
+
+class RateLimiter:
+    def __init__(self, capacity, period, max_keys=10_000, clock=time.monotonic):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _bucket(self, key, now):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.capacity, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket.tokens = min(self.capacity, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+        return bucket
+
+    def wait_time(self, key):
+        """Seconds until `key` has a token (0 if one is available now). Does not consume."""
+        with self._lock:
+            bucket = self._bucket(key, self.clock())
+            return 0.0 if bucket.tokens >= 1 else (1 - bucket.tokens) / self.rate
+
+    def consume(self, key):
+        with self._lock:
+            bucket = self._bucket(key, self.clock())
+            if bucket.tokens < 1:
+                return False
+            bucket.tokens -= 1
+            return True
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SubmissionThrottle:
+    """Per-session and per-email limits; a submission must pass both."""
+
+    def __init__(self, limits=None, clock=time.monotonic):
+        config = {**DEFAULT_LIMITS, **(limits or {})}
+        self.session = RateLimiter(config["session_capacity"], config["session_period"], config["max_keys"], clock)
+        self.email = RateLimiter(config["email_capacity"], config["email_period"], config["max_keys"], clock)
+        self.stats = Counter()
+        self._lock = threading.Lock()
+
+    def check(self, session_id, email):
+        """Consume a token from both buckets, or neither. Returns (allowed, seconds_to_wait, reason).
+
+        A session_id of None checks the email bucket only.
+        """
+        email = (email or "").strip().lower()
+        with self._lock:
+            session_wait = self.session.wait_time(session_id) if session_id is not None else 0.0
+            email_wait = self.email.wait_time(email)
+            if session_wait or email_wait:
+                reason = "session" if session_wait >= email_wait else "email"
+                self.stats[f"rejected_{reason}"] += 1
+                return False, max(session_wait, email_wait), reason
+            if session_id is not None:
+                self.session.consume(session_id)
+            self.email.consume(email)
+            self.stats["allowed"] += 1
+            return True, 0.0, None
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""Report schema shared by the citizen app and the headless tools.
+
+Nothing here imports Streamlit, so bulk imports, replays and workers validate
+reports exactly the way the submit form does.
+"""
+
+import re
+import uuid
+from datetime import datetime
+
+import pandas as pd
+
+from geocoder import geocode, municipality_for
+
+MUNICIPALITIES = [
+    "City of Johannesburg", "City of Cape Town", "eThekwini",
+    "Buffalo City", "Mangaung", "Nelson Mandela Bay", "Other"
+]
+LEAK_TYPES = ["Burst Pipe", "Leakage", "Sewage Overflow", "Other"]
+STATUSES = ["Pending", "Resolved"]
+
+# Column order used before the sheet header was read.
+LEGACY_COLUMNS = ["Reference", "Name", "Contact", "Municipality", "Leak Type", "Location", "DateTime", "ImageURL", "Status"]
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+# What a citizen fills in on the submit form; everything else is set by the server.
+CITIZEN_FIELDS = ("Name", "Contact", "Email", "Location", "Latitude", "Longitude", "Leak Type", "LeakType", "Municipality")
+
+
+def sheet_header(row):
+    """Stripped header row, or LEGACY_COLUMNS if it is missing or not recognisable."""
+    header = [str(h).strip() for h in row or []]
+    return header if "Status" in header else LEGACY_COLUMNS
+
+
+def new_reference():
+    return str(uuid.uuid4())[:8].upper()
+
+
+def is_valid_email(email):
+    pattern = r'^[\w\.-]+@[\w\.-]+\.\w+$'
+    return re.match(pattern, email) is not None
+
+
+def report_to_row(report, header):
+    """Lay a report out in sheet column order; unknown columns stay blank."""
+    values = dict(report)
+    values.setdefault("ReportID", report.get("Reference", ""))
+    return ["" if values.get(col) is None else values.get(col, "") for col in header]
+
+
+def _text(record, *names):
+    for name in names:
+        value = record.get(name)
+        if value is not None and str(value).strip():
+            return str(value).strip()
+    return ""
+
+
+def _timestamp(value):
+    try:
+        stamp = pd.Timestamp(value)
+    except (TypeError, ValueError):
+        return None
+    return None if pd.isna(stamp) else stamp.strftime(TIMESTAMP_FORMAT)
+
+
+def validate_report(record, reference=None, now=None):
+    """Normalise one input record into a sheet report. Returns (report, errors).
+
+    Applies the submit form's rules (name, valid email and a location are
+    required). Fields the form fills in itself are filled in here: the
+    reference (kept if the record has one, else `reference` or a new code),
+    the municipality (from the location, as a dropped pin would), the
+    timestamp and the Pending status.
+
+    Reference, Status, DateTime, ResolvedAt and ImageURL are taken from the
+    record when present, which only trusted imports may do; citizen input goes
+    through validate_submission().
+    """
+    errors = []
+    name = _text(record, "Name")
+    contact = _text(record, "Contact", "Email")
+    location = _text(record, "Location")
+    if not name or not contact or not location and not _text(record, "Latitude"):
+        errors.append("name, email and a location are required")
+    elif not is_valid_email(contact):
+        errors.append(f"invalid email address: {contact}")
+
+    latitude = longitude = None
+    if _text(record, "Latitude") or _text(record, "Longitude"):
+        try:
+            latitude, longitude = float(_text(record, "Latitude")), float(_text(record, "Longitude"))
+        except ValueError:
+            errors.append("latitude/longitude must be numbers")
+        else:
+            if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+                errors.append("latitude/longitude out of range")
+            location = location or f"{latitude},{longitude}"
+
+    municipality = _text(record, "Municipality")
+    if not municipality and not errors:
+        if latitude is not None:
+            municipality = municipality_for(latitude, longitude, default=None)
+        if not municipality:
+            place = geocode(location)
+            municipality = place.municipality if place is not None else "Other"
+    if municipality and municipality not in MUNICIPALITIES:
+        errors.append(f"unknown municipality: {municipality}")
+
+    leak_type = _text(record, "Leak Type", "LeakType") or "Other"
+    if leak_type not in LEAK_TYPES:
+        errors.append(f"unknown leak type: {leak_type}")
+    status = _text(record, "Status") or "Pending"
+    if status not in STATUSES:
+        errors.append(f"unknown status: {status}")
+
+    submitted = _text(record, "DateTime")
+    timestamp = _timestamp(submitted) if submitted else (now or datetime.now()).strftime(TIMESTAMP_FORMAT)
+    if timestamp is None:
+        errors.append(f"unreadable DateTime: {submitted}")
+    resolved = _text(record, "ResolvedAt")
+    resolved_at = _timestamp(resolved) if resolved else ""
+    if resolved_at is None:
+        errors.append(f"unreadable ResolvedAt: {resolved}")
+
+    report = {
+        "Reference": (_text(record, "Reference", "ReportID") or reference or new_reference()).upper(),
+        "Name": name,
+        "Contact": contact,
+        "Municipality": municipality,
+        "Leak Type": leak_type,
+        "Location": location,
+        "Latitude": latitude,
+        "Longitude": longitude,
+        "DateTime": timestamp,
+        "ImageURL": _text(record, "ImageURL"),
+        "Status": status,
+    }
+    if resolved_at:
+        report["ResolvedAt"] = resolved_at
+    return report, errors
+
+
+def validate_submission(record, now=None):
+    """validate_report() for a citizen's own report, as the public API receives it.
+
+    Only CITIZEN_FIELDS are accepted. The reference is always generated here,
+    the status is Pending and the timestamp is now.
+    """
+    unexpected = sorted(str(k) for k in record if k not in CITIZEN_FIELDS)
+    fields = {k: record[k] for k in CITIZEN_FIELDS if k in record}
+    report, errors = validate_report(fields, reference=new_reference(), now=now)
+    if unexpected:
+        errors.insert(0, f"unexpected fields: {', '.join(unexpected)}")
+    return report, errors
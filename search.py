@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""In-memory search over the report frame for the admin Manage Reports page.
+
+* Location and Name are tokenized into an inverted index (token -> row labels);
+  bare coordinate Locations are left out.
+  Query words must all match; the last word also matches as a prefix, via a
+  sorted vocabulary, so results appear while the admin is still typing.
+* Report IDs are kept in a sorted list and matched by prefix with bisect.
+
+Documents are keyed by the frame's row label. The index is patched from
+ReportCreated / StatusChanged events in the same way as the cached frame, so it
+never has to be rebuilt between full reloads.
+"""
+
+import re
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from events import ReportCreated, StatusChanged
+
+TEXT_FIELDS = ("Location", "Name")
+_TOKEN = re.compile(r"[a-z0-9]+")
+_COORDINATES = re.compile(r"^\s*-?\d+(?:\.\d+)?\s*,\s*-?\d+(?:\.\d+)?\s*$")
+
+
+def tokenize(text):
+    return _TOKEN.findall(str(text or "").lower())
+
+
+def searchable(value):
+    # A bare "lat,lon" pin would only add unique numeric tokens nobody searches for.
+    value = str(value or "")
+    return "" if _COORDINATES.match(value) else value
+
+
+class ReportIndex:
+    def __init__(self, id_column="ReportID"):
+        self.id_column = id_column
+        self._postings = defaultdict(set)   # token -> labels
+        self._vocab = []                    # sorted tokens, for prefix queries
+        self._ids = []                      # sorted (ID, label)
+        self._docs = {}                     # label -> (ID, tokens, municipality, status)
+        self._next_label = 0
+
+    @classmethod
+    def from_frame(cls, df, id_column=None):
+        if id_column is None:
+            id_column = "ReportID" if "ReportID" in df.columns else "Reference"
+        index = cls(id_column)
+
+        def column(name):
+            return df[name].fillna("").astype(str).tolist() if name in df.columns else [""] * len(df)
+
+        labels = df.index.tolist()
+        ids = [i.strip().upper() for i in column(id_column)]
+        text = [
+            " ".join(searchable(v) for v in values).lower() for values in zip(*(column(f) for f in TEXT_FIELDS))
+        ]
+        postings, docs = index._postings, index._docs
+        for label, report_id, words, municipality, status in zip(
+            labels, ids, text, column("Municipality"), column("Status")
+        ):
+            tokens = set(_TOKEN.findall(words))
+            for token in tokens:
+                postings[token].add(label)
+            docs[label] = (report_id, tokens, municipality, status)
+
+        index._vocab = sorted(postings)
+        index._ids = sorted((i, label) for label, i in zip(labels, ids) if i)
+        index._next_label = max((l + 1 for l in labels if isinstance(l, int)), default=0)
+        return index
+
+    def __len__(self):
+        return len(self._docs)
+
+    # --- updates ---
+    def add(self, label, report):
+        if label in self._docs:
+            self.remove(label)
+        report_id = str(report.get(self.id_column, "") or "").strip().upper()
+        tokens = set()
+        for field in TEXT_FIELDS:
+            tokens.update(tokenize(searchable(report.get(field, ""))))
+        for token in tokens:
+            postings = self._postings[token]
+            if not postings:
+                insort(self._vocab, token)
+            postings.add(label)
+        if report_id:
+            insort(self._ids, (report_id, label))
+        self._docs[label] = (
+            report_id, tokens, str(report.get("Municipality", "") or ""), str(report.get("Status", "") or "")
+        )
+        if isinstance(label, int):
+            self._next_label = max(self._next_label, label + 1)
+
+    def remove(self, label):
+        doc = self._docs.pop(label, None)
+        if doc is None:
+            return
+        report_id, tokens, _, _ = doc
+        for token in tokens:
+            postings = self._postings[token]
+            postings.discard(label)
+            if not postings:
+                del self._postings[token]
+                self._vocab.pop(bisect_left(self._vocab, token))
+        if report_id:
+            i = bisect_left(self._ids, (report_id, label))
+            if i < len(self._ids) and self._ids[i] == (report_id, label):
+                self._ids.pop(i)
+
+    def _labels_for(self, report_id):
+        i = bisect_left(self._ids, (report_id,))
+        while i < len(self._ids) and self._ids[i][0] == report_id:
+            yield self._ids[i][1]
+            i += 1
+
+    def set_status(self, report_id, status):
+        report_id = str(report_id).strip().upper()
+        for label in list(self._labels_for(report_id)):
+            _, tokens, municipality, _ = self._docs[label]
+            self._docs[label] = (report_id, tokens, municipality, status)
+
+    def apply(self, event, label=None):
+        """Patch the index with an event; `label` is the row a ReportCreated was appended as."""
+        if isinstance(event, ReportCreated):
+            report = dict(event.report)
+            report.setdefault("ReportID", report.get("Reference", ""))
+            self.add(self._next_label if label is None else label, report)
+        elif isinstance(event, StatusChanged):
+            self.set_status(event.report_id, event.new_status)
+
+    # --- queries ---
+    def _id_prefix(self, prefix):
+        labels = set()
+        i = bisect_left(self._ids, (prefix,))
+        while i < len(self._ids) and self._ids[i][0].startswith(prefix):
+            labels.add(self._ids[i][1])
+            i += 1
+        return labels
+
+    def _token_prefix(self, prefix):
+        labels = set()
+        i = bisect_left(self._vocab, prefix)
+        while i < len(self._vocab) and self._vocab[i].startswith(prefix):
+            labels |= self._postings[self._vocab[i]]
+            i += 1
+        return labels
+
+    def search(self, query, municipality=None, status=None):
+        """Row labels matching every word of `query` (or whose ID starts with it), in frame order."""
+        query = str(query or "").strip()
+        words = tokenize(query)
+        if not words:
+            return []
+
+        matches = self._id_prefix(query.upper())
+        text = None
+        for word in sorted(words[:-1], key=lambda w: len(self._postings.get(w, ()))):
+            postings = self._postings.get(word, set())
+            text = set(postings) if text is None else text & postings
+            if not text:
+                break
+        if text is None or text:
+            last = self._token_prefix(words[-1])
+            text = last if text is None else text & last
+        matches |= text
+
+        if municipality is not None or status is not None:
+            matches = {
+                label for label in matches
+                if (municipality is None or self._docs[label][2] == municipality)
+                and (status is None or self._docs[label][3] == status)
+            }
+        return sorted(matches, key=_label_order)
+
+
+def _label_order(label):
+    return (0, label) if isinstance(label, int) else (1, str(label))
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""Incrementally maintained repair-SLA analytics.
+
+RepairSLA keeps, per municipality:
+
+  * a t-digest of time-to-resolution (hours from DateTime to ResolvedAt), so
+    p50/p90 reads cost O(compression) no matter how many reports exist;
+  * the pending backlog as a count of open reports per submission day, so the
+    backlog-age histogram costs O(days with open reports), not O(reports).
+
+It is built once from the report frame and then updated from ReportCreated /
+StatusChanged events as they arrive.
+"""
+
+import bisect
+from collections import Counter
+from datetime import datetime
+
+import pandas as pd
+
+from events import ReportCreated, StatusChanged
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Backlog age buckets: (label, upper bound in days)
+AGE_BUCKETS = [("< 1 day", 1), ("1-3 days", 3), ("3-7 days", 7), ("1-4 weeks", 28), ("> 4 weeks", None)]
+
+
+# ---------------------- T-DIGEST ----------------------
+class TDigest:
+    """Merging t-digest (Dunning) for streaming quantiles."""
+
+    def __init__(self, compression=100):
+        self.compression = compression
+        self.count = 0
+        self.min = None
+        self.max = None
+        self._centroids = []  # [mean, weight], sorted by mean
+        self._buffer = []
+
+    def add(self, value, weight=1):
+        value = float(value)
+        self._buffer.append((value, weight))
+        self.count += weight
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if len(self._buffer) >= self.compression * 5:
+            self._compress()
+
+    def add_many(self, values):
+        for value in values:
+            self.add(value)
+
+    def _compress(self):
+        if not self._buffer:
+            return
+        points = sorted([tuple(c) for c in self._centroids] + self._buffer)
+        self._buffer = []
+        total = sum(w for _, w in points)
+        merged = []
+        so_far = 0
+        mean, weight = points[0]
+        for x, w in points[1:]:
+            q = (so_far + (weight + w) / 2) / total
+            if weight + w <= max(1, 4 * total * q * (1 - q) / self.compression):
+                weight += w
+                mean += (x - mean) * w / weight
+            else:
+                merged.append([mean, weight])
+                so_far += weight
+                mean, weight = x, w
+        merged.append([mean, weight])
+        self._centroids = merged
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        self._compress()
+        centroids = self._centroids
+        if len(centroids) == 1:
+            return centroids[0][0]
+        target = q * self.count
+        cumulative = 0
+        previous_mean, previous_center = self.min, 0
+        for mean, weight in centroids:
+            center = cumulative + weight / 2
+            if target <= center:
+                span = center - previous_center
+                fraction = (target - previous_center) / span if span else 0
+                return previous_mean + fraction * (mean - previous_mean)
+            previous_mean, previous_center = mean, center
+            cumulative += weight
+        span = self.count - previous_center
+        fraction = (target - previous_center) / span if span else 1
+        return previous_mean + fraction * (self.max - previous_mean)
+
+
+# ---------------------- AGGREGATOR ----------------------
+def _parse_time(value):
+    if value is None or value == "" or (isinstance(value, float) and pd.isna(value)):
+        return None
+    if isinstance(value, datetime):
+        return None if pd.isna(value) else value
+    try:
+        return datetime.strptime(str(value), TIME_FORMAT)
+    except ValueError:
+        parsed = pd.to_datetime(value, errors="coerce")
+        return None if pd.isna(parsed) else parsed.to_pydatetime()
+
+
+class MunicipalSLA:
+    def __init__(self, compression=100):
+        self.resolution_hours = TDigest(compression)
+        self.backlog_days = Counter()  # submission date -> open reports
+        self._quantiles = {}
+
+    def observe_resolution(self, hours):
+        self.resolution_hours.add(max(hours, 0.0))
+        self._quantiles.clear()
+
+    def quantile(self, q):
+        if q not in self._quantiles:
+            self._quantiles[q] = self.resolution_hours.quantile(q)
+        return self._quantiles[q]
+
+    @property
+    def backlog(self):
+        return sum(self.backlog_days.values())
+
+
+class RepairSLA:
+    def __init__(self, compression=100):
+        self.compression = compression
+        self.municipalities = {}
+        self._pending = {}  # report id -> (municipality, submitted)
+
+    def _muni(self, name):
+        if name not in self.municipalities:
+            self.municipalities[name] = MunicipalSLA(self.compression)
+        return self.municipalities[name]
+
+    # --- building ---
+    @classmethod
+    def from_frame(cls, df, compression=100):
+        sla = cls(compression)
+        if df.empty or "Municipality" not in df.columns or "DateTime" not in df.columns:
+            return sla
+        id_col = "ReportID" if "ReportID" in df.columns else "Reference"
+        submitted = pd.to_datetime(df["DateTime"], errors="coerce")
+        status = df["Status"] if "Status" in df.columns else pd.Series("Pending", index=df.index)
+
+        if "ResolvedAt" in df.columns:
+            resolved_at = pd.to_datetime(df["ResolvedAt"].replace("", None), errors="coerce")
+            hours = (resolved_at - submitted).dt.total_seconds() / 3600
+            done = (status == "Resolved") & hours.notna()
+            for muni, values in hours[done].groupby(df.loc[done, "Municipality"]):
+                municipal = sla._muni(muni)
+                municipal.resolution_hours.add_many(values.clip(lower=0).tolist())
+
+        open_ = (status != "Resolved") & submitted.notna()
+        if id_col in df.columns:
+            for report_id, muni, when in zip(df.loc[open_, id_col], df.loc[open_, "Municipality"], submitted[open_]):
+                sla._open(str(report_id), muni, when.to_pydatetime())
+        return sla
+
+    def _open(self, report_id, municipality, submitted):
+        if report_id in self._pending:
+            return
+        self._pending[report_id] = (municipality, submitted)
+        self._muni(municipality).backlog_days[submitted.date()] += 1
+
+    def _close(self, report_id):
+        entry = self._pending.pop(report_id, None)
+        if entry is None:
+            return None
+        municipality, submitted = entry
+        days = self._muni(municipality).backlog_days
+        days[submitted.date()] -= 1
+        if days[submitted.date()] <= 0:
+            del days[submitted.date()]
+        return entry
+
+    # --- incremental updates ---
+    def apply(self, event):
+        if isinstance(event, ReportCreated):
+            report = event.report
+            submitted = _parse_time(report.get("DateTime")) or event.at
+            report_id = str(report.get("ReportID") or report.get("Reference", ""))
+            if report.get("Status", "Pending") != "Resolved" and report_id:
+                self._open(report_id, report.get("Municipality", ""), submitted)
+        elif isinstance(event, StatusChanged):
+            if event.new_status == "Resolved":
+                entry = self._close(str(event.report_id))
+                if entry is not None:
+                    municipality, submitted = entry
+                    resolved = _parse_time(event.resolved_at) or event.at
+                    self._muni(municipality).observe_resolution((resolved - submitted).total_seconds() / 3600)
+            elif event.old_status == "Resolved" and event.submitted_at:
+                # Reopened: back into the backlog. Its earlier resolution time stays in the
+                # digest (t-digests cannot delete), which only matters until the next reload.
+                submitted = _parse_time(event.submitted_at)
+                if submitted is not None:
+                    self._open(str(event.report_id), event.municipality, submitted)
+
+    # --- reads ---
+    def resolution_percentiles(self, municipality, quantiles=(0.5, 0.9)):
+        municipal = self.municipalities.get(municipality)
+        if municipal is None:
+            return {q: None for q in quantiles}
+        return {q: municipal.quantile(q) for q in quantiles}
+
+    def resolved_count(self, municipality):
+        municipal = self.municipalities.get(municipality)
+        return municipal.resolution_hours.count if municipal else 0
+
+    def backlog_histogram(self, municipality, now=None):
+        """Open reports per age bucket, plus the age of the oldest one in days."""
+        municipal = self.municipalities.get(municipality)
+        counts = {label: 0 for label, _ in AGE_BUCKETS}
+        if municipal is None or not municipal.backlog_days:
+            return counts, None
+        today = (now or datetime.now()).date()
+        bounds = [upper for _, upper in AGE_BUCKETS[:-1]]
+        for day, n in municipal.backlog_days.items():
+            age = (today - day).days
+            counts[AGE_BUCKETS[bisect.bisect_right(bounds, age)][0]] += n
+        oldest = (today - min(municipal.backlog_days)).days
+        return counts, oldest
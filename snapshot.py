@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+"""On-disk columnar snapshot of the Sheet1 report frame.
+
+A new admin process memory-maps the last Arrow snapshot instead of pulling the
+whole sheet, then reconciles with one batch_get request that returns:
+
+  * the ReportID column (detects deleted / reordered rows),
+  * the mutable columns (Status, Notified, ...),
+  * every row appended since the snapshot was written.
+
+Only when the header or the ID column no longer match does it fall back to a
+full get_all_values(). The snapshot carries a version stamp in its schema
+metadata so an incompatible file is ignored rather than misread.
+
+The file is shared by every Streamlit process on the host. Refreshes from the
+sheet are serialized by an flock on `<snapshot>.lock`, whose mtime records the
+last successful refresh: while that is younger than REFRESH_INTERVAL, or while
+another process holds the lock, callers read the file on disk instead of
+calling the Sheets API.
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, every process refreshes for itself
+    fcntl = None
+
+import pandas as pd
+
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_PATH = os.environ.get("DROPWATCH_SNAPSHOT_PATH", os.path.join("cache", "reports.arrow"))
+REFRESH_INTERVAL = float(os.environ.get("DROPWATCH_REFRESH_INTERVAL", 60))  # seconds a refresh stays valid
+
+# Columns the apps change after a report is created.
+MUTABLE_COLUMNS = ["Status", "Notified", "ResolvedAt"]
+ID_COLUMNS = ["ReportID", "Reference"]
+
+
+# ---------------------- FRAME HELPERS ----------------------
+def column_letter(n):
+    """1-based column index -> A1 column letters."""
+    letters = ""
+    while n:
+        n, rem = divmod(n - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def frame_from_values(header, rows):
+    width = len(header)
+    padded = [list(r[:width]) + [""] * (width - len(r)) for r in rows]
+    return pd.DataFrame(padded, columns=header)
+
+
+def normalize_reports(df):
+    df.columns = df.columns.str.strip()
+    if "DateTime" in df.columns:
+        df['DateTime'] = pd.to_datetime(df['DateTime'], errors='coerce')
+    for column in ("Latitude", "Longitude"):
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+    return df
+
+
+def id_column(header):
+    return next((c for c in ID_COLUMNS if c in [h.strip() for h in header]), None)
+
+
+# ---------------------- SNAPSHOT FILE ----------------------
+def arrow_table(df):
+    """Report frame -> Arrow table: DateTime as a timestamp, everything else as strings."""
+    import pyarrow as pa
+
+    columns = {}
+    for column in df.columns:
+        if column == "DateTime":
+            columns[column] = pa.array(pd.to_datetime(df[column], errors="coerce"), type=pa.timestamp("us"))
+        else:
+            columns[column] = pa.array(df[column].map(lambda v: "" if pd.isna(v) else str(v)), type=pa.string())
+    return pa.table(columns)
+
+
+def save_snapshot(df, header, sheet_key, path=None):
+    import pyarrow as pa
+
+    path = path or SNAPSHOT_PATH
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    table = arrow_table(df)
+    meta = {
+        "format": SNAPSHOT_FORMAT,
+        "sheet_key": sheet_key,
+        "header": list(header),
+        "rows": len(df),
+        "written_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    table = table.replace_schema_metadata({"dropwatch": json.dumps(meta)})
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp, path)
+    return meta
+
+
+def read_snapshot(sheet_key, path=None):
+    """Memory-map the snapshot; returns (frame, meta) or (None, None) if missing/stale format."""
+    import pyarrow as pa
+
+    path = path or SNAPSHOT_PATH
+    if not os.path.exists(path):
+        return None, None
+    source = None
+    try:
+        source = pa.memory_map(path, "r")
+        table = pa.ipc.open_file(source).read_all()
+        meta = json.loads((table.schema.metadata or {}).get(b"dropwatch", b"{}"))
+        if meta.get("format") != SNAPSHOT_FORMAT or meta.get("sheet_key") != sheet_key:
+            return None, None
+        df = table.to_pandas()
+    except (pa.ArrowInvalid, OSError, ValueError):
+        return None, None
+    finally:
+        if source is not None:
+            source.close()
+    for column in ("Latitude", "Longitude"):
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+    return df, meta
+
+
+def snapshot_version(path=None):
+    """Changes whenever a new snapshot is written (None if there is none)."""
+    try:
+        return os.stat(path or SNAPSHOT_PATH).st_mtime_ns
+    except OSError:
+        return None
+
+
+# ---------------------- REFRESH LOCK ----------------------
+def lock_path(path):
+    return f"{path}.lock"
+
+
+@contextmanager
+def refresh_lock(path, blocking=False):
+    """Exclusive per-host refresh lock. Yields True if this process holds it."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fd = os.open(lock_path(path), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is None:
+            yield True
+            return
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+def refresh_age(path):
+    """Seconds since the last successful refresh by any process (inf if never)."""
+    try:
+        return time.time() - os.stat(lock_path(path)).st_mtime
+    except OSError:
+        return float("inf")
+
+
+def mark_refreshed(path):
+    os.utime(lock_path(path))
+
+
+# ---------------------- LOADING ----------------------
+def full_load(sheet):
+    values = sheet.get_all_values()
+    if not values:
+        return pd.DataFrame(), []
+    header = values[0]
+    return normalize_reports(frame_from_values(header, values[1:])), header
+
+
+def reconcile(sheet, df, meta):
+    """Bring a snapshot frame up to date with one batch_get. Returns (frame, changed) or (None, True)."""
+    header = meta["header"]
+    width = len(header)
+    stripped = [h.strip() for h in header]
+    id_col = id_column(header)
+    if id_col is None:
+        return None, True
+
+    first_new_row = meta["rows"] + 2  # +1 for header, +1 for 1-based rows
+    tracked = [c for c in [id_col] + MUTABLE_COLUMNS if c in stripped]
+    ranges = ["1:1"]
+    for column in tracked:
+        letter = column_letter(stripped.index(column) + 1)
+        ranges.append(f"{letter}2:{letter}")
+    ranges.append(f"A{first_new_row}:{column_letter(width)}")
+
+    results = sheet.batch_get(ranges)
+    live_header, columns, new_rows = results[0], results[1:-1], results[-1]
+    if not live_header or [h.strip() for h in live_header[0]] != stripped:
+        return None, True
+
+    def flatten(value_range, length):
+        values = [r[0] if r else "" for r in value_range]
+        return values + [""] * (length - len(values))
+
+    n_old = meta["rows"]
+    # Column ranges come back without trailing blank cells; pad so blank rows still line up.
+    ids = flatten(columns[0], n_old)
+    if ids[:n_old] != df[id_col].astype(str).tolist():
+        return None, True  # rows were deleted or reordered upstream
+
+    changed = False
+    for column, value_range in zip(tracked[1:], columns[1:]):
+        live = pd.Series(flatten(value_range, len(ids))[:n_old], index=df.index)
+        current = df[column].astype(str)
+        diff = live != current
+        if diff.any():
+            df.loc[diff, column] = live[diff]
+            changed = True
+
+    # Blank rows inside the appended range are kept: frame position i must stay sheet row i + 2,
+    # which the backfill and retention writes rely on. The API already drops trailing blank rows.
+    if new_rows:
+        delta = normalize_reports(frame_from_values(header, new_rows))
+        df = pd.concat([df, delta], ignore_index=True)
+        changed = True
+    return df, changed
+
+
+def live_rows(sheet, header, ids):
+    """Current 1-based sheet rows of the given report IDs, read fresh from the ID column.
+
+    Raises ValueError if an ID is blank, missing or not unique, so a caller never
+    writes to or deletes a row it did not mean to.
+    """
+    key = id_column(header)
+    if key is None:
+        raise ValueError("the sheet has no ReportID column")
+    column = sheet.col_values([h.strip() for h in header].index(key) + 1)
+    rows, seen_twice = {}, set()
+    for row, value in enumerate(column[1:], start=2):
+        if value in rows:
+            seen_twice.add(value)
+        rows[value] = row
+    ids = [str(i) for i in ids]
+    unmatched = [i for i in ids if not i or i not in rows or i in seen_twice]
+    if unmatched:
+        raise ValueError(f"{len(unmatched)} report IDs no longer match a single sheet row, e.g. {unmatched[0]!r}")
+    return [rows[i] for i in ids]
+
+
+def refresh(sheet, sheet_key, path=None):
+    """Snapshot + delta when possible, full pull otherwise. Returns (frame, source).
+
+    Callers should hold refresh_lock(path).
+    """
+    path = path or SNAPSHOT_PATH
+    df, meta = read_snapshot(sheet_key, path)
+    if df is not None:
+        df, changed = reconcile(sheet, df, meta)
+        if df is not None:
+            if changed:
+                save_snapshot(df, meta["header"], sheet_key, path)
+            mark_refreshed(path)
+            return df, "snapshot"
+
+    df, header = full_load(sheet)
+    if header:
+        save_snapshot(df, header, sheet_key, path)
+        mark_refreshed(path)
+    return df, "sheet"
+
+
+def load_reports(sheet, sheet_key, path=None, max_age=REFRESH_INTERVAL, force=False):
+    """Report frame for this process. Returns (frame, source).
+
+    source is "shared" when the host snapshot was recent enough (or another
+    process was busy refreshing it) and no Sheets request was made; otherwise
+    "snapshot" or "sheet" as returned by refresh(). force=True always
+    reconciles with the sheet, still one process at a time.
+    """
+    path = path or SNAPSHOT_PATH
+    if not force and refresh_age(path) < max_age:
+        df, _ = read_snapshot(sheet_key, path)
+        if df is not None:
+            return df, "shared"
+
+    with refresh_lock(path, blocking=force) as owner:
+        if owner:
+            return refresh(sheet, sheet_key, path)
+
+    # Someone else is refreshing. Serve what is on disk; with nothing there yet,
+    # wait for their first snapshot rather than pulling the whole sheet as well.
+    df, _ = read_snapshot(sheet_key, path)
+    if df is not None:
+        return df, "shared"
+    with refresh_lock(path, blocking=True):
+        df, _ = read_snapshot(sheet_key, path)
+        if df is not None:
+            return df, "shared"
+        return refresh(sheet, sheet_key, path)
+
+
+def refresh_if_stale(sheet, sheet_key, path=None, max_age=REFRESH_INTERVAL):
+    """Refresh the host snapshot if it is older than max_age and no one else is on it.
+
+    Returns True if this call made a Sheets request.
+    """
+    path = path or SNAPSHOT_PATH
+    if refresh_age(path) < max_age:
+        return False
+    with refresh_lock(path) as owner:
+        if not owner or refresh_age(path) < max_age:
+            return False
+        refresh(sheet, sheet_key, path)
+        return True
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""Precompiled HTML/CSS fragments for st.markdown(..., unsafe_allow_html=True).
+
+* Templates use string.Template ($name placeholders, so CSS braces need no
+  doubling), are compiled once at import and HTML-escape every value unless
+  it is wrapped in Safe. Names, emails and locations typed by users therefore
+  cannot inject markup.
+* Stylesheets are registered by name and emitted at most once per rerun, no
+  matter how many components on the page use them. Streamlit removes any
+  element a rerun does not send again, so once per rerun is as far as this
+  can go.
+* Images are base64-encoded once per file version and reused across reruns
+  and sessions.
+"""
+
+import base64
+import html
+import mimetypes
+import os
+from functools import lru_cache
+from string import Template
+
+import streamlit as st
+
+_EMITTED_KEY = "_emitted_styles"
+
+
+class Safe(str):
+    """Trusted markup that render() inserts without escaping."""
+
+
+def escape(value):
+    if isinstance(value, Safe):
+        return value
+    return html.escape("" if value is None else str(value), quote=True)
+
+
+class HtmlTemplate:
+    def __init__(self, source):
+        self._template = Template(source.strip())
+
+    def render(self, **values):
+        return Safe(self._template.substitute({k: escape(v) for k, v in values.items()}))
+
+    def markdown(self, target=None, **values):
+        (target or st).markdown(self.render(**values), unsafe_allow_html=True)
+
+
+# ---------------------- STYLESHEETS ----------------------
+_STYLESHEETS = {}
+_sources = {}
+
+
+def register_style(name, css, **values):
+    """Register a static stylesheet; $name placeholders are filled (unescaped) once, here.
+
+    Re-registering the same sheet with the same values (every rerun of an app
+    script does this) is a no-op.
+    """
+    key = (css, tuple(sorted(values.items())))
+    if _sources.get(name) == key:
+        return
+    _STYLESHEETS[name] = f"<style>\n{Template(css.strip()).substitute(values)}\n</style>"
+    _sources[name] = key
+
+
+def begin_page():
+    """Call once at the top of the script so use_style() emits each sheet again this rerun."""
+    st.session_state[_EMITTED_KEY] = set()
+
+
+def use_style(*names):
+    emitted = st.session_state.setdefault(_EMITTED_KEY, set())
+    pending = [n for n in names if n not in emitted]
+    if pending:
+        st.markdown("\n".join(_STYLESHEETS[n] for n in pending), unsafe_allow_html=True)
+        emitted.update(pending)
+
+
+# ---------------------- IMAGES ----------------------
+@lru_cache(maxsize=32)
+def _data_uri(path, mtime):
+    mime = mimetypes.guess_type(path)[0] or "image/jpeg"
+    with open(path, "rb") as f:
+        return Safe(f"data:{mime};base64,{base64.b64encode(f.read()).decode()}")
+
+
+def data_uri(path):
+    """Base64 data URI for an image, cached until the file changes."""
+    return _data_uri(str(path), os.path.getmtime(path))
+
+
+_BACKGROUND_CSS = """
+$selector {
+    background-image: url("$image");
+    background-size: cover;
+    background-position: center;
+    background-repeat: no-repeat;
+    background-attachment: $attachment;
+}
+"""
+
+
+def use_background(image_path, selector, fixed=True):
+    """Cover `selector` with an image; emitted once per rerun per selector."""
+    name = f"background:{selector}"
+    register_style(
+        name, _BACKGROUND_CSS, selector=selector, image=data_uri(image_path),
+        attachment="fixed" if fixed else "scroll"
+    )
+    use_style(name)
+
+
+# ---------------------- CITIZEN APP ----------------------
+CITIZEN_CSS = """
+body {
+    background-color: $white_smoke;
+}
+.card {
+    background-color: rgba(255, 255, 255, 0.9);
+    border-radius: 15px;
+    padding: 25px;
+    box-shadow: 0 4px 12px rgba(0,0,0,0.1);
+    margin-bottom: 25px;
+}
+h1, h2, h3 {
+    color: $teal_blue;
+}
+button[kind="primary"], div[data-testid="stButton"] button {
+    background-color: $teal_blue !important;
+    color: white !important;
+    border-radius: 10px;
+    border: none;
+    font-weight: 600;
+    padding: 0.6em 1.2em;
+}
+button[kind="primary"]:hover, div[data-testid="stButton"] button:hover {
+    background-color: $moonstone_blue !important;
+    color: black !important;
+}
+.hero-banner {
+    position: relative;
+    width: 100%;
+    height: 300px;
+    overflow: hidden;
+    border-radius: 0 0 30px 30px;
+    margin-bottom: 50px;
+}
+.hero-banner img {
+    width: 100%;
+    height: 100%;
+    object-fit: cover;
+    filter: brightness(0.45);
+}
+.hero-banner div {
+    position: absolute;
+    top: 50%;
+    left: 50%;
+    transform: translate(-50%, -50%);
+    color: #f5f5f5;
+    font-size: 42px;
+    font-weight: 800;
+    text-align: center;
+    text-shadow: 3px 3px 12px rgba(0,0,0,0.6);
+    font-family: 'Poppins', sans-serif;
+}
+.page-banner {
+    position: relative;
+    width: 100%;
+    height: 140px;
+    overflow: hidden;
+    border-radius: 15px;
+    margin-bottom: 25px;
+}
+.page-banner img {
+    width: 100%;
+    height: 100%;
+    object-fit: cover;
+    filter: brightness(0.65);
+}
+.page-banner div {
+    position: absolute;
+    top: 50%;
+    left: 50%;
+    transform: translate(-50%, -50%);
+    color: white;
+    font-size: 26px;
+    font-weight: bold;
+    text-shadow: 1px 1px 4px rgba(0,0,0,0.6);
+    font-family: 'Poppins', sans-serif;
+}
+.success-card {
+    background-color: #00796B;
+    border-left: 5px solid #004D40;
+    border-radius: 12px;
+    padding: 20px;
+    margin-top: 30px;
+    box-shadow: 0 4px 12px rgba(0,0,0,0.1);
+}
+.success-card h3 {
+    color: white;
+}
+"""
+
+IMAGE_BANNER = HtmlTemplate("""
+<div class="$kind">
+    <img src="$image">
+    <div>$title</div>
+</div>
+""")
+SUCCESS_CARD = HtmlTemplate("""
+<div class="success-card">
+    <h3>✅ Report Submitted Successfully!</h3>
+    <p><b>Reference Code:</b> $reference</p>
+    <p><b>Date & Time:</b> $timestamp</p>
+    <p><b>Confirmation sent to:</b> $contact</p>
+    <p style="margin-top:10px;">Use your reference code under <b>Check Status</b> to track your report.</p>
+</div>
+""")
+
+
+# ---------------------- ADMIN APP ----------------------
+register_style("banner", """
+.banner {
+    position: relative;
+    background-size: cover;
+    background-position: center;
+    height: 200px;
+    border-radius: 20px;
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    color: white;
+    font-size: 28px;
+    font-weight: bold;
+    text-shadow: 2px 2px 4px rgba(0,0,0,0.6);
+    margin-bottom: 20px;
+}
+.banner-lg {
+    height: 250px;
+    font-size: 32px;
+}
+.overlay {
+    position: absolute;
+    top: 0;
+    left: 0;
+    width: 100%;
+    height: 100%;
+    background-color: rgba(0, 0, 0, 0.35);
+    border-radius: 20px;
+}
+.banner-text {
+    position: relative;
+    z-index: 2;
+    text-align: center;
+}
+.pulse-box {
+    background-color: #ffcccc;
+    color: #a80000;
+    padding: 10px 15px;
+    border-radius: 10px;
+    text-align: center;
+    font-weight: bold;
+    font-size: 18px;
+}
+""")
+
+BANNER = HtmlTemplate("""
+<div class="banner $size" style="background-image: url('$image');">
+    <div class="overlay"></div>
+    <div class="banner-text">$text</div>
+</div>
+""")
+WELCOME = HtmlTemplate("$greeting, $name!<br>Welcome to the $municipality Admin Portal")
+PULSE_BOX = HtmlTemplate("<div class='pulse-box'>⚠️ Pending Reports: $count</div>")
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Retention deletes exactly the archived reports, and lookups go through the ID index."""
+
+import os
+
+import pytest
+
+import archive
+from benchmarks.fakes import make_backend
+
+
+def test_retention_deletes_archived_ids_even_if_rows_shift(tmp_path, monkeypatch):
+    client, _ = make_backend(40)
+    ws = client.open_by_key("key").sheet1
+    resolved = {row[0] for row in ws.rows if row[8] == "Resolved"}
+    write_partitions = archive.write_partitions
+
+    def write_and_shift(df, root):
+        written = write_partitions(df, root)
+        del ws.rows[1]  # someone removes a pending row by hand mid-run
+        return written
+
+    pending = next(row for row in ws.rows[1:] if row[8] == "Pending")
+    ws.rows.remove(pending)
+    ws.rows.insert(1, pending)
+    monkeypatch.setattr(archive, "write_partitions", write_and_shift)
+
+    root = str(tmp_path / "archive")
+    summary, hot = archive.run_retention(ws, "key", 365, root, snapshot_path=str(tmp_path / "reports.arrow"))
+
+    assert summary["eligible"] == len(resolved)
+    assert not {row[0] for row in ws.rows} & resolved
+    assert all(row[8] == "Pending" for row in ws.rows)
+
+
+def test_retention_aborts_when_an_id_is_gone(tmp_path, monkeypatch):
+    client, _ = make_backend(20)
+    ws = client.open_by_key("key").sheet1
+    before = [list(r) for r in ws.rows]
+    write_partitions = archive.write_partitions
+
+    def write_and_drop(df, root):
+        written = write_partitions(df, root)
+        ws.rows = [r for r in ws.rows if r[0] != df.iloc[0]["ReportID"]]
+        return written
+
+    monkeypatch.setattr(archive, "write_partitions", write_and_drop)
+    with pytest.raises(ValueError):
+        archive.run_retention(ws, "key", 365, str(tmp_path / "archive"), snapshot_path=str(tmp_path / "reports.arrow"))
+    assert len(ws.rows) == len(before) - 1
+
+
+def test_find_report_reads_only_the_indexed_partition(tmp_path, monkeypatch):
+    client, _ = make_backend(30)
+    ws = client.open_by_key("key").sheet1
+    root = str(tmp_path / "archive")
+    archive.run_retention(ws, "key", 365, root, snapshot_path=str(tmp_path / "reports.arrow"))
+    ids, _ = archive.archive_index(root)
+    report_id, path = next(iter(ids.items()))
+
+    reads = []
+    read_report = archive._read_report
+    monkeypatch.setattr(archive, "_read_report", lambda p, i: reads.append(p) or read_report(p, i))
+    assert archive.find_report(report_id, root)["ReportID"] == report_id
+    assert reads == [path]
+
+    reads.clear()
+    assert archive.find_report("NO-SUCH-ID", root) is None
+    assert reads == []
+
+    # Partitions from before the index are still scanned.
+    os.remove(archive.index_path(root))
+    assert archive.find_report(report_id, root)["ReportID"] == report_id
+    assert archive.rebuild_index(root) == len(ids)
+
+
+def test_retention_for_one_municipality(tmp_path):
+    client, _ = make_backend(60)
+    ws = client.open_by_key("key").sheet1
+    muni = "eThekwini"
+    others = [list(r) for r in ws.rows if r[3] != muni]
+
+    summary, _ = archive.run_retention(ws, "key", 365, str(tmp_path / "archive"),
+                                       snapshot_path=str(tmp_path / "reports.arrow"), municipality=muni)
+    assert summary["eligible"]
+    assert [r for r in ws.rows if r[3] != muni] == others
+    assert not [r for r in ws.rows if r[3] == muni and r[8] == "Resolved"]
+
+
+def test_partition_files_never_collide(tmp_path):
+    client, _ = make_backend(30)
+    ws = client.open_by_key("key").sheet1
+    df = archive.snapshot.full_load(ws)[0]
+    resolved = df[df["Status"] == "Resolved"]
+    root = str(tmp_path / "archive")
+    first, second = archive.write_partitions(resolved, root), archive.write_partitions(resolved, root)
+    assert not set(first) & set(second)
+    assert len(list(archive.partition_paths(root=root))) == len(first) + len(second)
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""Reports are filed under the municipality whose boundary contains them."""
+
+import numpy as np
+import pandas as pd
+
+from boundaries import backfill_municipalities, classify_point, get_boundaries
+
+
+def test_classify_known_towns_and_misses():
+    lats = [-33.92, -26.1076, -29.8587, -20.0, np.nan]
+    lons = [18.42, 28.0567, 31.0218, 40.0, 28.0]
+    assert get_boundaries().classify(lats, lons, default=None).tolist() == [
+        "City of Cape Town", "City of Johannesburg", "eThekwini", None, None
+    ]
+    assert classify_point(-20.0, 40.0) == "Other"
+
+
+def test_backfill_refiles_only_boundary_matches():
+    df = pd.DataFrame({
+        "Municipality": ["eThekwini", "Other", "City of Cape Town", "City of Cape Town", "eThekwini"],
+        "Location": ["-33.92,18.42", "Sandton", "-20,40", "zzqq nowhere", "-29.8587,31.0218"],
+    })
+    classified, changed = backfill_municipalities(df)
+    assert classified.tolist() == [
+        "City of Cape Town",     # pin inside Cape Town, filed under the wrong metro
+        "City of Johannesburg",  # free text geocoded to a suburb
+        "City of Cape Town",     # outside every boundary: kept, not moved to Other
+        "City of Cape Town",     # cannot be located: kept
+        "eThekwini",
+    ]
+    assert changed.tolist() == [True, True, False, False, False]
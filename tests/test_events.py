@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""Events published in one process reach admin sessions in another through the outbox."""
+
+from events import EventBus, Outbox, ReportCreated, StatusChanged
+
+
+def test_outbox_relays_between_processes_in_order(tmp_path):
+    path = str(tmp_path / "events.sqlite")
+    citizen, admin = EventBus(Outbox(path)), EventBus(Outbox(path))
+
+    citizen.publish(ReportCreated({"Reference": "OLD"}))  # before anyone subscribed: not replayed
+    sub = admin.subscribe()
+    citizen.publish(ReportCreated({"Reference": "AB12CD34", "Latitude": None, "Municipality": "eThekwini"}))
+    admin.publish(StatusChanged("AB12CD34", "Pending", "Resolved", "eThekwini", resolved_at="2026-01-02 10:00:00"))
+
+    events = sub.drain()
+    # The create was published first, so it is delivered first, even though the status change was local.
+    assert [type(e).__name__ for e in events] == ["ReportCreated", "StatusChanged"]
+    assert events[0].report == {"Reference": "AB12CD34", "Latitude": None, "Municipality": "eThekwini"}
+    assert events[1].resolved_at == "2026-01-02 10:00:00"
+    assert sub.drain() == []  # each event is delivered once
+
+
+def test_outbox_keeps_one_connection(tmp_path, monkeypatch):
+    import sqlite3
+
+    opened = []
+    connect = sqlite3.connect
+    monkeypatch.setattr(sqlite3, "connect", lambda *a, **k: opened.append(a) or connect(*a, **k))
+    bus = EventBus(Outbox(str(tmp_path / "events.sqlite")))
+    sub = bus.subscribe()
+    for i in range(5):
+        bus.publish(ReportCreated({"Reference": str(i)}))
+    assert len(sub.drain()) == 5
+    assert len(opened) == 1
+
+
+def test_unreachable_outbox_keeps_local_delivery(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    bus = EventBus(Outbox(str(blocker / "events.sqlite")))
+    sub = bus.subscribe()
+    bus.publish(ReportCreated({"Reference": "X"}))
+    assert [e.report["Reference"] for e in sub.drain()] == ["X"]
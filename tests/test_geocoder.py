@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""The offline gazetteer resolves known towns, typed coordinates and prefixes."""
+
+from geocoder import geocode, municipality_for, suggest
+
+
+def test_geocode_finds_known_places_in_free_text():
+    place = geocode("12 Main Road, Sea Point, Cape Town")
+    assert (place.name, place.kind, place.municipality) == ("Sea Point", "suburb", "City of Cape Town")
+
+    assert geocode("near the Durban CBD taxi rank").municipality == "eThekwini"
+    assert geocode("zzqq nowhere") is None
+    assert geocode("   ") is None
+
+
+def test_typed_coordinates_are_named_after_the_nearest_place():
+    place = geocode("-26.2485, 27.8540")
+    assert (place.name, place.kind, place.municipality) == ("Soweto", "coordinates", "City of Johannesburg")
+    assert (place.lat, place.lon) == (-26.2485, 27.854)
+
+
+def test_point_outside_every_boundary():
+    place = geocode("-20,40")  # the Mozambique Channel
+    assert (place.name, place.municipality, place.province) == ("", "Other", "")
+    assert municipality_for(-20, 40) == "Other"
+    assert municipality_for(-20, 40, default=None) is None
+
+
+def test_suggest_matches_name_and_word_prefixes():
+    assert [p.name for p in suggest("sow")] == ["Soweto"]
+    assert [p.name for p in suggest("point")] == ["Sea Point"]  # a later word of the name
+    assert suggest("") == []
+    assert len(suggest("d", limit=2)) == 2
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Adding reports one at a time finds the same clusters as clustering the whole frame."""
+
+import random
+
+import numpy as np
+import pandas as pd
+
+from hotspots import EPS_METERS, MIN_SAMPLES, HotspotEngine, project
+
+
+def seeded_reports(n=600, seed=7):
+    rng = random.Random(seed)
+    centres = [(-26.2041, 28.0473), (-26.2100, 28.0400), (-33.9249, 18.4241), (-29.8587, 31.0218)]
+    rows = []
+    for i in range(n):
+        if rng.random() < 0.7:
+            lat, lon = rng.choice(centres)
+            lat, lon = lat + rng.gauss(0, 0.002), lon + rng.gauss(0, 0.002)  # a few hundred metres
+        else:
+            lat, lon = -34.0 + rng.random() * 12, 18.0 + rng.random() * 14
+        rows.append({
+            "ReportID": f"{i:08X}",
+            "Municipality": "City of Johannesburg",
+            "Leak Type": "Burst Pipe",
+            "Location": f"{lat:.6f},{lon:.6f}",
+            "DateTime": f"2024-01-{1 + i % 28:02d} 10:00:00",
+        })
+    return pd.DataFrame(rows)
+
+
+def partition(labels, members):
+    clusters = {}
+    for i in members:
+        if labels[i] >= 0:
+            clusters.setdefault(labels[i], set()).add(i)
+    return {frozenset(c) for c in clusters.values()}
+
+
+def test_incremental_adds_match_the_batch_clusters():
+    df = seeded_reports()
+    batch = HotspotEngine.from_frame(df).labels()
+
+    order = list(range(len(df)))
+    random.Random(1).shuffle(order)
+    engine = HotspotEngine()
+    for i in order:
+        lat, lon = map(float, df.at[i, "Location"].split(","))
+        engine.add(lat, lon, (df.at[i, "ReportID"], "", "", pd.Timestamp(df.at[i, "DateTime"])))
+    incremental = np.empty(len(df), dtype=np.int64)
+    incremental[order] = engine.labels()
+
+    # Brute-force core points: eps-neighbourhoods counting the point itself.
+    lats, lons = zip(*(map(float, loc.split(",")) for loc in df["Location"]))
+    xy = np.column_stack(project(np.array(lats), np.array(lons)))
+    distances = np.hypot(*(xy[:, None, :] - xy[None, :, :]).transpose(2, 0, 1))
+    core = np.flatnonzero((distances <= EPS_METERS).sum(axis=1) >= MIN_SAMPLES)
+
+    assert len(partition(batch, core)) > 1
+    assert partition(incremental, core) == partition(batch, core)
+    # A border point may join either of two clusters it touches, but never becomes noise in just one.
+    assert np.array_equal(incremental == -1, batch == -1)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""Token buckets refill over time, stay bounded in number, and limit by email alone when asked."""
+
+from rate_limit import RateLimiter, SubmissionThrottle
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_refills_at_capacity_per_period():
+    clock = Clock()
+    limiter = RateLimiter(capacity=2, period=60, clock=clock)
+
+    assert limiter.consume("a") and limiter.consume("a")
+    assert not limiter.consume("a")
+    assert limiter.wait_time("a") == 30.0  # one token every 60 / 2 seconds
+
+    clock.now = 29.0
+    assert not limiter.consume("a")
+    clock.now = 30.0
+    assert limiter.consume("a")
+
+    clock.now = 1000.0  # a long wait refills to capacity, not beyond
+    assert limiter.consume("a") and limiter.consume("a")
+    assert not limiter.consume("a")
+
+
+def test_least_recently_used_bucket_is_evicted_at_max_keys():
+    clock = Clock()
+    limiter = RateLimiter(capacity=1, period=3600, max_keys=2, clock=clock)
+
+    assert limiter.consume("a") and limiter.consume("b")
+    assert not limiter.consume("a")  # touches "a", so "b" is now the oldest
+    assert limiter.consume("c")
+
+    assert len(limiter) == 2
+    assert not limiter.consume("a")  # kept, still empty
+    assert limiter.consume("b")  # evicted, so it starts again with a full bucket
+
+
+def test_check_without_session_uses_the_email_bucket_only():
+    clock = Clock()
+    throttle = SubmissionThrottle({"email_capacity": 2, "email_period": 3600}, clock=clock)
+
+    assert throttle.check(None, "Thandi@Example.com")[0]
+    assert throttle.check(None, " thandi@example.com ")[0]  # same address after normalising
+    allowed, wait, reason = throttle.check(None, "thandi@example.com")
+    assert (allowed, wait, reason) == (False, 1800.0, "email")
+
+    assert len(throttle.session) == 0
+    assert throttle.check(None, "sipho@example.com")[0]
+    assert throttle.stats == {"allowed": 3, "rejected_email": 1}
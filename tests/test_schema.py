@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""Citizen submissions cannot set server-side fields."""
+
+from datetime import datetime
+
+from schema import validate_submission
+
+
+def test_submission_rejects_server_fields():
+    record = {"Name": "Thandi", "Contact": "thandi@example.org", "Location": "-26.2041,28.0473",
+              "Reference": "CHOSEN01", "Status": "Resolved", "ResolvedAt": "2026-01-01", "ImageURL": "http://x"}
+    _, errors = validate_submission(record)
+    assert errors == ["unexpected fields: ImageURL, Reference, ResolvedAt, Status"]
+
+
+def test_submission_gets_reference_status_and_time_from_the_server():
+    now = datetime(2026, 10, 1, 9, 30)
+    report, errors = validate_submission(
+        {"Name": "Thandi", "Contact": "thandi@example.org", "Location": "Sandton", "Leak Type": "Leakage"}, now=now
+    )
+    assert errors == []
+    assert report["Status"] == "Pending"
+    assert report["DateTime"] == "2026-10-01 09:30:00"
+    assert len(report["Reference"]) == 8
+    assert report["Latitude"] is None
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""The search index follows events without a rebuild, and Manage Reports caps what it renders."""
+
+from contextlib import ExitStack
+from unittest import mock
+
+import pandas as pd
+
+import snapshot
+from benchmarks import run as bench
+from benchmarks.fakes import make_backend
+from events import ReportCreated, StatusChanged
+from search import ReportIndex
+
+
+def reports():
+    return pd.DataFrame(
+        {
+            "ReportID": ["AA000001", "AA000002"],
+            "Name": ["Thandi Mokoena", "Sipho Dlamini"],
+            "Location": ["Main Road, Soweto", "-26.2041,28.0473"],
+            "Municipality": ["City of Johannesburg", "City of Johannesburg"],
+            "Status": ["Pending", "Pending"],
+        }
+    )
+
+
+def test_apply_patches_the_index_like_a_rebuild():
+    df = reports()
+    index = ReportIndex.from_frame(df)
+
+    index.apply(ReportCreated({"Reference": "BB000003", "Name": "Lerato Khumalo", "Location": "Soweto Hospital",
+                               "Municipality": "City of Johannesburg", "Status": "Pending"}))
+    assert index.search("sowet") == [0, 2]
+    assert index.search("bb00") == [2]
+
+    index.apply(StatusChanged("BB000003", "Pending", "Resolved", "City of Johannesburg"))
+    assert index.search("soweto", status="Resolved") == [2]
+    assert index.search("soweto", status="Pending") == [0]
+
+    index.remove(0)
+    assert index.search("soweto") == [2]
+    assert index.search("main") == []
+    assert index.search("aa000001") == []
+    assert index.search("26") == []  # bare coordinates are never indexed
+    assert len(index) == 2
+
+
+def test_manage_reports_renders_at_most_the_result_limit(tmp_path):
+    client, _ = make_backend(2000)
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch("gspread.authorize", return_value=client))
+        stack.enter_context(
+            mock.patch("google.oauth2.service_account.Credentials.from_service_account_info", return_value=object())
+        )
+        stack.enter_context(mock.patch.object(snapshot, "SNAPSHOT_PATH", str(tmp_path / "reports.arrow")))
+        at = bench._admin_app("Manage Reports", 60)
+        at.run()
+        at.text_input(key="report_search").input("citizen")  # every fake report's name
+        at.run()
+
+    assert not at.exception
+    caption = at.caption[0].value  # "Showing the first <limit> of <total> matching reports."
+    assert caption.startswith("Showing the first ")
+    limit, total = (int(n.replace(",", "")) for n in caption.split()[3:6:2])
+    assert limit < total
+    assert len(at.expander) == limit
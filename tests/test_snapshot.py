@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""Frame position i must stay sheet row i + 2 across snapshot reconciles."""
+
+import pytest
+
+from benchmarks.fakes import REPORT_HEADER, make_backend
+from snapshot import full_load, live_rows, refresh, refresh_lock
+
+
+def locked_refresh(ws, path):
+    with refresh_lock(path, blocking=True):
+        return refresh(ws, "key", path)
+
+
+def sheet_ids(ws):
+    return [row[0] if row else "" for row in ws.rows]
+
+
+def test_reconcile_keeps_blank_rows_aligned(tmp_path):
+    client, _ = make_backend(5)
+    ws = client.open_by_key("key").sheet1
+    path = str(tmp_path / "reports.arrow")
+
+    df, source = locked_refresh(ws, path)
+    assert source == "sheet"
+
+    # A row cleared by hand in the middle of the appended range, then more reports.
+    blank = [""] * len(REPORT_HEADER)
+    ws.rows.append(["R-NEW-1"] + [""] * (len(REPORT_HEADER) - 1))
+    ws.rows.append(blank)
+    ws.rows.append(["R-NEW-2"] + [""] * (len(REPORT_HEADER) - 1))
+
+    df, source = locked_refresh(ws, path)
+    assert source == "snapshot"
+    assert df["ReportID"].tolist() == sheet_ids(ws)
+
+    # A blank row already in the snapshot stays in place on the next reconcile too.
+    ws.rows.append(["R-NEW-3"] + [""] * (len(REPORT_HEADER) - 1))
+    df, source = locked_refresh(ws, path)
+    assert source == "snapshot"
+    assert df["ReportID"].tolist() == sheet_ids(ws)
+    assert df["ReportID"].tolist() == full_load(ws)[0]["ReportID"].tolist()
+
+
+def test_live_rows_follow_the_sheet():
+    client, _ = make_backend(5)
+    ws = client.open_by_key("key").sheet1
+    first, last = ws.rows[0][0], ws.rows[-1][0]
+
+    del ws.rows[1]
+    assert live_rows(ws, ws.header, [first, last]) == [2, len(ws.rows) + 1]
+
+    ws.rows.append(list(ws.rows[0]))
+    with pytest.raises(ValueError):
+        live_rows(ws, ws.header, [first])
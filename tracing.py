@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+"""Lightweight timing spans and external-call counters.
+
+Spans are grouped per Streamlit rerun (begin_rerun / end_rerun at the top and
+bottom of each app script) and aggregated per session and per process. The
+process totals can be written as a Prometheus text file for node_exporter's
+textfile collector, and are shown on the admin Diagnostics page.
+"""
+
+import functools
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+from datetime import datetime
+
+# Histogram bucket upper bounds in seconds.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRICS_PATH = os.environ.get("DROPWATCH_METRICS_PATH", os.path.join("metrics", "dropwatch.prom"))
+EXPORT_INTERVAL = 15  # seconds between automatic Prometheus file writes
+
+
+# ---------------------- STATS ----------------------
+class SpanStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q):
+        """Bucket upper bound containing the q-th observation (max for the overflow bucket)."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets[:-1]):
+            seen += n
+            if seen >= target:
+                return min(BUCKETS[i], self.max)
+        return self.max
+
+
+class SessionStats:
+    def __init__(self, max_reruns):
+        self.reruns = 0
+        self.spans = {}
+        self.calls = Counter()
+        self.recent = deque(maxlen=max_reruns)
+
+
+# ---------------------- TRACER ----------------------
+class Tracer:
+    def __init__(self, max_sessions=500, max_reruns=20):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.max_sessions = max_sessions
+        self.max_reruns = max_reruns
+        self.started = datetime.now()
+        self.spans = {}
+        self.calls = Counter()
+        self.counters = Counter()
+        self.sessions = OrderedDict()
+        self._last_export = 0.0
+
+    # --- rerun boundaries ---
+    def begin_rerun(self, session_id):
+        self._local.rerun = {
+            "session": session_id,
+            "started": datetime.now(),
+            "t0": time.perf_counter(),
+            "spans": [],
+        }
+
+    def end_rerun(self, export_path=METRICS_PATH):
+        rerun = getattr(self._local, "rerun", None)
+        if rerun is None:
+            return None
+        self._local.rerun = None
+        elapsed = time.perf_counter() - rerun.pop("t0")
+        rerun["duration"] = elapsed
+        self.record("rerun", elapsed, session=rerun["session"], attach=False)
+        with self._lock:
+            session = self._session(rerun["session"])
+            session.reruns += 1
+            session.recent.append(rerun)
+            export_due = export_path and time.time() - self._last_export >= EXPORT_INTERVAL
+            if export_due:
+                self._last_export = time.time()
+        if export_due:
+            try:
+                self.write_prometheus(export_path)
+            except OSError:
+                pass
+        return rerun
+
+    def _session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = self.sessions[session_id] = SessionStats(self.max_reruns)
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        else:
+            self.sessions.move_to_end(session_id)
+        return session
+
+    # --- recording ---
+    def record(self, name, seconds, external=False, session=None, attach=True):
+        rerun = getattr(self._local, "rerun", None)
+        if session is None and rerun is not None:
+            session = rerun["session"]
+        if attach and rerun is not None:
+            rerun["spans"].append((name, seconds))
+        with self._lock:
+            self.spans.setdefault(name, SpanStats()).observe(seconds)
+            if external:
+                self.calls[name] += 1
+            if session is not None:
+                stats = self._session(session)
+                stats.spans.setdefault(name, SpanStats()).observe(seconds)
+                if external:
+                    stats.calls[name] += 1
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    @contextmanager
+    def span(self, name, external=False):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - t0, external)
+
+    def traced(self, name=None, external=False):
+        def decorator(func):
+            span_name = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name, external):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    # --- reporting ---
+    def snapshot(self, session_id=None):
+        with self._lock:
+            spans = {n: _stats_row(s) for n, s in self.spans.items()}
+            calls = dict(self.calls)
+            counters = dict(self.counters)
+            session = self.sessions.get(session_id)
+            session_view = None
+            if session is not None:
+                session_view = {
+                    "reruns": session.reruns,
+                    "spans": {n: _stats_row(s) for n, s in session.spans.items()},
+                    "calls": dict(session.calls),
+                    "recent": list(session.recent),
+                }
+            return {
+                "started": self.started,
+                "sessions": len(self.sessions),
+                "spans": spans,
+                "calls": calls,
+                "counters": counters,
+                "session": session_view,
+            }
+
+    def to_prometheus(self):
+        lines = [
+            "# HELP dropwatch_span_duration_seconds Duration of traced app operations.",
+            "# TYPE dropwatch_span_duration_seconds histogram",
+        ]
+        with self._lock:
+            for name in sorted(self.spans):
+                stats = self.spans[name]
+                label = _escape_label(name)
+                cumulative = 0
+                for bound, n in zip(BUCKETS, stats.buckets):
+                    cumulative += n
+                    lines.append(f'dropwatch_span_duration_seconds_bucket{{span="{label}",le="{bound}"}} {cumulative}')
+                lines.append(f'dropwatch_span_duration_seconds_bucket{{span="{label}",le="+Inf"}} {stats.count}')
+                lines.append(f'dropwatch_span_duration_seconds_sum{{span="{label}"}} {stats.total:.6f}')
+                lines.append(f'dropwatch_span_duration_seconds_count{{span="{label}"}} {stats.count}')
+            lines += [
+                "# HELP dropwatch_external_calls_total Calls made to Google Sheets, SMTP and other external services.",
+                "# TYPE dropwatch_external_calls_total counter",
+            ]
+            for name in sorted(self.calls):
+                lines.append(f'dropwatch_external_calls_total{{call="{_escape_label(name)}"}} {self.calls[name]}')
+            lines += [
+                "# HELP dropwatch_events_total Application events such as throttled submissions.",
+                "# TYPE dropwatch_events_total counter",
+            ]
+            for name in sorted(self.counters):
+                lines.append(f'dropwatch_events_total{{event="{_escape_label(name)}"}} {self.counters[name]}')
+            lines += [
+                "# HELP dropwatch_active_sessions Sessions with recorded reruns.",
+                "# TYPE dropwatch_active_sessions gauge",
+                f"dropwatch_active_sessions {len(self.sessions)}",
+            ]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path=METRICS_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)  # atomic, so the collector never reads a half-written file
+        return path
+
+
+def _stats_row(stats):
+    return {
+        "count": stats.count,
+        "mean_ms": stats.mean * 1000,
+        "p95_ms": stats.quantile(0.95) * 1000,
+        "max_ms": stats.max * 1000,
+        "total_ms": stats.total * 1000,
+    }
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# ---------------------- INSTRUMENTED PROXIES ----------------------
+class _Instrumented:
+    """Proxy that wraps every method call on `target` in a span named `<prefix>.<method>`.
+
+    For external clients (gspread) objects returned by a call that come from the
+    same library are wrapped too, so client -> spreadsheet -> worksheet calls are
+    all counted without touching the call sites.
+    """
+
+    def __init__(self, target, prefix, external, tracer):
+        object.__setattr__(self, "_target", target)
+        object.__setattr__(self, "_prefix", prefix)
+        object.__setattr__(self, "_external", external)
+        object.__setattr__(self, "_tracer", tracer)
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if not callable(value) or name.startswith("_"):
+            return _maybe_wrap(value, self)
+        span_name = f"{self._prefix}.{name}"
+
+        @functools.wraps(value)
+        def call(*args, **kwargs):
+            with self._tracer.span(span_name, self._external):
+                result = value(*args, **kwargs)
+            return _maybe_wrap(result, self)
+        return call
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
+
+    def __repr__(self):
+        return f"<instrumented {self._target!r}>"
+
+
+def _library(obj):
+    return type(obj).__module__.split(".")[0]
+
+
+def _maybe_wrap(value, proxy):
+    if proxy._external and _library(value) == _library(proxy._target) and _library(value) != "builtins":
+        return _Instrumented(value, proxy._prefix, proxy._external, proxy._tracer)
+    return value
+
+
+tracer = Tracer()
+
+
+def instrument(target, prefix, external=False):
+    return _Instrumented(target, prefix, external, tracer)
+
+
+def span(name, external=False):
+    return tracer.span(name, external)
+
+
+def traced(name=None, external=False):
+    return tracer.traced(name, external)
+
+
+def count(name, n=1):
+    tracer.count(name, n)
+
+
+def begin_rerun(session_id=None):
+    tracer.begin_rerun(session_id or streamlit_session_id())
+
+
+def end_rerun():
+    return tracer.end_rerun()
+
+
+def streamlit_session_id():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        return ctx.session_id if ctx else "local"
+    except Exception:
+        return "local"